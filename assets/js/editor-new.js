@@ -308,7 +308,12 @@
   }
 
   var uploadImage = function(file, onSuccess, onError) {
-    const galleryUrl = '/api/galeries/' + document.body.getAttribute('data-gallery') + '/images/'
+    const gallery = document.querySelector('[data-gallery]')
+    if (!gallery) {
+      onError('Aucune galerie où envoyer l\'image.')
+      return
+    }
+    const galleryUrl = '/api/galeries/' + gallery.getAttribute('data-gallery') + '/images/'
 
     var formData = new FormData()
     formData.append('physical', file)
@@ -695,10 +695,11 @@ function uploadImage (e, dataTransferAttr, csrf){
             }
         }
     }
-    if (!files.length) {
+    var gallery = document.querySelector('[data-gallery]');
+    if (!files.length || !gallery) {
         return false;
     }
-    var galleryUrl = '/api/galeries/'+ document.body.getAttribute('data-gallery') + '/images/';
+    var galleryUrl = '/api/galeries/'+ gallery.getAttribute('data-gallery') + '/images/';
     var printErr =  function (message) {
         var $div = $("<div>", {
             text: message,
@@ -0,0 +1,51 @@
+"""
+Compare the ``app_settings`` context processor, which gives the settings frozen once for the process, with the deep copy
+of the whole ZDS_APP it used to make for each request.
+
+Usage: python scripts/benchmark_context_processor.py [number of requests]
+"""
+
+import os
+import sys
+import time
+from copy import deepcopy
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "zds.settings.dev")
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.conf import settings  # noqa: E402
+
+from zds.utils.context_processor import app_settings  # noqa: E402
+
+
+def copy_settings(request):
+    """The former implementation of ``app_settings``."""
+    return {"app": deepcopy(settings.ZDS_APP)}
+
+
+def measure(processor, requests):
+    start = time.perf_counter()
+    for _ in range(requests):
+        processor(None)
+    return time.perf_counter() - start
+
+
+def main():
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    app_settings(None)  # the settings are frozen by the first request
+    print(f"Context of {requests} requests:")
+    copy = measure(copy_settings, requests)
+    print(f"  deep copy:       {copy:.3f}s ({copy / requests * 1e6:.1f}µs per request)")
+    frozen = measure(app_settings, requests)
+    print(
+        f"  frozen settings: {frozen:.3f}s ({frozen / requests * 1e6:.1f}µs per request, {copy / frozen:.0f}x faster)"
+    )
+
+
+if __name__ == "__main__":
+    main()
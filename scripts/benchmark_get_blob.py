@@ -0,0 +1,78 @@
+"""
+Compare the direct path lookup of ``get_blob`` with the former recursive scan of the tree,
+on a synthetic content repository (5 parts of 10 chapters of 10 extracts by default).
+
+Usage: python scripts/benchmark_get_blob.py [number of extracts per chapter]
+"""
+
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "zds.settings.dev")
+
+import django  # noqa: E402
+
+django.setup()
+
+from git import Actor, Repo  # noqa: E402
+
+from zds.tutorialv2.utils import get_blob  # noqa: E402
+
+PARTS = 5
+CHAPTERS = 10
+
+
+def scan_blob(tree, path):
+    """The former implementation of ``get_blob``, which visits every blob of every subtree."""
+    for blob in tree.blobs:
+        if os.path.abspath(blob.path) == os.path.abspath(path):
+            return blob.data_stream.read().decode()
+    for subtree in tree.trees:
+        result = scan_blob(subtree, path)
+        if result is not None:
+            return result
+    return None
+
+
+def build_repository(directory, extracts_per_chapter):
+    repo = Repo.init(directory)
+    paths = []
+    for part in range(PARTS):
+        for chapter in range(CHAPTERS):
+            chapter_path = Path(f"partie-{part}", f"chapitre-{chapter}")
+            (Path(directory) / chapter_path).mkdir(parents=True)
+            for extract in range(extracts_per_chapter):
+                path = (chapter_path / f"extrait-{extract}.md").as_posix()
+                (Path(directory) / path).write_text(f"Texte de l'extrait {extract}.\n" * 20, encoding="utf-8")
+                paths.append(path)
+    repo.index.add(paths)
+    author = Actor("benchmark", "benchmark@zestedesavoir.com")
+    commit = repo.index.commit("Synthetic content", author=author, committer=author)
+    return repo, commit.hexsha, paths
+
+
+def measure(lookup, repo, sha, paths):
+    start = time.perf_counter()
+    tree = repo.commit(sha).tree
+    for path in paths:
+        assert lookup(tree, path) is not None
+    return time.perf_counter() - start
+
+
+def main():
+    extracts_per_chapter = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    with tempfile.TemporaryDirectory() as directory:
+        repo, sha, paths = build_repository(directory, extracts_per_chapter)
+        print(f"Reading the {len(paths)} extracts of a synthetic content:")
+        scan = measure(scan_blob, repo, sha, paths)
+        print(f"  recursive scan: {scan:.3f}s")
+        direct = measure(get_blob, repo, sha, paths)
+        print(f"  path lookup:    {direct:.3f}s ({scan / direct:.0f}x faster)")
+
+
+if __name__ == "__main__":
+    main()
@@ -12,6 +12,7 @@ from django.contrib.auth.models import User
 
 from zds.forum.models import Forum, Post, TopicRead
 from zds.forum import signals
+from zds.forum.read_tracking import discard_topic_read
 from zds.notification.models import TopicAnswerSubscription, Notification, NewTopicSubscription
 from zds.utils.models import Alert, CommentEdit, get_hat_from_request
 
@@ -141,6 +142,7 @@ class PostEditMixin:
         Marks a post unread so we create a notification between the user and the topic host of the post.
         But, if there is only one post in the topic, we mark the topic unread but we don't create a notification.
         """
+        discard_topic_read(post.topic, user)
         topic_read = TopicRead.objects.filter(topic=post.topic, user=user).first()
         # issue 3227 proves that you can have post.position==1 AND topic_read to None
         # it can happen whether on double click (the event "mark as not read" is therefore sent twice)
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from zds.forum.models import Forum
+
+
+class Command(BaseCommand):
+    help = "Compute the number of topics and posts, and the last post, of each forum from scratch"
+
+    def handle(self, *args, **options):
+        fixed = 0
+        for forum in Forum.objects.all():
+            counters = (forum.topic_count, forum.post_count, forum.last_post_id)
+            forum.update_counters()
+            if counters != (forum.topic_count, forum.post_count, forum.last_post_id):
+                fixed += 1
+                self.stdout.write(f"Counters of {forum} fixed: {forum.topic_count} topics, {forum.post_count} posts")
+        self.stdout.write(f"Done, {fixed} forums fixed.")
@@ -0,0 +1,51 @@
+# Generated by Django 2.2.24 on 2026-10-18 08:16
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def compute_counters(apps, schema_editor):
+    Forum = apps.get_model("forum", "Forum")
+    Topic = apps.get_model("forum", "Topic")
+    Post = apps.get_model("forum", "Post")
+    for forum in Forum.objects.all():
+        posts = Post.objects.filter(topic__forum=forum)
+        Forum.objects.filter(pk=forum.pk).update(
+            topic_count=Topic.objects.filter(forum=forum).count(),
+            post_count=posts.count(),
+            last_post=posts.order_by("-pubdate").first(),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("forum", "0022_topic_github_repository_name"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="forum",
+            name="last_post",
+            field=models.ForeignKey(
+                blank=True,
+                editable=False,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="+",
+                to="forum.Post",
+                verbose_name="Dernier message",
+            ),
+        ),
+        migrations.AddField(
+            model_name="forum",
+            name="post_count",
+            field=models.IntegerField(default=0, editable=False, verbose_name="Nombre de messages"),
+        ),
+        migrations.AddField(
+            model_name="forum",
+            name="topic_count",
+            field=models.IntegerField(default=0, editable=False, verbose_name="Nombre de sujets"),
+        ),
+        migrations.RunPython(compute_counters, migrations.RunPython.noop),
+    ]
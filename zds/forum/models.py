@@ -5,17 +5,24 @@ from math import ceil
 from django.conf import settings
 from django.contrib.auth.models import Group, User, AnonymousUser
 from django.urls import reverse
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F
 from django.dispatch import receiver
-from django.db.models.signals import pre_delete
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
 
 from elasticsearch_dsl.field import Text, Keyword, Integer, Boolean, Float, Date
 
 from zds.forum.managers import TopicManager, ForumManager, PostManager, TopicReadManager
 from zds.forum import signals
-from zds.searchv2.models import AbstractESDjangoIndexable, delete_document_in_elasticsearch, ESIndexManager
+from zds.searchv2.models import (
+    AbstractESDjangoIndexable,
+    delete_document_in_elasticsearch,
+    ESIndexChange,
+    get_search_index_manager,
+)
 from zds.utils import get_current_user, old_slugify
 from zds.utils.models import Comment, Tag
+from zds.utils.topbar_menus import invalidate_topbar_menus
 
 
 def sub_tag(tag):
@@ -56,17 +63,15 @@ class ForumCategory(models.Model):
     def get_absolute_url(self):
         return reverse("cat-forums-list", kwargs={"slug": self.slug})
 
-    def get_forums(self, user, with_count=False):
+    def get_forums(self, user):
         """get all forums that user can access
 
         :param user: the related user
         :type user: User
-        :param with_count: If true will preload thread and post number for each forum of this category
-        :type with_count: bool
         :return: All forums in category, ordered by forum's position in category
         :rtype: list[Forum]
         """
-        forums_pub = Forum.objects.get_public_forums_of_category(self, with_count=with_count)
+        forums_pub = Forum.objects.get_public_forums_of_category(self)
         if user is not None and user.is_authenticated:
             forums_private = Forum.objects.get_private_forums_of_category(self, user)
             return list(forums_pub | forums_private)
@@ -94,47 +99,79 @@ class Forum(models.Model):
     position_in_category = models.IntegerField("Position dans la catégorie", null=True, blank=True, db_index=True)
 
     slug = models.SlugField(max_length=80, unique=True)
+
+    # denormalized, maintained by the receivers below and fixed by the `update_forum_counters` command; not positive
+    # integers, so that a decrement on a counter which drifted to 0 does not fail
+    topic_count = models.IntegerField("Nombre de sujets", default=0, editable=False)
+    post_count = models.IntegerField("Nombre de messages", default=0, editable=False)
+    last_post = models.ForeignKey(
+        "Post",
+        null=True,
+        blank=True,
+        related_name="+",
+        verbose_name="Dernier message",
+        editable=False,
+        on_delete=models.SET_NULL,
+    )
+
     _nb_group = None
     objects = ForumManager()
 
+    counter_fields = ("topic_count", "post_count", "last_post")
+
     def __str__(self):
         return self.title
 
     def get_absolute_url(self):
         return reverse("forum-topics-list", kwargs={"cat_slug": self.category.slug, "forum_slug": self.slug})
 
-    def get_topic_count(self):
-        """Retrieve or aggregate the number of threads in this forum. If this number already exists, it must be stored \
-        in thread_count. Otherwise it will process a SQL query.
+    def save(self, *args, **kwargs):
+        """Overridden so that a stale instance never overwrites the counters, which are only changed by updates."""
+
+        if not self._state.adding and kwargs.get("update_fields") is None:
+            kwargs["update_fields"] = [
+                field.name
+                for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.counter_fields
+            ]
+        return super().save(*args, **kwargs)
 
+    def get_topic_count(self):
+        """
         :return: the number of threads in the forum.
         """
-        try:
-            return self.thread_count
-        except AttributeError:
-            return Topic.objects.filter(forum=self).count()
+        return self.topic_count
 
     def get_post_count(self):
-        """Retrieve or aggregate the number of posts in this forum. If this number already exists, it must be stored \
-        in post_count. Otherwise it will process a SQL query.
-
+        """
         :return: the number of posts for a forum.
         """
-        try:
-            return self.post_count
-        except AttributeError:
-            return Post.objects.filter(topic__forum=self).count()
+        return self.post_count
 
     def get_last_message(self):
         """
         :return: the last message on the forum, if there are any.
         """
-        try:
-            last_post = Post.objects.select_related("topic").filter(topic__forum=self).order_by("-pubdate").all()[0]
+        last_post = self.last_post
+        if last_post is not None:
             last_post.topic.forum = self
-            return last_post
-        except IndexError:
-            return None
+        return last_post
+
+    def update_last_post(self):
+        """Points ``last_post`` to the most recent post of the forum again, after the last one was deleted or moved."""
+
+        self.last_post = Post.objects.filter(topic__forum=self).order_by("-pubdate").first()
+        Forum.objects.filter(pk=self.pk).update(last_post=self.last_post)
+
+    def update_counters(self):
+        """Computes the counters and the last post of the forum from scratch."""
+
+        self.topic_count = Topic.objects.filter(forum=self).count()
+        self.post_count = Post.objects.filter(topic__forum=self).count()
+        self.last_post = Post.objects.filter(topic__forum=self).order_by("-pubdate").first()
+        Forum.objects.filter(pk=self.pk).update(
+            topic_count=self.topic_count, post_count=self.post_count, last_post=self.last_post
+        )
 
     def can_read(self, user):
         """
@@ -472,11 +509,37 @@ class Topic(AbstractESDjangoIndexable):
         try:
             old_self = Topic.objects.get(pk=self.pk)
         except Topic.DoesNotExist:
-            pass
-        else:
-            if old_self.forum.pk != self.forum.pk or old_self.title != self.title:
-                Post.objects.filter(topic__pk=self.pk).update(es_flagged=True)
-        return super().save(*args, **kwargs)
+            return super().save(*args, **kwargs)
+
+        if old_self.forum.pk != self.forum.pk or old_self.title != self.title:
+            posts = Post.objects.filter(topic__pk=self.pk)
+            posts.update(es_flagged=True)
+            ESIndexChange.objects.enqueue(Post, posts.values_list("pk", flat=True))
+        if old_self.forum.pk == self.forum.pk:
+            return super().save(*args, **kwargs)
+
+        with transaction.atomic():
+            result = super().save(*args, **kwargs)
+            post_count = Post.objects.filter(topic__pk=self.pk).count()
+            Forum.objects.filter(pk=old_self.forum.pk).update(
+                topic_count=F("topic_count") - 1, post_count=F("post_count") - post_count
+            )
+            Forum.objects.filter(pk=self.forum.pk).update(
+                topic_count=F("topic_count") + 1, post_count=F("post_count") + post_count
+            )
+            old_self.forum.update_last_post()
+            self.forum.update_last_post()
+        return result
+
+
+@receiver(post_save, sender=ForumCategory)
+@receiver(post_delete, sender=ForumCategory)
+@receiver(post_save, sender=Forum)
+@receiver(post_delete, sender=Forum)
+@receiver(m2m_changed, sender=Forum.groups.through)
+def forums_changed(sender, **kwargs):
+    """The forums listed in the topbar changed."""
+    invalidate_topbar_menus()
 
 
 @receiver(pre_delete, sender=Topic)
@@ -485,6 +548,17 @@ def delete_topic_in_elasticsearch(sender, instance, **kwargs):
     return delete_document_in_elasticsearch(instance)
 
 
+@receiver(post_save, sender=Topic)
+def count_created_topic(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        Forum.objects.filter(pk=instance.forum_id).update(topic_count=F("topic_count") + 1)
+
+
+@receiver(post_delete, sender=Topic)
+def count_deleted_topic(sender, instance, **kwargs):
+    Forum.objects.filter(pk=instance.forum_id).update(topic_count=F("topic_count") - 1)
+
+
 class Post(Comment, AbstractESDjangoIndexable):
     """
     A forum post written by a user.
@@ -570,7 +644,7 @@ class Post(Comment, AbstractESDjangoIndexable):
 
         super().hide_comment_by_user(user, text_hidden)
 
-        index_manager = ESIndexManager(**settings.ES_SEARCH_INDEX)
+        index_manager = get_search_index_manager()
         index_manager.update_single_document(self, {"is_visible": False})
 
 
@@ -580,6 +654,22 @@ def delete_post_in_elasticsearch(sender, instance, **kwargs):
     return delete_document_in_elasticsearch(instance)
 
 
+@receiver(post_save, sender=Post)
+def count_created_post(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        Forum.objects.filter(topic__pk=instance.topic_id).update(post_count=F("post_count") + 1, last_post=instance)
+
+
+@receiver(post_delete, sender=Post)
+def count_deleted_post(sender, instance, **kwargs):
+    # the posts are deleted before their topic, so the forum can still be found through it
+    forums = Forum.objects.filter(topic__pk=instance.topic_id)
+    forums.update(post_count=F("post_count") - 1)
+    # the last post of the forum was set to NULL by its deletion
+    for forum in forums.filter(last_post__isnull=True):
+        forum.update_last_post()
+
+
 class TopicRead(models.Model):
     """
     This model tracks the last post read in a topic by a user.
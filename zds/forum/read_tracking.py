@@ -0,0 +1,101 @@
+"""
+Write-behind of the topics read by the members.
+
+Displaying a topic only records that the user read its last post, in a buffer of the process where the reads of the
+same topic by the same user are coalesced. A background thread saves the buffer every
+``ZDS_APP["forum"]["read_flush_interval"]`` seconds (or as soon as it holds ``read_flush_batch_size`` reads) with a few
+bulk statements, then sends ``topic_read`` so that the notifications about these topics (up to the post read) are
+marked as read.
+
+So a topic is shown as read a few seconds later at most, and the reads which are not saved yet are lost if the process
+is killed.
+"""
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import transaction
+
+from zds.forum import signals
+from zds.forum.models import Post, Topic, TopicRead, mark_read
+from zds.utils.write_behind import WriteBehindBuffer
+
+
+def queue_topic_read(topic, user):
+    """
+    Records that the user read the last post of the topic, to be saved by the flusher, or right away if
+    ``ZDS_APP["forum"]["read_flush_interval"]`` is ``0``.
+
+    :param topic: the topic read
+    :param user: an authenticated user
+    """
+    if not settings.ZDS_APP["forum"]["read_flush_interval"]:
+        mark_read(topic, user)
+        return
+    topic_reads.add((user.pk, topic.pk), topic.last_message_id)
+
+
+def discard_topic_read(topic, user):
+    """
+    Drops the read of the topic by the user which is not saved yet, so that it does not override a topic marked as
+    unread.
+
+    :param topic: the topic marked as unread
+    :param user: an authenticated user
+    """
+    topic_reads.discard((user.pk, topic.pk))
+
+
+def flush_topic_reads():
+    """
+    Saves the buffered reads.
+
+    :return: the number of reads saved
+    :rtype: int
+    """
+    return topic_reads.flush()
+
+
+def _save_topic_reads(reads):
+    # the posts (and their topic) or the users may have been deleted since the reads were buffered
+    topic_of_posts = dict(Post.objects.filter(pk__in=set(reads.values())).values_list("pk", "topic_id"))
+    users = User.objects.in_bulk({user_pk for user_pk, _ in reads})
+    reads = {
+        (user_pk, topic_pk): post_pk
+        for (user_pk, topic_pk), post_pk in reads.items()
+        if user_pk in users and topic_of_posts.get(post_pk) == topic_pk
+    }
+    if not reads:
+        return 0
+
+    new_reads = dict(reads)
+    changed_reads = []
+    for topic_read in TopicRead.objects.filter(user__in=list(users), topic__in={pk for _, pk in reads}):
+        post_pk = new_reads.pop((topic_read.user_id, topic_read.topic_id), None)
+        if post_pk is not None and post_pk != topic_read.post_id:
+            topic_read.post_id = post_pk
+            changed_reads.append(topic_read)
+
+    with transaction.atomic():
+        TopicRead.objects.bulk_update(changed_reads, ["post"])
+        # a concurrent flush (of another process) may have created some of them in the meantime
+        TopicRead.objects.bulk_create(
+            [
+                TopicRead(user_id=user_pk, topic_id=topic_pk, post_id=post_pk)
+                for (user_pk, topic_pk), post_pk in new_reads.items()
+            ],
+            ignore_conflicts=True,
+        )
+
+    topics = Topic.objects.in_bulk({topic_pk for _, topic_pk in reads})
+    for (user_pk, topic_pk), post_pk in reads.items():
+        if topic_pk in topics:
+            signals.topic_read.send(sender=Topic, instance=topics[topic_pk], user=users[user_pk], post_pk=post_pk)
+    return len(reads)
+
+
+topic_reads = WriteBehindBuffer(
+    "topic-read-flusher",
+    _save_topic_reads,
+    lambda: settings.ZDS_APP["forum"]["read_flush_interval"],
+    lambda: settings.ZDS_APP["forum"]["read_flush_batch_size"],
+)
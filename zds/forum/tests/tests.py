@@ -1,16 +1,31 @@
+from copy import deepcopy
 from datetime import datetime, timedelta
+from io import StringIO
+from unittest import mock
 
 from django.conf import settings
 from django.contrib.auth.models import Group
 from django.core import mail
+from django.core.management import call_command
+from django.db import connection
 from django.urls import reverse
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext, override_settings
 
 from zds.forum.commons import PostEditMixin
-from zds.forum.factories import ForumCategoryFactory, ForumFactory, TopicFactory, PostFactory, TagFactory
+from zds.forum.factories import (
+    ForumCategoryFactory,
+    ForumFactory,
+    TopicFactory,
+    PostFactory,
+    TagFactory,
+    create_category_and_forum,
+    create_topic_in_forum,
+)
 from zds.forum.models import Forum, TopicRead, Post, Topic
+from zds.forum.read_tracking import flush_topic_reads, queue_topic_read
 from zds.member.factories import ProfileFactory, StaffProfileFactory
-from zds.notification.models import TopicAnswerSubscription
+from zds.notification.models import Notification, TopicAnswerSubscription
 from zds.utils import old_slugify
 from zds.utils.forums import get_tag_by_title
 from zds.utils.models import Alert, Tag
@@ -1162,6 +1177,157 @@ class ManagerTests(TestCase):
         self.assertFalse(topic.is_read_by_user(reader.user, check_auth=False))
 
 
+class ForumCountersTests(TestCase):
+    def setUp(self):
+        self.category = ForumCategoryFactory(position=1)
+        self.forum = ForumFactory(category=self.category, position_in_category=1)
+        self.other_forum = ForumFactory(category=self.category, position_in_category=2)
+        self.user = ProfileFactory().user
+
+    def create_topic(self, forum, post_count):
+        topic = TopicFactory(forum=forum, author=self.user)
+        for position in range(1, post_count + 1):
+            PostFactory(topic=topic, author=self.user, position=position)
+        return topic
+
+    def assertCounters(self, forum, topic_count, post_count, last_post):
+        forum = Forum.objects.get(pk=forum.pk)
+        self.assertEqual(forum.get_topic_count(), topic_count)
+        self.assertEqual(forum.get_post_count(), post_count)
+        self.assertEqual(forum.get_last_message(), last_post)
+
+    def test_counters(self):
+        self.assertCounters(self.forum, 0, 0, None)
+
+        topic = self.create_topic(self.forum, 3)
+        other_topic = self.create_topic(self.forum, 2)
+        self.assertCounters(self.forum, 2, 5, other_topic.last_message)
+
+        # a stale instance does not overwrite the counters
+        self.forum.title = "Un autre titre"
+        self.forum.save()
+        self.assertCounters(self.forum, 2, 5, other_topic.last_message)
+
+        # deletion of the last post
+        other_topic.last_message.delete()
+        self.assertCounters(self.forum, 2, 4, Post.objects.filter(topic=other_topic).last())
+
+        # deletion of a topic
+        other_topic.delete()
+        self.assertCounters(self.forum, 1, 3, topic.last_message)
+
+        # move of a topic
+        topic.forum = self.other_forum
+        topic.save()
+        self.assertCounters(self.forum, 0, 0, None)
+        self.assertCounters(self.other_forum, 1, 3, topic.last_message)
+
+    def test_update_forum_counters(self):
+        topic = self.create_topic(self.forum, 2)
+        Forum.objects.filter(pk=self.forum.pk).update(topic_count=12, post_count=0, last_post=None)
+
+        # a counter which drifted does not prevent the deletions
+        topic.last_message.delete()
+        self.assertEqual(Forum.objects.get(pk=self.forum.pk).post_count, -1)
+
+        out = StringIO()
+        call_command("update_forum_counters", stdout=out)
+        self.assertIn("1 forums fixed", out.getvalue())
+        self.assertCounters(self.forum, 1, 1, Post.objects.get(topic=topic))
+
+    def test_number_of_queries_independent_of_posts(self):
+        def count_queries():
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(self.client.get(reverse("cats-forums-list")).status_code, 200)
+            return len(queries)
+
+        self.create_topic(self.forum, 2)
+        self.create_topic(self.other_forum, 2)
+        count_queries()  # fills the cached fragments of the header
+        expected = count_queries()
+
+        for forum in (self.forum, self.other_forum):
+            for _ in range(3):
+                self.create_topic(forum, 5)
+        self.assertEqual(count_queries(), expected)
+
+
+overridden_zds_app = deepcopy(settings.ZDS_APP)
+overridden_zds_app["forum"]["read_flush_interval"] = 60
+
+
+@override_settings(ZDS_APP=overridden_zds_app)
+@mock.patch("zds.utils.write_behind.WriteBehindBuffer.start_flusher")
+class TopicReadWriteBehindTests(TestCase):
+    def setUp(self):
+        _, forum = create_category_and_forum()
+        self.author = ProfileFactory().user
+        self.reader = ProfileFactory().user
+        self.topic = create_topic_in_forum(forum, self.author.profile)
+        TopicAnswerSubscription.objects.get_or_create_active(self.reader, self.topic)
+        self.client.force_login(self.reader)
+
+    def answer(self):
+        post = PostFactory(topic=self.topic, author=self.author, position=self.topic.last_message.position + 1)
+        self.topic = Topic.objects.get(pk=self.topic.pk)
+        return post
+
+    def read_topic(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get(self.topic.get_absolute_url()).status_code, 200)
+        # reading a topic does not write anything about the topics read and the notifications
+        tables = ('"forum_topicread"', '"notification_notification"')
+        writes = [query for query in queries if query["sql"].startswith(("INSERT", "UPDATE", "DELETE"))]
+        self.assertFalse([query for query in writes if any(table in query["sql"] for table in tables)])
+
+    def test_reads_are_saved_later(self, start_flusher):
+        self.answer()
+        self.read_topic()
+        self.assertTrue(start_flusher.called)
+        self.assertFalse(TopicRead.objects.exists())
+        self.assertTrue(Notification.objects.filter(subscription__user=self.reader, is_read=False).exists())
+
+        self.assertEqual(flush_topic_reads(), 1)
+        self.assertEqual(TopicRead.objects.get(user=self.reader, topic=self.topic).post, self.topic.last_message)
+        self.assertFalse(Notification.objects.filter(subscription__user=self.reader, is_read=False).exists())
+        self.assertEqual(flush_topic_reads(), 0)
+
+    def test_reads_are_coalesced(self, start_flusher):
+        queue_topic_read(self.topic, self.reader)
+        self.answer()
+        queue_topic_read(self.topic, self.reader)
+        self.assertEqual(flush_topic_reads(), 1)
+        self.assertEqual(TopicRead.objects.get(user=self.reader, topic=self.topic).post, self.topic.last_message)
+
+        # the existing read is updated
+        post = self.answer()
+        queue_topic_read(self.topic, self.reader)
+        queue_topic_read(self.topic, self.author)
+        self.assertEqual(flush_topic_reads(), 2)
+        self.assertEqual(TopicRead.objects.get(user=self.reader, topic=self.topic).post, post)
+        self.assertEqual(TopicRead.objects.get(user=self.author, topic=self.topic).post, post)
+
+    def test_deleted_topic(self, start_flusher):
+        queue_topic_read(self.topic, self.reader)
+        self.topic.delete()
+        self.assertEqual(flush_topic_reads(), 0)
+        self.assertFalse(TopicRead.objects.exists())
+
+    def test_newer_answers_stay_unread(self, start_flusher):
+        queue_topic_read(self.topic, self.reader)
+        self.answer()
+        self.assertEqual(flush_topic_reads(), 1)
+        self.assertTrue(Notification.objects.filter(subscription__user=self.reader, is_read=False).exists())
+
+    def test_unread_drops_the_pending_read(self, start_flusher):
+        first_post = self.topic.last_message
+        post = self.answer()
+        queue_topic_read(self.topic, self.reader)
+        PostEditMixin.perform_unread_message(post, self.reader)
+        self.assertEqual(flush_topic_reads(), 0)
+        self.assertEqual(TopicRead.objects.get(user=self.reader, topic=self.topic).post, first_post)
+
+
 class TestMixins(TestCase):
     def test_double_unread_is_handled(self):
         author = ProfileFactory().user
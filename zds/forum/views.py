@@ -19,7 +19,8 @@ from django.views.generic.detail import SingleObjectMixin
 
 from zds.forum.commons import TopicEditMixin, PostEditMixin, SinglePostObjectMixin, ForumEditMixin
 from zds.forum.forms import TopicForm, PostForm, MoveTopicForm
-from zds.forum.models import ForumCategory, Forum, Topic, Post, mark_read, TopicRead
+from zds.forum.models import ForumCategory, Forum, Topic, Post, TopicRead
+from zds.forum.read_tracking import queue_topic_read
 from zds.member.decorator import can_write_and_read_now
 from zds.member.models import user_readable_forums
 from zds.forum import signals
@@ -42,7 +43,7 @@ class CategoriesForumsListView(ListView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         for category in context.get("categories"):
-            category.forums = category.get_forums(self.request.user, with_count=True)
+            category.forums = category.get_forums(self.request.user)
         return context
 
 
@@ -222,7 +223,7 @@ class TopicPostsListView(ZdSPagingListView, FeatureableMixin, SingleObjectMixin)
             if len(posts) > 0:
                 signals.post_read.send(sender=posts[0].__class__, instances=posts, user=self.request.user)
             if not self.object.is_read:
-                mark_read(self.object)
+                queue_topic_read(self.object, self.request.user)
         return context
 
     def get_object(self, queryset=None):
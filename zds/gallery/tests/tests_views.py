@@ -1,9 +1,13 @@
 import os
 
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
+from zds.forum.factories import create_category_and_forum
 from zds.member.factories import ProfileFactory
+from zds.tutorialv2.factories import PublishableContentFactory
 from zds.gallery.factories import GalleryFactory, UserGalleryFactory, ImageFactory
 from zds.gallery.models import Gallery, UserGallery, Image
 from django.conf import settings
@@ -105,10 +109,11 @@ class NewGalleryViewTest(TestCase):
         )
 
         self.assertEqual(200, response.status_code)
-        self.assertEqual(2, Gallery.objects.count())
+        # the default gallery is not created, since no editor is displayed
+        self.assertEqual(1, Gallery.objects.count())
 
         user_gallery = UserGallery.objects.filter(user=self.profile1.user)
-        self.assertEqual(2, user_gallery.count())
+        self.assertEqual(1, user_gallery.count())
         self.assertEqual("test title", user_gallery[0].gallery.title)
         self.assertEqual("test subtitle", user_gallery[0].gallery.subtitle)
         self.assertEqual("W", user_gallery[0].mode)
@@ -747,3 +752,55 @@ class NewImageViewTest(TestCase):
             )
         self.assertEqual(403, response.status_code)
         self.assertEqual(Image.objects.filter(gallery=self.gallery).count(), 0)
+
+
+class AutoUploadGalleryTest(TestCase):
+    def setUp(self):
+        self.profile = ProfileFactory()
+        _, self.forum = create_category_and_forum()
+        self.client.force_login(self.profile.user)
+
+    def test_only_resolved_with_an_editor(self):
+        # no editor on the homepage, so no gallery is looked for
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(200, self.client.get(reverse("homepage")).status_code)
+        self.assertFalse([query for query in queries if 'FROM "gallery_' in query["sql"]])
+        self.assertEqual(0, Gallery.objects.count())
+
+        # the default gallery is created when an editor is displayed
+        response = self.client.get(reverse("topic-new") + f"?forum={self.forum.pk}")
+        gallery = UserGallery.objects.get(user=self.profile.user, is_default=True).gallery
+        self.assertContains(response, f'data-gallery="{gallery.pk}"')
+
+        # then it is found again, with a single query
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("topic-new") + f"?forum={self.forum.pk}")
+        self.assertContains(response, f'data-gallery="{gallery.pk}"')
+        self.assertEqual(1, len([query for query in queries if 'FROM "gallery_' in query["sql"]]))
+        self.assertEqual(1, Gallery.objects.count())
+
+    def test_left_default_gallery(self):
+        other = ProfileFactory()
+        shared_gallery = GalleryFactory()
+        UserGalleryFactory(user=self.profile.user, gallery=shared_gallery, is_default=True)
+        UserGalleryFactory(user=other.user, gallery=shared_gallery)
+        response = self.client.get(reverse("topic-new") + f"?forum={self.forum.pk}")
+        self.assertContains(response, f'data-gallery="{shared_gallery.pk}"')
+
+        # the gallery is not used anymore once the user left it
+        UserGallery.objects.filter(user=self.profile.user, gallery=shared_gallery).delete()
+        response = self.client.get(reverse("topic-new") + f"?forum={self.forum.pk}")
+        gallery = UserGallery.objects.get(user=self.profile.user, is_default=True).gallery
+        self.assertNotEqual(gallery, shared_gallery)
+        self.assertContains(response, f'data-gallery="{gallery.pk}"')
+
+    def test_every_editor(self):
+        gallery = GalleryFactory()
+        UserGalleryFactory(user=self.profile.user, gallery=gallery, is_default=True)
+        response = self.client.get(reverse("update-member"))
+        self.assertContains(response, f'data-gallery="{gallery.pk}"')
+
+        # the gallery of the content on its edit page
+        content = PublishableContentFactory(author_list=[self.profile.user])
+        response = self.client.get(reverse("content:edit", args=[content.pk, content.slug]))
+        self.assertContains(response, f'data-gallery="{content.gallery.pk}"')
@@ -8,6 +8,7 @@ from zds.member.models import (
     KarmaNote,
     NewEmailProvider,
     BannedEmailProvider,
+    UnregistrationJob,
 )
 
 
@@ -75,6 +76,15 @@ class BannedEmailProviderAdmin(admin.ModelAdmin):
     raw_id_fields = ("moderator",)
 
 
+class UnregistrationJobAdmin(admin.ModelAdmin):
+    """Representation of UnregistrationJob model in the admin interface."""
+
+    list_display = ("user", "step", "pubdate")
+    ordering = ("pubdate",)
+    raw_id_fields = ("user",)
+    readonly_fields = ("step",)
+
+
 admin.site.register(Profile, ProfileAdmin)
 admin.site.register(Ban, BanAdmin)
 admin.site.register(TokenRegister, TokenRegisterAdmin)
@@ -82,3 +92,4 @@ admin.site.register(TokenForgotPassword, TokenForgotPasswordAdmin)
 admin.site.register(KarmaNote, KarmaNoteAdmin)
 admin.site.register(NewEmailProvider, NewEmailProviderAdmin)
 admin.site.register(BannedEmailProvider, BannedEmailProviderAdmin)
+admin.site.register(UnregistrationJob, UnregistrationJobAdmin)
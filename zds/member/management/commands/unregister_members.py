@@ -0,0 +1,54 @@
+import logging
+import time
+
+from django.conf import settings
+from django.core.management import BaseCommand
+from django.db import close_old_connections
+
+from zds.member.models import UnregistrationJob
+from zds.member.unregistration import run_unregistration
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Delete the accounts queued when ZDS_APP['member']['deferred_unregistration'] is set"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=settings.ZDS_APP["member"]["unregistration_batch_size"],
+            help="Maximum number of rows changed by each transaction",
+        )
+        parser.add_argument(
+            "--interval",
+            type=int,
+            default=10,
+            help="Number of seconds between two checks of an empty queue, or after a failure",
+        )
+        parser.add_argument("--once", action="store_true", help="Delete the accounts waiting, then exit")
+        parser.add_argument("--stats", action="store_true", help="Display the unregistrations waiting, then exit")
+
+    def handle(self, *args, **options):
+        if options["stats"]:
+            for job in UnregistrationJob.objects.select_related("user").order_by("pubdate"):
+                self.stdout.write(f"{job.user.username}: {job.step} step, requested on {job.pubdate}")
+            return
+
+        while True:
+            # the connection may have been closed by the server while waiting
+            close_old_connections()
+            jobs = list(UnregistrationJob.objects.select_related("user").order_by("pubdate"))
+            failures = 0
+            for job in jobs:
+                try:
+                    run_unregistration(job, options["batch_size"])
+                except Exception:
+                    # retried after the interval, from the step which failed
+                    failures += 1
+                    logger.exception("Unregistration of %s failed at the %s step", job.user.username, job.step)
+            if options["once"]:
+                return
+            if failures or not jobs:
+                time.sleep(options["interval"])
@@ -0,0 +1,33 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+
+from zds.member.models import ProfileStats
+
+
+class Command(BaseCommand):
+    help = "Compute the activity summary displayed on the profile of each member from scratch"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500, help="Number of members computed at once")
+
+    def handle(self, *args, **options):
+        user_pks = list(User.objects.order_by("pk").values_list("pk", flat=True))
+        fields = list(ProfileStats.counters)
+        fixed = 0
+        for start in range(0, len(user_pks), options["batch_size"]):
+            batch = user_pks[start : start + options["batch_size"]]
+            existing = ProfileStats.objects.in_bulk(batch)
+            changed, created = [], []
+            for user_pk, counters in ProfileStats.objects.compute(batch, fields).items():
+                stats = existing.get(user_pk)
+                if stats is None:
+                    created.append(ProfileStats(user_id=user_pk, **counters))
+                elif any(getattr(stats, field) != value for field, value in counters.items()):
+                    for field, value in counters.items():
+                        setattr(stats, field, value)
+                    changed.append(stats)
+            ProfileStats.objects.bulk_update(changed, fields)
+            ProfileStats.objects.bulk_create(created, ignore_conflicts=True)
+            fixed += len(changed)
+            self.stdout.write(f"{start + len(batch)}/{len(user_pks)} members computed")
+        self.stdout.write(f"Done, {fixed} members fixed.")
@@ -2,7 +2,7 @@ from django.db import models
 from django.conf import settings
 from datetime import datetime
 from django.contrib.auth.models import Group
-from django.db.models import Q
+from django.db.models import Count, F, Q
 
 
 class ProfileManager(models.Manager):
@@ -25,3 +25,61 @@ class ProfileManager(models.Manager):
         )
 
         return qs
+
+
+class ProfileStatsManager(models.Manager):
+    def compute(self, user_pks, fields=None):
+        """
+        Counts the activity of the members from scratch.
+
+        :param user_pks: pks of the members
+        :param fields: the counters to compute, all of them by default
+        :return: the counters of each member, by pk
+        :rtype: dict
+        """
+        fields = fields or list(self.model.counters)
+        stats = {pk: dict.fromkeys(fields, 0) for pk in user_pks}
+        for field in fields:
+            get_queryset, user_field, counted_field = self.model.counters[field]
+            counts = (
+                get_queryset(list(stats))
+                .order_by()
+                .values_list(user_field)
+                .annotate(count=Count(counted_field, distinct=True))
+            )
+            for user_pk, count in counts:
+                stats[user_pk][field] = count
+        return stats
+
+    def get_for_user(self, user):
+        """
+        :return: the statistics of the member, computed (and saved) the first time they are needed
+        :rtype: zds.member.models.ProfileStats
+        """
+        try:
+            return self.get(user=user)
+        except self.model.DoesNotExist:
+            stats = self.model(user=user, **self.compute([user.pk])[user.pk])
+            # a concurrent request may have created them in the meantime
+            self.bulk_create([stats], ignore_conflicts=True)
+            return stats
+
+    def refresh(self, user_pks, fields=None):
+        """
+        Computes again some counters of the members who already have statistics.
+
+        :param user_pks: pks of the members
+        :param fields: the counters to compute, all of them by default
+        :return: the number of members updated
+        :rtype: int
+        """
+        user_pks = list(self.filter(user__in=user_pks).values_list("user", flat=True))
+        for user_pk, counters in self.compute(user_pks, fields).items():
+            self.filter(user=user_pk).update(**counters)
+        return len(user_pks)
+
+    def increment(self, user_pk, **deltas):
+        """Adds the deltas to the counters of the member, if they have statistics."""
+        updates = {field: F(field) + delta for field, delta in deltas.items() if delta}
+        if updates:
+            self.filter(user=user_pk).update(**updates)
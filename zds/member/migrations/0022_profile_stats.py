@@ -0,0 +1,53 @@
+# Generated by Django 2.2.24 on 2026-10-18 09:23
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("auth", "0011_update_proxy_permissions"),
+        ("member", "0020_auto_20201018_0841"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ProfileStats",
+            fields=[
+                (
+                    "user",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="profile_stats",
+                        serialize=False,
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="Utilisateur",
+                    ),
+                ),
+                ("post_count", models.IntegerField(default=0, verbose_name="Messages visibles")),
+                ("all_post_count", models.IntegerField(default=0, verbose_name="Messages (y compris masqués)")),
+                ("topic_count", models.IntegerField(default=0, verbose_name="Sujets créés")),
+                ("followed_topic_count", models.IntegerField(default=0, verbose_name="Sujets suivis")),
+                ("tutorial_count", models.IntegerField(default=0, verbose_name="Tutoriels publiés")),
+                ("article_count", models.IntegerField(default=0, verbose_name="Articles publiés")),
+                ("opinion_count", models.IntegerField(default=0, verbose_name="Billets publiés")),
+                (
+                    "contributed_tutorial_count",
+                    models.IntegerField(default=0, verbose_name="Contributions à des tutoriels"),
+                ),
+                (
+                    "contributed_article_count",
+                    models.IntegerField(default=0, verbose_name="Contributions à des articles"),
+                ),
+                ("content_reaction_count", models.IntegerField(default=0, verbose_name="Commentaires")),
+                ("subscriber_count", models.IntegerField(default=0, verbose_name="Abonnés")),
+            ],
+            options={
+                "verbose_name": "Statistiques d'un profil",
+                "verbose_name_plural": "Statistiques des profils",
+            },
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 2.2.24 on 2026-10-18 09:36
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("auth", "0011_update_proxy_permissions"),
+        ("member", "0022_profile_stats"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="UnregistrationJob",
+            fields=[
+                (
+                    "user",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="unregistration",
+                        serialize=False,
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="Membre",
+                    ),
+                ),
+                ("pubdate", models.DateTimeField(auto_now_add=True, verbose_name="Date de la demande")),
+                ("step", models.CharField(default="votes", max_length=20, verbose_name="Étape en cours")),
+            ],
+            options={
+                "verbose_name": "Désinscription en cours",
+                "verbose_name_plural": "Désinscriptions en cours",
+            },
+        ),
+    ]
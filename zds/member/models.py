@@ -4,17 +4,19 @@ from hashlib import md5
 
 from django.conf import settings
 from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
 from django.contrib.gis.geoip2 import GeoIP2
 from django.urls import reverse
 from django.db import models
+from django.db.models.signals import post_delete, post_init, post_save, pre_delete
 from django.dispatch import receiver
 from django.utils.translation import gettext_lazy as _
 
 from zds.forum.models import Post, Topic
-from zds.notification.models import TopicAnswerSubscription
+from zds.notification.models import NewPublicationSubscription, TopicAnswerSubscription
 from zds.member import NEW_PROVIDER_USES
-from zds.member.managers import ProfileManager
-from zds.tutorialv2.models.database import PublishableContent
+from zds.member.managers import ProfileManager, ProfileStatsManager
+from zds.tutorialv2.models.database import ContentContribution, ContentReaction, PublishableContent, PublishedContent
 from zds.utils import old_slugify
 from zds.utils.models import Alert, Licence, Hat
 
@@ -490,6 +492,237 @@ def remove_hats_linked_to_group(sender, instance, **kwargs):
             instance.hats.remove(hat)
 
 
+class ProfileStats(models.Model):
+    """
+    Summary of the activity of a member, displayed on their profile.
+
+    The counters are denormalized: they are computed the first time the profile is displayed, then kept up to date by
+    the receivers below, with ``F()`` updates when possible, or by counting again the ones of the members concerned.
+    The ``update_profile_stats`` command computes them all from scratch.
+    """
+
+    class Meta:
+        verbose_name = "Statistiques d'un profil"
+        verbose_name_plural = "Statistiques des profils"
+
+    user = models.OneToOneField(
+        User, verbose_name="Utilisateur", primary_key=True, related_name="profile_stats", on_delete=models.CASCADE
+    )
+    post_count = models.IntegerField("Messages visibles", default=0)
+    all_post_count = models.IntegerField("Messages (y compris masqués)", default=0)
+    topic_count = models.IntegerField("Sujets créés", default=0)
+    followed_topic_count = models.IntegerField("Sujets suivis", default=0)
+    tutorial_count = models.IntegerField("Tutoriels publiés", default=0)
+    article_count = models.IntegerField("Articles publiés", default=0)
+    opinion_count = models.IntegerField("Billets publiés", default=0)
+    contributed_tutorial_count = models.IntegerField("Contributions à des tutoriels", default=0)
+    contributed_article_count = models.IntegerField("Contributions à des articles", default=0)
+    content_reaction_count = models.IntegerField("Commentaires", default=0)
+    subscriber_count = models.IntegerField("Abonnés", default=0)
+
+    objects = ProfileStatsManager()
+
+    # for each counter: the queryset of what is counted for the given members, the field of the member in it, and
+    # the field whose distinct values are counted
+    counters = {
+        "post_count": (lambda pks: Post.objects.filter(author__in=pks, is_visible=True), "author", "pk"),
+        "all_post_count": (lambda pks: Post.objects.filter(author__in=pks), "author", "pk"),
+        "topic_count": (lambda pks: Topic.objects.filter(author__in=pks), "author", "pk"),
+        "followed_topic_count": (
+            lambda pks: TopicAnswerSubscription.objects.filter(
+                user__in=pks,
+                is_active=True,
+                content_type=ContentType.objects.get_for_model(Topic),
+                object_id__in=Topic.objects.values("pk"),
+            ),
+            "user",
+            "object_id",
+        ),
+        "tutorial_count": (
+            lambda pks: PublishableContent.objects.filter(public_version__authors__in=pks, type="TUTORIAL"),
+            "public_version__authors",
+            "pk",
+        ),
+        "article_count": (
+            lambda pks: PublishableContent.objects.filter(public_version__authors__in=pks, type="ARTICLE"),
+            "public_version__authors",
+            "pk",
+        ),
+        "opinion_count": (
+            lambda pks: PublishableContent.objects.filter(public_version__authors__in=pks, type="OPINION"),
+            "public_version__authors",
+            "pk",
+        ),
+        "contributed_tutorial_count": (
+            lambda pks: ContentContribution.objects.filter(
+                user__in=pks, content__public_version__isnull=False, content__type="TUTORIAL"
+            ),
+            "user",
+            "content",
+        ),
+        "contributed_article_count": (
+            lambda pks: ContentContribution.objects.filter(
+                user__in=pks, content__public_version__isnull=False, content__type="ARTICLE"
+            ),
+            "user",
+            "content",
+        ),
+        "content_reaction_count": (lambda pks: ContentReaction.objects.filter(author__in=pks), "author", "pk"),
+        "subscriber_count": (
+            lambda pks: NewPublicationSubscription.objects.filter(
+                object_id__in=pks, content_type=ContentType.objects.get_for_model(User), is_active=True
+            ),
+            "object_id",
+            "pk",
+        ),
+    }
+    content_counters = [
+        "tutorial_count",
+        "article_count",
+        "opinion_count",
+        "contributed_tutorial_count",
+        "contributed_article_count",
+    ]
+
+    def __str__(self):
+        return f"Stats of {self.user.username}"
+
+
+@receiver(post_init, sender=Post)
+def remember_post_visibility(sender, instance, **kwargs):
+    # the posts are saved for each vote and edit, their counter is only updated when they are hidden or shown again
+    instance._was_visible = instance.__dict__.get("is_visible")
+
+
+@receiver(post_save, sender=Post)
+def update_stats_on_post_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        ProfileStats.objects.increment(instance.author_id, all_post_count=1, post_count=int(instance.is_visible))
+    elif instance._was_visible is None:  # loaded without this field
+        ProfileStats.objects.refresh([instance.author_id], ["post_count"])
+    elif instance.is_visible != instance._was_visible:
+        ProfileStats.objects.increment(instance.author_id, post_count=1 if instance.is_visible else -1)
+    instance._was_visible = instance.is_visible
+
+
+@receiver(post_delete, sender=Post)
+def update_stats_on_post_delete(sender, instance, **kwargs):
+    ProfileStats.objects.increment(instance.author_id, all_post_count=-1, post_count=-int(instance.is_visible))
+
+
+@receiver(post_save, sender=Topic)
+def update_stats_on_topic_save(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        ProfileStats.objects.increment(instance.author_id, topic_count=1)
+
+
+@receiver(post_delete, sender=Topic)
+def update_stats_on_topic_delete(sender, instance, **kwargs):
+    ProfileStats.objects.increment(instance.author_id, topic_count=-1)
+    followers = TopicAnswerSubscription.objects.filter(
+        content_type=ContentType.objects.get_for_model(Topic), object_id=instance.pk, is_active=True
+    ).values_list("user", flat=True)
+    ProfileStats.objects.refresh(followers, ["followed_topic_count"])
+
+
+@receiver(post_save, sender=ContentReaction)
+def update_stats_on_reaction_save(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        ProfileStats.objects.increment(instance.author_id, content_reaction_count=1)
+
+
+@receiver(post_delete, sender=ContentReaction)
+def update_stats_on_reaction_delete(sender, instance, **kwargs):
+    ProfileStats.objects.increment(instance.author_id, content_reaction_count=-1)
+
+
+@receiver(post_init, sender=TopicAnswerSubscription)
+@receiver(post_init, sender=NewPublicationSubscription)
+def remember_subscription_state(sender, instance, **kwargs):
+    # the subscriptions are saved for each notification, their counters are only updated when they are (de)activated
+    instance._was_active = instance.__dict__.get("is_active")
+
+
+def _update_subscription_stats(instance):
+    if isinstance(instance, TopicAnswerSubscription):
+        ProfileStats.objects.refresh([instance.user_id], ["followed_topic_count"])
+    elif instance.content_type_id == ContentType.objects.get_for_model(User).pk:
+        ProfileStats.objects.refresh([instance.object_id], ["subscriber_count"])
+
+
+@receiver(post_save, sender=TopicAnswerSubscription)
+@receiver(post_save, sender=NewPublicationSubscription)
+def update_stats_on_subscription_save(sender, instance, created, raw=False, **kwargs):
+    if raw or (not created and instance.is_active == instance._was_active):
+        return
+    instance._was_active = instance.is_active
+    _update_subscription_stats(instance)
+
+
+@receiver(post_delete, sender=TopicAnswerSubscription)
+@receiver(post_delete, sender=NewPublicationSubscription)
+def update_stats_on_subscription_delete(sender, instance, **kwargs):
+    if instance.is_active:
+        _update_subscription_stats(instance)
+
+
+def _get_content_users(content):
+    user_pks = set(content.authors.values_list("pk", flat=True))
+    user_pks.update(ContentContribution.objects.filter(content=content).values_list("user", flat=True))
+    if content.public_version_id is not None:
+        user_pks.update(content.public_version.authors.values_list("pk", flat=True))
+    return user_pks
+
+
+@receiver(post_save, sender=PublishableContent)
+def update_stats_on_content_save(sender, instance, raw=False, **kwargs):
+    # saved with its public version on publication (the unpublication deletes the public version)
+    if not raw and instance.public_version_id is not None:
+        ProfileStats.objects.refresh(_get_content_users(instance), ProfileStats.content_counters)
+
+
+@receiver(pre_delete, sender=PublishedContent)
+def remember_public_version_users(sender, instance, **kwargs):
+    instance._user_pks = set(instance.authors.values_list("pk", flat=True))
+    instance._user_pks.update(
+        ContentContribution.objects.filter(content_id=instance.content_id).values_list("user", flat=True)
+    )
+
+
+@receiver(post_delete, sender=PublishedContent)
+def update_stats_on_public_version_delete(sender, instance, **kwargs):
+    ProfileStats.objects.refresh(instance._user_pks, ProfileStats.content_counters)
+
+
+@receiver(post_save, sender=ContentContribution)
+@receiver(post_delete, sender=ContentContribution)
+def update_stats_on_contribution_change(sender, instance, raw=False, **kwargs):
+    if not raw:
+        ProfileStats.objects.refresh([instance.user_id], ["contributed_tutorial_count", "contributed_article_count"])
+
+
+class UnregistrationJob(models.Model):
+    """
+    The unregistration of a member, waiting to be done or in progress (see ``zds.member.unregistration``). It is
+    deleted with the account, at the end.
+    """
+
+    class Meta:
+        verbose_name = "Désinscription en cours"
+        verbose_name_plural = "Désinscriptions en cours"
+
+    user = models.OneToOneField(
+        User, verbose_name="Membre", primary_key=True, related_name="unregistration", on_delete=models.CASCADE
+    )
+    pubdate = models.DateTimeField("Date de la demande", auto_now_add=True)
+    step = models.CharField("Étape en cours", max_length=20, default="votes")
+
+    def __str__(self):
+        return f"Unregistration of {self.user.username} ({self.step})"
+
+
 def remove_old_smileys_cookie(response):
     """Remove the Clem smileys cookie by immediate expiration
 
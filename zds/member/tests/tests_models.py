@@ -1,15 +1,21 @@
 from datetime import datetime, timedelta
+from io import StringIO
 
 from django.conf import settings
+from django.core.management import call_command
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth.models import Group
 from hashlib import md5
 
 from zds.forum.factories import ForumCategoryFactory, ForumFactory, TopicFactory, PostFactory
-from zds.notification.models import TopicAnswerSubscription
+from zds.forum.models import Post
+from zds.notification.models import NewPublicationSubscription, TopicAnswerSubscription
 from zds.member.factories import ProfileFactory, StaffProfileFactory, DevProfileFactory
-from zds.member.models import TokenForgotPassword, TokenRegister, Profile
-from zds.tutorialv2.factories import PublishableContentFactory, PublishedContentFactory
+from zds.member.models import TokenForgotPassword, TokenRegister, Profile, ProfileStats
+from zds.tutorialv2.factories import ContentReactionFactory, PublishableContentFactory, PublishedContentFactory
+from zds.tutorialv2.models.database import ContentContribution, ContentContributionRole, PublishedContent
 from zds.tutorialv2.tests import TutorialTestMixin, override_for_contents
 from zds.gallery.factories import GalleryFactory, ImageFactory
 from zds.utils.models import Alert, Hat
@@ -432,6 +438,119 @@ class MemberModelsTest(TutorialTestMixin, TestCase):
         self.assertNotIn(hat, self.user1.hats.all())
 
 
+@override_for_contents()
+class ProfileStatsTest(TutorialTestMixin, TestCase):
+    def setUp(self):
+        self.user = ProfileFactory().user
+        self.other = ProfileFactory().user
+        self.forum = ForumFactory(category=ForumCategoryFactory())
+
+    def assertStatsUpToDate(self, user, **expected):
+        stats = ProfileStats.objects.get(user=user)
+        counters = {field: getattr(stats, field) for field in ProfileStats.counters}
+        self.assertEqual(counters, ProfileStats.objects.compute([user.pk])[user.pk])
+        self.assertEqual({field: counters[field] for field in expected}, expected)
+
+    def publish(self, content, authors):
+        public_version = PublishedContent.objects.create(
+            content=content, content_type=content.type, content_pk=content.pk, content_public_slug=content.slug
+        )
+        public_version.authors.add(*authors)
+        content.public_version = public_version
+        content.sha_public = content.sha_draft
+        content.save()
+        return public_version
+
+    def test_computed_on_first_use(self):
+        topic = TopicFactory(forum=self.forum, author=self.user)
+        PostFactory(topic=topic, author=self.user, position=1)
+        self.assertFalse(ProfileStats.objects.filter(user=self.user).exists())
+
+        stats = ProfileStats.objects.get_for_user(self.user)
+        self.assertEqual((stats.topic_count, stats.post_count, stats.all_post_count), (1, 1, 1))
+        self.assertStatsUpToDate(self.user, topic_count=1, post_count=1)
+        with self.assertNumQueries(1):
+            ProfileStats.objects.get_for_user(self.user)
+
+    def test_forum_activity(self):
+        ProfileStats.objects.get_for_user(self.user)
+        topic = TopicFactory(forum=self.forum, author=self.user)
+        PostFactory(topic=topic, author=self.user, position=1)
+        post = PostFactory(topic=topic, author=self.user, position=2)
+        self.assertStatsUpToDate(self.user, topic_count=1, post_count=2, all_post_count=2)
+
+        # saved for each vote and edit, without being hidden
+        with CaptureQueriesContext(connection) as queries:
+            post.save()
+        self.assertFalse(any("member_profilestats" in query["sql"] for query in queries))
+
+        post.is_visible = False
+        post.save()
+        post.save()
+        self.assertStatsUpToDate(self.user, post_count=1, all_post_count=2)
+        post = Post.objects.get(pk=post.pk)
+        post.is_visible = True
+        post.save()
+        self.assertStatsUpToDate(self.user, post_count=2, all_post_count=2)
+
+        topic.delete()
+        self.assertStatsUpToDate(self.user, topic_count=0, post_count=0, all_post_count=0)
+
+    def test_followed_topics(self):
+        ProfileStats.objects.get_for_user(self.user)
+        topic = TopicFactory(forum=self.forum, author=self.other)
+        PostFactory(topic=topic, author=self.other, position=1)
+        subscription = TopicAnswerSubscription.objects.get_or_create_active(self.user, topic)
+        self.assertStatsUpToDate(self.user, followed_topic_count=1)
+
+        # saved for each notification, without being (de)activated
+        with CaptureQueriesContext(connection) as queries:
+            subscription.save()
+        self.assertFalse(any("member_profilestats" in query["sql"] for query in queries))
+
+        subscription.deactivate()
+        self.assertStatsUpToDate(self.user, followed_topic_count=0)
+        subscription.activate()
+        topic.delete()
+        self.assertStatsUpToDate(self.user, followed_topic_count=0)
+
+    def test_subscribers(self):
+        ProfileStats.objects.get_for_user(self.user)
+        NewPublicationSubscription.objects.toggle_follow(self.user, self.other)
+        self.assertStatsUpToDate(self.user, subscriber_count=1)
+        NewPublicationSubscription.objects.toggle_follow(self.user, self.other)
+        self.assertStatsUpToDate(self.user, subscriber_count=0)
+
+    def test_contents(self):
+        ProfileStats.objects.get_for_user(self.user)
+        ProfileStats.objects.get_for_user(self.other)
+        article = PublishableContentFactory(type="ARTICLE", author_list=[self.user])
+        role = ContentContributionRole.objects.create(title="Relecteur")
+        ContentContribution.objects.create(contribution_role=role, user=self.other, content=article)
+        self.assertStatsUpToDate(self.user, article_count=0)
+        self.assertStatsUpToDate(self.other, contributed_article_count=0)
+
+        public_version = self.publish(article, [self.user])
+        self.assertStatsUpToDate(self.user, article_count=1, tutorial_count=0)
+        self.assertStatsUpToDate(self.other, contributed_article_count=1)
+
+        ContentReactionFactory(related_content=article, author=self.other, position=1)
+        self.assertStatsUpToDate(self.other, content_reaction_count=1)
+
+        public_version.delete()
+        self.assertStatsUpToDate(self.user, article_count=0)
+        self.assertStatsUpToDate(self.other, contributed_article_count=0, content_reaction_count=1)
+
+    def test_update_command(self):
+        TopicFactory(forum=self.forum, author=self.user)
+        ProfileStats.objects.get_for_user(self.user)
+        ProfileStats.objects.filter(user=self.user).update(topic_count=42)
+
+        call_command("update_profile_stats", batch_size=1, stdout=StringIO())
+        self.assertStatsUpToDate(self.user, topic_count=1)
+        self.assertStatsUpToDate(self.other, topic_count=0)
+
+
 class TestTokenForgotPassword(TestCase):
     def setUp(self):
         self.user1 = ProfileFactory()
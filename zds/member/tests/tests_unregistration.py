@@ -0,0 +1,117 @@
+from copy import deepcopy
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import DatabaseError
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from zds.forum.factories import ForumCategoryFactory, ForumFactory, PostFactory, TopicFactory
+from zds.forum.models import Post, Topic
+from zds.gallery.factories import GalleryFactory, UserGalleryFactory
+from zds.gallery.models import UserGallery
+from zds.member.factories import ProfileFactory, UserFactory
+from zds.member.models import ProfileStats, UnregistrationJob
+from zds.member.unregistration import run_unregistration
+from zds.mp.factories import PrivatePostFactory, PrivateTopicFactory
+from zds.mp.models import PrivateTopic
+from zds.utils.models import CommentVote
+
+overridden_zds_app = deepcopy(settings.ZDS_APP)
+overridden_zds_app["member"]["deferred_unregistration"] = True
+
+
+class UnregistrationTest(TestCase):
+    def setUp(self):
+        self.anonymous = UserFactory(username=settings.ZDS_APP["member"]["anonymous_account"])
+        self.external = UserFactory(username=settings.ZDS_APP["member"]["external_account"])
+        self.user = ProfileFactory().user
+        self.other = ProfileFactory().user
+
+        self.topic = TopicFactory(forum=ForumFactory(category=ForumCategoryFactory()), author=self.user)
+        for position in range(1, 4):
+            PostFactory(topic=self.topic, author=self.user, position=position)
+        self.voted = PostFactory(topic=self.topic, author=self.other, position=4)
+        CommentVote.objects.create(user=self.user, comment=self.voted, positive=True)
+        CommentVote.objects.create(user=self.anonymous, comment=self.voted, positive=True)
+        Post.objects.filter(pk=self.voted.pk).update(like=2)
+
+    def unregister(self):
+        self.client.force_login(self.user)
+        response = self.client.post(reverse("member-unregister"))
+        self.assertRedirects(response, reverse("homepage"), fetch_redirect_response=False)
+
+    @override_settings(ZDS_APP=overridden_zds_app)
+    def test_deferred(self):
+        private_topic = PrivateTopicFactory(author=self.user)
+        private_topic.participants.add(self.other)
+        PrivatePostFactory(author=self.user, privatetopic=private_topic, position_in_topic=1)
+        alone_gallery = GalleryFactory()
+        UserGalleryFactory(user=self.user, gallery=alone_gallery)
+        ProfileStats.objects.get_for_user(self.anonymous)
+
+        self.unregister()
+
+        # logged out and closed at once, but deleted by the command
+        self.assertFalse(User.objects.get(pk=self.user.pk).is_active)
+        self.assertEqual(UnregistrationJob.objects.get().step, "votes")
+        self.assertFalse(self.client.get(reverse("homepage")).wsgi_request.user.is_authenticated)
+
+        call_command("unregister_members", once=True, batch_size=2, stdout=StringIO())
+
+        self.assertFalse(User.objects.filter(pk=self.user.pk).exists())
+        self.assertFalse(UnregistrationJob.objects.exists())
+        self.assertEqual(Topic.objects.get(pk=self.topic.pk).author, self.anonymous)
+        self.assertEqual(Post.objects.filter(author=self.anonymous).count(), 3)
+        self.assertEqual(Post.objects.get(pk=self.voted.pk).like, 1)
+        self.assertEqual(PrivateTopic.objects.get(pk=private_topic.pk).author, self.other)
+        self.assertEqual(UserGallery.objects.get(gallery=alone_gallery).user, self.external)
+        stats = ProfileStats.objects.get(user=self.anonymous)
+        self.assertEqual((stats.topic_count, stats.post_count), (1, 3))
+
+    @override_settings(ZDS_APP=overridden_zds_app)
+    def test_chunks(self):
+        self.unregister()
+        with self.assertLogs("zds.member.unregistration", "INFO") as logs:
+            run_unregistration(UnregistrationJob.objects.get(), batch_size=2)
+
+        # the 3 posts then the topic
+        anonymized = [line.rsplit(":", 1)[1] for line in logs.output if "(anonymize)" in line]
+        self.assertEqual(anonymized, [" 2 rows done", " 1 rows done", " 1 rows done"])
+        self.assertIn(f"INFO:zds.member.unregistration:Unregistration of {self.user.username} done", logs.output)
+
+    @override_settings(ZDS_APP=overridden_zds_app)
+    def test_resumed(self):
+        UserGalleryFactory(user=self.user, gallery=GalleryFactory())
+        self.unregister()
+
+        with mock.patch("zds.member.unregistration.UserGallery.objects.bulk_create", side_effect=DatabaseError):
+            with self.assertLogs("zds.member.management.commands.unregister_members", "ERROR"):
+                call_command("unregister_members", once=True, stdout=StringIO())
+        self.assertEqual(UnregistrationJob.objects.get().step, "galleries")
+        self.assertEqual(Post.objects.filter(author=self.anonymous).count(), 3)
+
+        call_command("unregister_members", once=True, stdout=StringIO())
+        self.assertFalse(User.objects.filter(pk=self.user.pk).exists())
+        self.assertEqual(UserGallery.objects.get().user, self.external)
+
+    @override_settings(ZDS_APP=overridden_zds_app)
+    def test_failure_waits(self):
+        self.unregister()
+
+        # a failing job is only retried after the interval
+        command = "zds.member.management.commands.unregister_members"
+        with mock.patch(f"{command}.run_unregistration", side_effect=DatabaseError) as run:
+            with mock.patch(f"{command}.time.sleep", side_effect=KeyboardInterrupt) as sleep:
+                with self.assertLogs(command, "ERROR"):
+                    with self.assertRaises(KeyboardInterrupt):
+                        call_command("unregister_members", interval=5, stdout=StringIO())
+        self.assertEqual(run.call_count, 1)
+        sleep.assert_called_once_with(5)
+
+    def test_not_deferred(self):
+        self.unregister()
+        self.assertFalse(User.objects.filter(pk=self.user.pk).exists())
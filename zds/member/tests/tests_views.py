@@ -142,6 +142,21 @@ class MemberTests(TutorialTestMixin, TestCase):
         result = self.client.get(reverse("member-detail", args=["unknown_user"]), follow=False)
         self.assertEqual(result.status_code, 404)
 
+    def test_details_member_activity(self):
+        user = ProfileFactory().user
+        topic = TopicFactory(forum=self.forum11, author=user)
+        PostFactory(topic=topic, author=user, position=1)
+        PostFactory(topic=topic, author=user, position=2, is_visible=False)
+
+        result = self.client.get(reverse("member-detail", args=[user.username]))
+        self.assertEqual((result.context["stats"].topic_count, result.context["stats"].post_count), (1, 1))
+        self.assertIn((reverse("post-find", args=[user.pk]), 1, "message"), result.context["summaries"][1])
+
+        # kept up to date once computed
+        PostFactory(topic=topic, author=user, position=3)
+        result = self.client.get(reverse("member-detail", args=[user.username]))
+        self.assertIn((reverse("post-find", args=[user.pk]), 2, "messages"), result.context["summaries"][1])
+
     def test_redirection_when_using_old_detail_member_url(self):
         """
         To test the redirection when accessing the member profile through the old url
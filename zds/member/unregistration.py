@@ -0,0 +1,197 @@
+"""
+Unregistration of the members.
+
+The ``unregister`` view only deactivates the account (which closes all its sessions), revokes its API tokens and
+queues an ``UnregistrationJob``. The job then anonymizes the messages of the member and deletes the account, step by
+step: each step changes at most ``ZDS_APP["member"]["unregistration_batch_size"]`` rows per transaction, until there
+is nothing left to change, so that the account of a prolific member never locks the tables for long. The current step
+is saved, and all of them can be repeated, so an interrupted job resumes where it stopped.
+
+The jobs are run by the ``unregister_members`` command if ``ZDS_APP["member"]["deferred_unregistration"]`` is set,
+right away by the view otherwise.
+"""
+
+import logging
+
+from oauth2_provider.models import AccessToken
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Count, IntegerField, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+from zds.forum.models import Post, Topic, TopicRead
+from zds.gallery.models import UserGallery
+from zds.member.models import Ban, BannedEmailProvider, KarmaNote, ProfileStats, UnregistrationJob
+from zds.mp.models import PrivatePost, PrivateTopic, PrivateTopicRead
+from zds.notification.models import Notification, Subscription
+from zds.searchv2.models import ESIndexChange
+from zds.tutorialv2.models.database import ContentRead, PickListOperation
+from zds.utils.models import Alert, Comment, CommentEdit, CommentVote, HatRequest
+
+logger = logging.getLogger(__name__)
+
+# (model, field): the rows whose field points to the member are given to the anonymous account
+ANONYMIZED_FIELDS = [
+    (PickListOperation, "staff_user"),
+    (PickListOperation, "canceler_user"),
+    (Comment, "author"),
+    (PrivatePost, "author"),
+    (CommentEdit, "editor"),
+    (CommentEdit, "deleted_by"),
+    (KarmaNote, "moderator"),
+    (Ban, "moderator"),
+    (Alert, "author"),
+    (Alert, "moderator"),
+    (BannedEmailProvider, "moderator"),
+    (HatRequest, "moderator"),
+    (Comment, "editor"),
+    (Topic, "solved_by"),
+    (Topic, "author"),
+]
+
+# (model, field): the rows whose field points to the member are deleted before the account, rather than by its cascade
+DELETED_FIELDS = [
+    (ProfileStats, "user"),
+    (TopicRead, "user"),
+    (ContentRead, "user"),
+    (PrivateTopicRead, "user"),
+    (Notification, "sender"),
+    (Subscription, "user"),
+]
+
+
+def queue_unregistration(user):
+    """
+    Closes the account: the member can no longer log in, and is logged out everywhere. Then deletes it, later if
+    ``ZDS_APP["member"]["deferred_unregistration"]`` is set, right away otherwise.
+
+    :param user: the unregistering member
+    :type user: django.contrib.auth.models.User
+    """
+    with transaction.atomic():
+        User.objects.filter(pk=user.pk).update(is_active=False)
+        for token in AccessToken.objects.filter(user=user):
+            token.revoke()
+        job, _ = UnregistrationJob.objects.get_or_create(user=user)
+    if not settings.ZDS_APP["member"]["deferred_unregistration"]:
+        run_unregistration(job)
+
+
+def run_unregistration(job, batch_size=None):
+    """
+    Runs the steps of the job, from the current one.
+
+    :param job: the job, deleted with the account at the end
+    :type job: zds.member.models.UnregistrationJob
+    :param batch_size: the maximum number of rows changed by each transaction
+    :type batch_size: int
+    """
+    batch_size = batch_size or settings.ZDS_APP["member"]["unregistration_batch_size"]
+    username = job.user.username
+    names = [name for name, _ in STEPS]
+    for name, step in STEPS[names.index(job.step) :]:
+        if job.step != name:
+            job.step = name
+            job.save(update_fields=["step"])
+        while True:
+            with transaction.atomic():
+                count = step(job, batch_size)
+            if not count:
+                break
+            logger.info("Unregistration of %s (%s): %s rows done", username, name, count)
+    logger.info("Unregistration of %s done", username)
+
+
+def _get_account(setting):
+    return User.objects.get(username=settings.ZDS_APP["member"][setting])
+
+
+def _remove_votes(job, batch_size):
+    votes = list(CommentVote.objects.filter(user=job.user_id).values_list("pk", "comment")[:batch_size])
+    comment_pks = {comment_pk for _, comment_pk in votes}
+    CommentVote.objects.filter(pk__in=[pk for pk, _ in votes]).delete()
+
+    # the number of likes and dislikes of these comments are counted again from their remaining votes
+    def count_votes(positive):
+        votes = CommentVote.objects.filter(comment=OuterRef("pk"), positive=positive).order_by()
+        counts = votes.values("comment").annotate(count=Count("pk")).values("count")
+        return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+    Comment.objects.filter(pk__in=comment_pks).update(like=count_votes(True), dislike=count_votes(False))
+    post_pks = list(Post.objects.filter(pk__in=comment_pks).values_list("pk", flat=True))
+    Post.objects.filter(pk__in=post_pks).update(es_flagged=True)
+    ESIndexChange.objects.enqueue(Post, post_pks)
+    return len(votes)
+
+
+def _anonymize(job, batch_size):
+    anonymous = _get_account("anonymous_account")
+    for model, field in ANONYMIZED_FIELDS:
+        pks = list(model.objects.filter(**{field: job.user_id}).values_list("pk", flat=True)[:batch_size])
+        if pks:
+            model.objects.filter(pk__in=pks).update(**{field: anonymous})
+            return len(pks)
+    return 0
+
+
+def _leave_private_topics(job, batch_size):
+    topics = PrivateTopic.objects.filter(Q(author=job.user_id) | Q(participants__in=[job.user_id])).distinct()
+    topics = list(topics[:batch_size])
+    for topic in topics:
+        if topic.one_participant_remaining():
+            topic.delete()
+        else:
+            topic.remove_participant(job.user)
+            topic.save()
+    return len(topics)
+
+
+def _give_galleries(job, batch_size):
+    # the galleries of the member alone are given to the external account, so that their images are not lost
+    user_galleries = list(UserGallery.objects.filter(user=job.user_id).values_list("pk", "gallery")[:batch_size])
+    gallery_pks = [gallery_pk for _, gallery_pk in user_galleries]
+    shared = set(
+        UserGallery.objects.filter(gallery__in=gallery_pks).exclude(user=job.user_id).values_list("gallery", flat=True)
+    )
+    external = _get_account("external_account")
+    UserGallery.objects.bulk_create(
+        [UserGallery(user=external, mode="w", gallery_id=pk) for pk in gallery_pks if pk not in shared]
+    )
+    UserGallery.objects.filter(pk__in=[pk for pk, _ in user_galleries]).delete()
+    return len(user_galleries)
+
+
+def _delete_related(job, batch_size):
+    for model, field in DELETED_FIELDS:
+        pks = list(model.objects.filter(**{field: job.user_id}).values_list("pk", flat=True)[:batch_size])
+        if pks:
+            model.objects.filter(pk__in=pks).delete()
+            return len(pks)
+    return 0
+
+
+def _delete_account(job, batch_size):
+    # the contents of the member are handled by a receiver of the deletion, and the job is deleted with the account
+    User.objects.filter(pk=job.user_id).delete()
+    # the messages and contents were given to these accounts without any signal
+    ProfileStats.objects.refresh(
+        User.objects.filter(
+            username__in=[
+                settings.ZDS_APP["member"]["anonymous_account"],
+                settings.ZDS_APP["member"]["external_account"],
+            ]
+        ).values_list("pk", flat=True)
+    )
+    return 0
+
+
+STEPS = [
+    ("votes", _remove_votes),
+    ("anonymize", _anonymize),
+    ("private_topics", _leave_private_topics),
+    ("galleries", _give_galleries),
+    ("related", _delete_related),
+    ("account", _delete_account),
+]
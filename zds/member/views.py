@@ -2,8 +2,6 @@ import uuid
 from datetime import datetime, timedelta
 from urllib.parse import unquote
 
-from oauth2_provider.models import AccessToken
-
 from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth import authenticate, login, logout
@@ -27,7 +25,6 @@ from django.views.generic import DetailView, UpdateView, CreateView, FormView, V
 
 from zds.forum.models import Topic, TopicRead
 from zds.gallery.forms import ImageAsAvatarForm
-from zds.gallery.models import UserGallery
 from zds.member import NEW_ACCOUNT, EMAIL_EDIT
 from zds.member.commons import (
     ProfileCreate,
@@ -57,6 +54,7 @@ from zds.member.forms import (
 )
 from zds.member.models import (
     Profile,
+    ProfileStats,
     TokenForgotPassword,
     TokenRegister,
     KarmaNote,
@@ -66,16 +64,12 @@ from zds.member.models import (
     set_old_smileys_cookie,
     remove_old_smileys_cookie,
 )
-from zds.mp.models import PrivatePost, PrivateTopic
-from zds.notification.models import TopicAnswerSubscription, NewPublicationSubscription
+from zds.member.unregistration import queue_unregistration
+from zds.notification.models import TopicAnswerSubscription
 from zds.pages.models import GroupContact
-from zds.tutorialv2.models import CONTENT_TYPES
-from zds.tutorialv2.models.database import PublishedContent, PickListOperation, ContentContribution, ContentReaction
+from zds.tutorialv2.models.database import PublishedContent
 from zds.utils.models import (
-    Comment,
-    CommentVote,
     Alert,
-    CommentEdit,
     Hat,
     HatRequest,
     get_hat_from_settings,
@@ -112,7 +106,7 @@ class MemberDetail(DetailView):
         # sent through emarkdown parser).
         return get_object_or_404(User, username=unquote(self.kwargs["user_name"]))
 
-    def get_summaries(self, profile):
+    def get_summaries(self, profile, stats):
         """
         Returns a summary of this profile's activity, as a list of list of tuples.
         Each first-level list item is an activity category (e.g. contents, forums, etc.)
@@ -120,20 +114,22 @@ class MemberDetail(DetailView):
         Each tuple is (link url, count, displayed name of the item), where the link url can be None if it's not a link.
 
         :param profile: The profile.
+        :param stats: The activity statistics of the profile.
+        :type stats: zds.member.models.ProfileStats
         :return: The summary data.
         """
         summaries = []
 
         if self.request.user.has_perm("member.change_post"):
-            count_post = profile.get_post_count_as_staff()
+            count_post = stats.all_post_count
         else:
-            count_post = profile.get_post_count()
+            count_post = stats.post_count
 
-        count_topic = profile.get_topic_count()
-        count_followed_topic = profile.get_followed_topic_count()
-        count_tutorials = profile.get_public_tutos().count()
-        count_articles = profile.get_public_articles().count()
-        count_opinions = profile.get_public_opinions().count()
+        count_topic = stats.topic_count
+        count_followed_topic = stats.followed_topic_count
+        count_tutorials = stats.tutorial_count
+        count_articles = stats.article_count
+        count_opinions = stats.opinion_count
 
         summary = []
         if count_tutorials + count_articles + count_opinions == 0:
@@ -184,8 +180,7 @@ class MemberDetail(DetailView):
                     __("sujet{} créé{}").format(pluralize_fr(count_topic), pluralize_fr(count_topic)),
                 )
             )
-        user = self.request.user
-        is_user_profile = user.is_authenticated and User.objects.get(pk=user.pk).profile == profile
+        is_user_profile = self.request.user.pk == profile.user_id
         if count_followed_topic > 0 and is_user_profile:
             summary.append(
                 (
@@ -216,24 +211,12 @@ class MemberDetail(DetailView):
         context["tutorials"] = PublishedContent.objects.last_tutorials_of_a_member_loaded(usr)
         context["articles_and_tutorials"] = PublishedContent.objects.last_tutorials_and_articles_of_a_member_loaded(usr)
         context["topic_read"] = TopicRead.objects.list_read_topic_pk(self.request.user, context["topics"])
-        context["subscriber_count"] = NewPublicationSubscription.objects.get_subscriptions(self.object).count()
-        context["contribution_articles_count"] = (
-            ContentContribution.objects.filter(
-                user__pk=usr.pk, content__sha_public__isnull=False, content__type=CONTENT_TYPES[1]["name"]
-            )
-            .values_list("content", flat=True)
-            .distinct()
-            .count()
-        )
-        context["contribution_tutorials_count"] = (
-            ContentContribution.objects.filter(
-                user__pk=usr.pk, content__sha_public__isnull=False, content__type=CONTENT_TYPES[0]["name"]
-            )
-            .values_list("content", flat=True)
-            .distinct()
-            .count()
-        )
-        context["content_reactions_count"] = ContentReaction.objects.filter(author=usr).count()
+        stats = ProfileStats.objects.get_for_user(usr)
+        context["stats"] = stats
+        context["subscriber_count"] = stats.subscriber_count
+        context["contribution_articles_count"] = stats.contributed_article_count
+        context["contribution_tutorials_count"] = stats.contributed_tutorial_count
+        context["content_reactions_count"] = stats.content_reaction_count
 
         if self.request.user.has_perm("member.change_profile"):
             sanctions = list(Ban.objects.filter(user=usr).select_related("moderator"))
@@ -246,7 +229,7 @@ class MemberDetail(DetailView):
             context["alerts"] = profile.alerts_on_this_profile.all().order_by("-pubdate")
             context["has_unsolved_alerts"] = profile.alerts_on_this_profile.filter(solved=False).exists()
 
-        context["summaries"] = self.get_summaries(profile)
+        context["summaries"] = self.get_summaries(profile, stats)
         return context
 
 
@@ -616,78 +599,15 @@ def warning_unregister(request):
 
 @login_required
 @require_POST
-@transaction.atomic
 def unregister(request):
-    """Allow members to unregister."""
+    """
+    Allow members to unregister: they are logged out at once, their account is closed then anonymized and deleted,
+    possibly in the background (see ``zds.member.unregistration``).
+    """
 
-    anonymous = get_object_or_404(User, username=settings.ZDS_APP["member"]["anonymous_account"])
-    external = get_object_or_404(User, username=settings.ZDS_APP["member"]["external_account"])
     current = request.user
-    # Nota : as of v21 all about content paternity is held by a proper receiver in zds.tutorialv2.models.database
-    PickListOperation.objects.filter(staff_user=current).update(staff_user=anonymous)
-    PickListOperation.objects.filter(canceler_user=current).update(canceler_user=anonymous)
-    # Comments likes / dislikes
-    votes = CommentVote.objects.filter(user=current)
-    for vote in votes:
-        if vote.positive:
-            vote.comment.like -= 1
-        else:
-            vote.comment.dislike -= 1
-        vote.comment.save()
-    votes.delete()
-    # All contents anonymization
-    Comment.objects.filter(author=current).update(author=anonymous)
-    PrivatePost.objects.filter(author=current).update(author=anonymous)
-    CommentEdit.objects.filter(editor=current).update(editor=anonymous)
-    CommentEdit.objects.filter(deleted_by=current).update(deleted_by=anonymous)
-    # Karma notes, alerts and sanctions anonymization (to keep them)
-    KarmaNote.objects.filter(moderator=current).update(moderator=anonymous)
-    Ban.objects.filter(moderator=current).update(moderator=anonymous)
-    Alert.objects.filter(author=current).update(author=anonymous)
-    Alert.objects.filter(moderator=current).update(moderator=anonymous)
-    BannedEmailProvider.objects.filter(moderator=current).update(moderator=anonymous)
-    # Solved hat requests anonymization
-    HatRequest.objects.filter(moderator=current).update(moderator=anonymous)
-    # In case current user has been moderator in the past
-    Comment.objects.filter(editor=current).update(editor=anonymous)
-    for topic in PrivateTopic.objects.filter(Q(author=current) | Q(participants__in=[current])):
-        if topic.one_participant_remaining():
-            topic.delete()
-        else:
-            topic.remove_participant(current)
-            topic.save()
-    Topic.objects.filter(solved_by=current).update(solved_by=anonymous)
-    Topic.objects.filter(author=current).update(author=anonymous)
-
-    # Any content exclusively owned by the unregistering member will
-    # be deleted just before the User object (using a pre_delete
-    # receiver).
-    #
-    # Regarding galleries, there are two cases:
-    #
-    # - "personal galleries" with one owner (the unregistering
-    #   user). The user's ownership is removed and replaced by an
-    #   anonymous user in order not to lost the gallery.
-    #
-    # - "personal galleries" with many other owners. It is safe to
-    #   remove the user's ownership, the gallery won't be lost.
-
-    galleries = UserGallery.objects.filter(user=current)
-    for gallery in galleries:
-        if gallery.gallery.get_linked_users().count() == 1:
-            anonymous_gallery = UserGallery()
-            anonymous_gallery.user = external
-            anonymous_gallery.mode = "w"
-            anonymous_gallery.gallery = gallery.gallery
-            anonymous_gallery.save()
-    galleries.delete()
-
-    # Remove API access (tokens + applications)
-    for token in AccessToken.objects.filter(user=current):
-        token.revoke()
-
     logout(request)
-    User.objects.filter(pk=current.pk).delete()
+    queue_unregistration(current)
     return redirect(reverse("homepage"))
 
 
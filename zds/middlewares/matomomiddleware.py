@@ -1,29 +1,91 @@
-from _datetime import datetime
-from queue import Queue
+import logging
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from urllib.parse import urlencode
 
 import requests
-import logging
 
 from django.conf import settings
-from threading import Thread
+from django.core.cache import cache
 
 from zds.member.views import get_client_ip
 
-matomo_token_auth = settings.ZDS_APP["site"]["matomo_token_auth"]
-matomo_api_url = "{}/matomo.php?token_auth={}".format(settings.ZDS_APP["site"]["matomo_url"], matomo_token_auth)
-matomo_site_id = settings.ZDS_APP["site"]["matomo_site_id"]
 matomo_api_version = 1
 logger = logging.getLogger(__name__)
 tracked_status_code = [200]
 tracked_methods = ["GET"]
 excluded_paths = ["/contenus", "/mp", "/munin", "/api", "/static", "/media"]
 
+# the counters of all the processes are added up in the cache, under these keys
+STATS_KEY_PREFIX = "matomo-tracking"
+COUNTERS = ("queued", "sent", "failed", "dropped")
+
+
+class MatomoDispatcher:
+    """
+    Sends the tracked page views to Matomo from background threads, in batches through the bulk tracking API and over
+    keep-alive connections (one session per worker).
+
+    The queue is bounded: when Matomo is slow or down, the oldest page views are dropped rather than kept in memory.
+    The counters (``stats``) are the ones of this process, they are added to the ones of all the processes (see
+    ``get_tracking_stats()``) after each request to Matomo.
+    """
+
+    def __init__(self, url, site_id, token_auth, queue_size=1000, batch_size=50, workers=1, timeout=5):
+        self.url = f"{url}/matomo.php"
+        self.site_id = site_id
+        self.token_auth = token_auth
+        self.batch_size = batch_size
+        self.workers = workers
+        self.timeout = timeout
+        self.queue = deque(maxlen=queue_size)
+        self.condition = threading.Condition()
+        self.threads = []
+        self.stopped = False
+        self.counters = dict.fromkeys(COUNTERS, 0)
+        self.published_counters = dict.fromkeys(COUNTERS, 0)
+        self.latency = 0.0
+
+    def start(self):
+        for number in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"matomo-dispatcher-{number}", daemon=True)
+            thread.start()
+            self.threads.append(thread)
 
-def _background_process(queue: Queue):
-    data = queue.get(block=True)
-    while data:
+    def stop(self, timeout=2):
+        with self.condition:
+            self.stopped = True
+            self.condition.notify_all()
+        for thread in self.threads:
+            thread.join(timeout=timeout)
+
+    def track(self, data):
+        with self.condition:
+            if len(self.queue) == self.queue.maxlen:
+                self.counters["dropped"] += 1  # the oldest one, dropped by the deque
+            self.queue.append(data)
+            self.counters["queued"] += 1
+            self.condition.notify()
+
+    def next_batch(self):
+        """
+        Waits for page views to send.
+
+        :return: at most ``batch_size`` page views, or ``None`` once the dispatcher is stopped
+        :rtype: list
+        """
+        with self.condition:
+            while not self.queue and not self.stopped:
+                self.condition.wait()
+            if self.stopped:
+                return None
+            return [self.queue.popleft() for _ in range(min(self.batch_size, len(self.queue)))]
+
+    def get_params(self, data):
         params = {
-            "idsite": matomo_site_id,
+            "idsite": self.site_id,
             "action_name": data["r_path"],
             "rec": 1,
             "apiv": matomo_api_version,
@@ -35,28 +97,101 @@ def _background_process(queue: Queue):
             "m": data["datetime"].minute,
             "s": data["datetime"].second,
         }
+        if data["address_ip"] != "0.0.0.0":
+            params["cip"] = data["address_ip"]
+        return params
+
+    def send(self, session, batch):
+        payload = {
+            "requests": ["?" + urlencode(self.get_params(data)) for data in batch],
+            "token_auth": self.token_auth,
+        }
+        start = time.monotonic()
         try:
-            if data["address_ip"] != "0.0.0.0":
-                params["cip"] = data["address_ip"]
-            requests.get(
-                matomo_api_url,
-                params=params,
-            )
-            logger.info(f'Matomo tracked this link : {data["client_url"]}')
-        except Exception:
-            logger.exception(f'Something went wrong with the tracking of the link {data["client_url"]}')
+            session.post(self.url, json=payload, timeout=self.timeout).raise_for_status()
+        except requests.RequestException:
+            logger.exception("Something went wrong with the tracking of %s links", len(batch))
+            sent = False
+        else:
+            logger.info("Matomo tracked %s links", len(batch))
+            sent = True
+        with self.condition:
+            self.counters["sent" if sent else "failed"] += len(batch)
+            self.latency = time.monotonic() - start
+        self.publish_stats()
+
+    def publish_stats(self):
+        """Adds the counters of this process since the last call to the ones of all the processes, in the cache."""
+        with self.condition:
+            increments = {name: count - self.published_counters[name] for name, count in self.counters.items()}
+            self.published_counters = dict(self.counters)
+            latency = round(self.latency * 1000)
+        for name, increment in increments.items():
+            if not increment:
+                continue
+            key = f"{STATS_KEY_PREFIX}:{name}"
+            try:
+                cache.incr(key, increment)
+            except ValueError:  # not set yet (or evicted)
+                cache.set(key, increment, None)
+        cache.set(f"{STATS_KEY_PREFIX}:latency", latency, None)
+
+    def _run(self):
+        with requests.Session() as session:
+            batch = self.next_batch()
+            while batch is not None:
+                self.send(session, batch)
+                batch = self.next_batch()
+
+    @property
+    def stats(self):
+        """
+        :return: the counters of the page views (queued, sent, failed and dropped), the number of page views waiting,
+            and the duration of the last request to Matomo, in milliseconds
+        :rtype: dict
+        """
+        with self.condition:
+            return {**self.counters, "pending": len(self.queue), "latency": round(self.latency * 1000)}
+
+
+_dispatcher = None
+_dispatcher_lock = threading.Lock()
 
-        data = queue.get(block=True)
+
+def get_dispatcher():
+    """Returns the dispatcher of this process, started on first use."""
+    global _dispatcher
+    if _dispatcher is None:
+        with _dispatcher_lock:
+            if _dispatcher is None:
+                site = settings.ZDS_APP["site"]
+                _dispatcher = MatomoDispatcher(
+                    site["matomo_url"],
+                    site["matomo_site_id"],
+                    site["matomo_token_auth"],
+                    queue_size=site["matomo_queue_size"],
+                    batch_size=site["matomo_batch_size"],
+                    workers=site["matomo_workers"],
+                    timeout=site["matomo_timeout"],
+                )
+                _dispatcher.start()
+    return _dispatcher
+
+
+def get_tracking_stats():
+    """
+    :return: the counters of the page views (queued, sent, failed and dropped) of all the processes, and the duration
+        of the last request to Matomo, in milliseconds
+    :rtype: dict
+    """
+    names = (*COUNTERS, "latency")
+    values = cache.get_many([f"{STATS_KEY_PREFIX}:{name}" for name in names])
+    return {name: values.get(f"{STATS_KEY_PREFIX}:{name}", 0) for name in names}
 
 
 class MatomoMiddleware:
     def __init__(self, get_response):
         self.get_response = get_response
-        self.queue = Queue()
-        if settings.ZDS_APP["site"]["matomo_tracking_enabled"]:
-            self.worker = Thread(target=_background_process, args=(self.queue,))
-            self.worker.setDaemon(True)
-            self.worker.start()
 
     def __call__(self, request):
         return self.process_response(request, self.get_response(request))
@@ -67,7 +202,7 @@ class MatomoMiddleware:
         client_accept_language = request.META.get("HTTP_ACCEPT_LANGUAGE", "")
         client_url = f"{request.scheme}://{request.get_host()}{request.path}"
         if settings.ZDS_APP["site"]["matomo_tracking_enabled"]:
-            self.queue.put(
+            get_dispatcher().track(
                 {
                     "client_user_agent": client_user_agent,
                     "client_referer": client_referer,
@@ -93,8 +228,3 @@ class MatomoMiddleware:
                 logger.exception(f"Something failed with Matomo tracking system.")
 
         return response
-
-    def __del__(self):
-        if settings.ZDS_APP["site"]["matomo_tracking_enabled"]:
-            self.queue.put(False)
-            self.worker.join(timeout=2)
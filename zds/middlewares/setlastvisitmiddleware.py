@@ -3,7 +3,40 @@ import datetime
 from django.contrib.auth import logout
 
 from django.conf import settings
+from zds.member.models import Profile
 from zds.member.views import get_client_ip
+from zds.utils.write_behind import WriteBehindBuffer
+
+
+def _save_last_visits(last_visits):
+    profiles = [
+        Profile(pk=pk, last_visit=last_visit, last_ip_address=ip_address)
+        for pk, (last_visit, ip_address) in last_visits.items()
+    ]
+    # a single `UPDATE ... CASE`, which only writes these two columns (and ignores the deleted profiles)
+    Profile.objects.bulk_update(profiles, ["last_visit", "last_ip_address"])
+    return len(profiles)
+
+
+last_visits = WriteBehindBuffer(
+    "last-visit-flusher",
+    _save_last_visits,
+    lambda: settings.ZDS_APP["member"]["last_visit_flush_interval"],
+    lambda: settings.ZDS_APP["member"]["last_visit_flush_batch_size"],
+)
+
+
+def set_last_visit(profile, last_visit, ip_address):
+    """
+    Records the last visit of a member, to be saved with the others every
+    ``ZDS_APP["member"]["last_visit_flush_interval"]`` seconds, or right away if it is ``0``.
+    """
+    if settings.ZDS_APP["member"]["last_visit_flush_interval"]:
+        last_visits.add(profile.pk, (last_visit, ip_address))
+    else:
+        Profile.objects.filter(pk=profile.pk).update(last_visit=last_visit, last_ip_address=ip_address)
+    profile.last_visit = last_visit
+    profile.last_ip_address = ip_address
 
 
 class SetLastVisitMiddleware:
@@ -24,16 +57,10 @@ class SetLastVisitMiddleware:
 
         if user:
             profile = request.user.profile
-            if profile.last_visit is None:
-                profile.last_visit = datetime.datetime.now()
-                profile.last_ip_address = get_client_ip(request)
-                profile.save()
-            else:
-                duration = datetime.datetime.now() - profile.last_visit
-                if duration.seconds > settings.ZDS_APP["member"]["update_last_visit_interval"]:
-                    profile.last_visit = datetime.datetime.now()
-                    profile.last_ip_address = get_client_ip(request)
-                    profile.save()
+            now = datetime.datetime.now()
+            interval = settings.ZDS_APP["member"]["update_last_visit_interval"]
+            if profile.last_visit is None or (now - profile.last_visit).total_seconds() > interval:
+                set_last_visit(profile, now, get_client_ip(request))
             if not profile.can_read:
                 logout(request)
         return response
@@ -0,0 +1,91 @@
+from datetime import datetime
+from unittest import mock
+from urllib.parse import parse_qs
+
+import requests
+from django.core.cache import cache
+from django.test import TestCase
+
+from zds.middlewares.matomomiddleware import COUNTERS, STATS_KEY_PREFIX, MatomoDispatcher, get_tracking_stats
+
+
+def page_view(path):
+    return {
+        "client_user_agent": "Firefox",
+        "client_referer": "",
+        "client_accept_language": "fr",
+        "client_url": f"https://zestedesavoir.com{path}",
+        "datetime": datetime(2021, 1, 1, 12, 30, 15).time(),
+        "r_path": path,
+        "address_ip": "10.0.0.1",
+    }
+
+
+class MatomoDispatcherTest(TestCase):
+    def setUp(self):
+        # not started, the batches are taken and sent by the test
+        self.dispatcher = MatomoDispatcher("https://matomo.test", 4, "token", queue_size=3, batch_size=2)
+        stats_keys = [f"{STATS_KEY_PREFIX}:{name}" for name in (*COUNTERS, "latency")]
+        cache.delete_many(stats_keys)
+        self.addCleanup(cache.delete_many, stats_keys)
+
+    def test_bulk_request(self):
+        for path in ("/forums/", "/tutoriels/", "/articles/"):
+            self.dispatcher.track(page_view(path))
+
+        session = mock.Mock()
+        batch = self.dispatcher.next_batch()
+        self.dispatcher.send(session, batch)
+
+        url, payload = session.post.call_args[0][0], session.post.call_args[1]["json"]
+        self.assertEqual(url, "https://matomo.test/matomo.php")
+        self.assertEqual(payload["token_auth"], "token")
+        self.assertEqual(len(payload["requests"]), 2)
+        params = parse_qs(payload["requests"][0][1:])
+        self.assertEqual(params["url"], ["https://zestedesavoir.com/forums/"])
+        self.assertEqual(params["cip"], ["10.0.0.1"])
+        self.assertEqual(params["idsite"], ["4"])
+        self.assertEqual(self.dispatcher.stats["sent"], 2)
+        self.assertEqual(self.dispatcher.stats["pending"], 1)
+
+    def test_oldest_dropped(self):
+        for path in ("/1/", "/2/", "/3/", "/4/"):
+            self.dispatcher.track(page_view(path))
+
+        self.assertEqual([data["r_path"] for data in self.dispatcher.next_batch()], ["/2/", "/3/"])
+        stats = self.dispatcher.stats
+        self.assertEqual((stats["queued"], stats["dropped"], stats["pending"]), (4, 1, 1))
+
+    def test_failure(self):
+        self.dispatcher.track(page_view("/forums/"))
+        session = mock.Mock()
+        session.post.side_effect = requests.ConnectionError()
+        self.dispatcher.send(session, self.dispatcher.next_batch())
+        self.assertEqual((self.dispatcher.stats["sent"], self.dispatcher.stats["failed"]), (0, 1))
+
+    def test_shared_stats(self):
+        other_dispatcher = MatomoDispatcher("https://matomo.test", 4, "token")
+        for dispatcher in (self.dispatcher, other_dispatcher, self.dispatcher):
+            dispatcher.track(page_view("/forums/"))
+            dispatcher.send(mock.Mock(), dispatcher.next_batch())
+
+        # the counters of all the processes are added up
+        stats = get_tracking_stats()
+        self.assertEqual((stats["queued"], stats["sent"], stats["failed"], stats["dropped"]), (3, 3, 0, 0))
+        self.assertEqual(self.dispatcher.stats["sent"], 2)
+
+    def test_workers(self):
+        with mock.patch("zds.middlewares.matomomiddleware.requests.Session") as session_class:
+            session = session_class.return_value.__enter__.return_value
+            self.dispatcher.workers = 2
+            self.dispatcher.start()
+            self.dispatcher.track(page_view("/forums/"))
+            for _ in range(100):  # wait for a worker to send it
+                if self.dispatcher.stats["sent"]:
+                    break
+                self.dispatcher.threads[0].join(timeout=0.01)
+            self.dispatcher.stop()
+
+        self.assertEqual(session.post.call_count, 1)
+        self.assertEqual(self.dispatcher.stats["sent"], 1)
+        self.assertFalse(any(thread.is_alive() for thread in self.dispatcher.threads))
@@ -1,4 +1,5 @@
 from datetime import datetime, timedelta
+from unittest import mock
 
 from django.test import TestCase
 from django.urls import reverse
@@ -7,12 +8,16 @@ from django.shortcuts import get_object_or_404
 
 from zds.member.factories import ProfileFactory
 from zds.member.models import Profile
+from zds.middlewares.setlastvisitmiddleware import last_visits
 from django.conf import settings
 from copy import deepcopy
 
 overridden_zds_app = deepcopy(settings.ZDS_APP)
 overridden_zds_app["member"]["update_last_visit_interval"] = 30
 
+write_behind_zds_app = deepcopy(overridden_zds_app)
+write_behind_zds_app["member"]["last_visit_flush_interval"] = 60
+
 
 @override_settings(ZDS_APP=overridden_zds_app)
 class SetLastVisitMiddlewareTest(TestCase):
@@ -46,3 +51,33 @@ class SetLastVisitMiddlewareTest(TestCase):
         # the date of last visit should have been updated
         profile = get_object_or_404(Profile, pk=profile_pk)
         self.assertTrue(datetime.now() - profile.last_visit < timedelta(seconds=5))
+
+    def test_old_last_visit(self):
+        self.client.force_login(self.user.user)
+        self.user.last_visit = datetime.now() - timedelta(days=1, seconds=10)
+        self.user.save()
+
+        self.client.get(reverse("homepage"))
+
+        profile = Profile.objects.get(pk=self.user.pk)
+        self.assertTrue(datetime.now() - profile.last_visit < timedelta(seconds=5))
+
+
+@override_settings(ZDS_APP=write_behind_zds_app)
+@mock.patch("zds.utils.write_behind.WriteBehindBuffer.start_flusher")
+class LastVisitWriteBehindTest(TestCase):
+    def test_saved_in_batches(self, start_flusher):
+        profiles = [ProfileFactory(), ProfileFactory()]
+        for profile in profiles:
+            self.client.force_login(profile.user)
+            self.client.get(reverse("homepage"))
+            self.client.get(reverse("homepage"))  # not saved yet, so recorded again
+        self.assertTrue(start_flusher.called)
+        self.assertFalse(Profile.objects.filter(last_visit__isnull=False).exists())
+
+        with self.assertNumQueries(1):
+            self.assertEqual(last_visits.flush(), 2)
+        for profile in Profile.objects.filter(pk__in=[profile.pk for profile in profiles]):
+            self.assertTrue(datetime.now() - profile.last_visit < timedelta(seconds=5))
+            self.assertEqual(profile.last_ip_address, "127.0.0.1")
+        self.assertEqual(last_visits.flush(), 0)
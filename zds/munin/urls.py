@@ -1,6 +1,16 @@
 from django.urls import re_path
 
-from zds.munin.views import total_topics, total_posts, total_mps, total_tutorials, total_articles, total_opinions
+from zds.munin.views import (
+    total_topics,
+    total_posts,
+    total_mps,
+    total_tutorials,
+    total_articles,
+    total_opinions,
+    email_queue,
+    matomo_tracking,
+    matomo_latency,
+)
 
 
 urlpatterns = [
@@ -10,4 +20,7 @@ urlpatterns = [
     re_path(r"^total_tutorials/$", total_tutorials, name="total_tutorial"),
     re_path(r"^total_articles/$", total_articles, name="total_articles"),
     re_path(r"^total_opinions/$", total_opinions, name="total_opinions"),
+    re_path(r"^email_queue/$", email_queue, name="email_queue"),
+    re_path(r"^matomo_tracking/$", matomo_tracking, name="matomo_tracking"),
+    re_path(r"^matomo_latency/$", matomo_latency, name="matomo_latency"),
 ]
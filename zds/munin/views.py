@@ -1,6 +1,8 @@
 from munin.helpers import muninview
 from zds.forum.models import Topic, Post
+from zds.middlewares.matomomiddleware import get_tracking_stats
 from zds.mp.models import PrivateTopic, PrivatePost
+from zds.notification.models import QueuedEmail
 from zds.tutorialv2.models.database import PublishableContent, ContentReaction
 
 
@@ -77,3 +79,42 @@ def total_opinions(request):
         ("published", opinions.filter(sha_public__isnull=False).count()),
         ("converted", opinions.filter(converted_to__sha_public__isnull=False).count()),
     ]
+
+
+@muninview(
+    config="""graph_title Email queue
+graph_vlabel emails"""
+)
+def email_queue(request):
+    pending, given_up = QueuedEmail.objects.depth()
+    return [("pending", pending), ("given_up", given_up)]
+
+
+@muninview(
+    config="""graph_title Matomo tracking
+graph_vlabel page views per ${graph_period}
+queued.label Queued
+queued.type DERIVE
+queued.min 0
+sent.label Sent
+sent.type DERIVE
+sent.min 0
+failed.label Failed
+failed.type DERIVE
+failed.min 0
+dropped.label Dropped
+dropped.type DERIVE
+dropped.min 0"""
+)
+def matomo_tracking(request):
+    stats = get_tracking_stats()
+    return [(name, stats[name]) for name in ("queued", "sent", "failed", "dropped")]
+
+
+@muninview(
+    config="""graph_title Matomo tracking latency
+graph_vlabel milliseconds
+latency.label Duration of the last request"""
+)
+def matomo_latency(request):
+    return [("latency", get_tracking_stats()["latency"])]
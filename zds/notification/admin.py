@@ -1,5 +1,5 @@
 from django.contrib import admin
-from zds.notification.models import Notification, Subscription
+from zds.notification.models import Notification, QueuedEmail, Subscription
 
 
 class NotificationAdmin(admin.ModelAdmin):
@@ -20,5 +20,14 @@ class SubscriptionAdmin(admin.ModelAdmin):
     raw_id_fields = ("user", "last_notification")
 
 
+class QueuedEmailAdmin(admin.ModelAdmin):
+    """Representation of QueuedEmail model in the admin interface."""
+
+    list_display = ("subject", "recipients", "pubdate", "attempts", "next_attempt")
+    search_fields = ("subject", "recipients")
+    ordering = ("pk",)
+
+
 admin.site.register(Notification, NotificationAdmin)
 admin.site.register(Subscription, SubscriptionAdmin)
+admin.site.register(QueuedEmail, QueuedEmailAdmin)
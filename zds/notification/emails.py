@@ -0,0 +1,74 @@
+"""
+Sending of the emails queued by ``send_notification_emails``, see the ``send_queued_emails`` command.
+"""
+
+import logging
+from datetime import datetime, timedelta
+from smtplib import SMTPException
+
+from django.conf import settings
+from django.core.mail import get_connection
+
+from zds.notification.models import QueuedEmail
+
+LOG = logging.getLogger(__name__)
+
+
+def get_retry_delay(attempts):
+    """
+    :param int attempts: number of failed attempts so far
+    :return: the time to wait before the next attempt, doubled after each failure
+    :rtype: timedelta
+    """
+    return timedelta(seconds=settings.ZDS_APP["notification"]["email_retry_delay"] * 2 ** (attempts - 1))
+
+
+def send_queued_emails(batch_size=None):
+    """
+    Sends a batch of the queued emails which are due, through a single SMTP connection.
+
+    A sent email is removed from the queue. A failed one is retried later, with an exponential back-off, until
+    ``ZDS_APP["notification"]["email_max_attempts"]`` is reached, then it is kept in the queue but given up.
+
+    :param int batch_size: maximum number of emails sent, ``ZDS_APP["notification"]["email_batch_size"]`` by default
+    :return: the number of emails sent and the number of failures
+    :rtype: tuple[int, int]
+    """
+    batch_size = batch_size or settings.ZDS_APP["notification"]["email_batch_size"]
+    max_attempts = settings.ZDS_APP["notification"]["email_max_attempts"]
+    queued_emails = list(QueuedEmail.objects.ready()[:batch_size])
+    if not queued_emails:
+        return 0, 0
+
+    sent = []
+    failures = 0
+    connection = get_connection()
+    try:
+        connection.open()
+    except (SMTPException, OSError) as error:
+        LOG.error("Cannot connect to the SMTP server: %s", error)
+        connection = None
+
+    for queued_email in queued_emails:
+        try:
+            if connection is None:
+                raise SMTPException("no connection to the SMTP server")
+            # the connection is already opened, so it is kept for the next emails
+            connection.send_messages([queued_email.to_message(connection)])
+        except (SMTPException, OSError) as error:
+            failures += 1
+            queued_email.attempts += 1
+            queued_email.last_error = str(error)
+            if queued_email.attempts >= max_attempts:
+                LOG.error("Giving up sending %s: %s", queued_email, error)
+                queued_email.next_attempt = None
+            else:
+                queued_email.next_attempt = datetime.now() + get_retry_delay(queued_email.attempts)
+            queued_email.save(update_fields=["attempts", "last_error", "next_attempt"])
+        else:
+            sent.append(queued_email.pk)
+
+    if connection is not None:
+        connection.close()
+    QueuedEmail.objects.filter(pk__in=sent).delete()
+    return len(sent), failures
@@ -0,0 +1,43 @@
+import logging
+import time
+
+from django.conf import settings
+from django.core.management import BaseCommand
+
+from zds.notification.emails import send_queued_emails
+from zds.notification.models import QueuedEmail
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Send the emails queued when ZDS_APP['notification']['deferred_emails'] is set"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=settings.ZDS_APP["notification"]["email_batch_size"],
+            help="Maximum number of emails sent through one SMTP connection",
+        )
+        parser.add_argument(
+            "--interval", type=int, default=10, help="Number of seconds between two checks of an empty queue"
+        )
+        parser.add_argument("--once", action="store_true", help="Send the emails which are due, then exit")
+        parser.add_argument("--stats", action="store_true", help="Display the size of the queue, then exit")
+
+    def handle(self, *args, **options):
+        if options["stats"]:
+            pending, given_up = QueuedEmail.objects.depth()
+            self.stdout.write(f"{pending} emails waiting, {given_up} given up")
+            return
+
+        while True:
+            sent, failures = send_queued_emails(options["batch_size"])
+            if sent or failures:
+                pending, given_up = QueuedEmail.objects.depth()
+                logger.info("%s emails sent, %s failures, %s waiting, %s given up", sent, failures, pending, given_up)
+            if sent + failures < options["batch_size"]:  # nothing more is due for now
+                if options["once"]:
+                    return
+                time.sleep(options["interval"])
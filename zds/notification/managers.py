@@ -1,3 +1,5 @@
+from datetime import datetime
+
 from django.contrib.contenttypes.models import ContentType
 from django.core.exceptions import ObjectDoesNotExist
 from django.db import models
@@ -279,3 +281,31 @@ class TopicFollowedManager(models.Manager):
             user = get_current_user()
 
         return self.filter(topic=topic, user=user).exists()
+
+
+class QueuedEmailManager(models.Manager):
+    """
+    Custom queued email manager.
+    """
+
+    def enqueue(self, messages):
+        """
+        Queues emails, to be sent by the ``send_queued_emails`` command.
+
+        :param messages: the emails
+        :type messages: list[django.core.mail.EmailMessage]
+        """
+        self.bulk_create([self.model.from_message(message) for message in messages], batch_size=500)
+
+    def ready(self):
+        """
+        :return: the emails that should be sent now, oldest first
+        """
+        return self.filter(next_attempt__lte=datetime.now()).order_by("pk")
+
+    def depth(self):
+        """
+        :return: the number of emails waiting to be sent, and the number of emails which were given up
+        :rtype: tuple[int, int]
+        """
+        return self.filter(next_attempt__isnull=False).count(), self.filter(next_attempt__isnull=True).count()
@@ -0,0 +1,42 @@
+# Generated by Django 2.2.24 on 2026-10-18 07:34
+
+import datetime
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("notification", "0016_auto_20190114_1301"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="QueuedEmail",
+            fields=[
+                ("id", models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("subject", models.TextField(verbose_name="Sujet")),
+                ("from_email", models.CharField(max_length=254, verbose_name="Expéditeur")),
+                ("recipients", models.TextField(verbose_name="Destinataires")),
+                ("body", models.TextField(verbose_name="Texte")),
+                ("html_body", models.TextField(blank=True, default="", verbose_name="HTML")),
+                ("pubdate", models.DateTimeField(auto_now_add=True, verbose_name="Date de création")),
+                ("attempts", models.PositiveIntegerField(default=0, verbose_name="Nombre d'essais")),
+                (
+                    "next_attempt",
+                    models.DateTimeField(
+                        blank=True,
+                        db_index=True,
+                        default=datetime.datetime.now,
+                        null=True,
+                        verbose_name="Prochain essai",
+                    ),
+                ),
+                ("last_error", models.TextField(blank=True, default="", verbose_name="Dernière erreur")),
+            ],
+            options={
+                "verbose_name": "E-mail en attente",
+                "verbose_name_plural": "E-mails en attente",
+            },
+        ),
+    ]
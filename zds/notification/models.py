@@ -1,23 +1,27 @@
 import logging
+from datetime import datetime
 from smtplib import SMTPException
 
 from django.contrib.auth.models import User
 from django.contrib.contenttypes.fields import GenericForeignKey
 from django.contrib.contenttypes.models import ContentType
-from django.core.mail import EmailMultiAlternatives
+from django.core.mail import EmailMultiAlternatives, get_connection
 from django.core.validators import validate_email, ValidationError
 from django.db import models, IntegrityError, transaction
+from django.db.models import OuterRef, Q, Subquery
 from django.template.loader import render_to_string
 from django.utils.translation import gettext_lazy as _
 from django.conf import settings
 
 from zds.forum.models import Topic, Post
+import zds.notification.signals as notification_signals
 from zds.notification.managers import (
     NotificationManager,
     SubscriptionManager,
     TopicFollowedManager,
     TopicAnswerSubscriptionManager,
     NewTopicSubscriptionManager,
+    QueuedEmailManager,
 )
 from zds.utils.misc import convert_camel_to_underscore
 
@@ -84,9 +88,12 @@ class Subscription(models.Model):
             self.by_email = False
             self.save()
 
-    def send_email(self, notification):
+    def build_email(self, notification):
         """
-        Sends an email notification
+        Builds the email of a notification
+
+        :return: the email, or ``None`` if the user has no valid e-mail address
+        :rtype: django.core.mail.EmailMultiAlternatives
         """
 
         assert hasattr(self, "module")
@@ -102,7 +109,7 @@ class Subscription(models.Model):
         try:
             validate_email(receiver.email)
         except ValidationError:
-            return
+            return None
 
         context = {
             "username": receiver.username,
@@ -120,10 +127,13 @@ class Subscription(models.Model):
 
         msg = EmailMultiAlternatives(subject, message_txt, from_email, [receiver.email])
         msg.attach_alternative(message_html, "text/html")
-        try:
-            msg.send()
-        except SMTPException:
-            LOG.error("Failed sending mail for %s", self, exc_info=True)
+        return msg
+
+    def send_email(self, notification):
+        """
+        Sends an email notification
+        """
+        send_notification_emails([self.build_email(notification)])
 
     @staticmethod
     def has_read_permission(request):
@@ -181,6 +191,83 @@ class SingleNotificationMixin:
                 self.last_notification.content_object = content
                 self.last_notification.save()
 
+    @classmethod
+    def send_notifications(cls, subscriptions, content, sender, send_email=True):
+        """
+        Sends the notification about the given content to all the given subscriptions at once.
+
+        It has the same effect as calling ``send_notification`` on each subscription, but with a number of queries
+        which does not depend on the number of subscriptions: the notifications are updated or created in bulk,
+        and the emails are handed over to ``send_notification_emails``.
+
+        :param subscriptions: QuerySet of the subscriptions to notify, all about the object ``content`` belongs to
+        :param content: the content the notification is about
+        :param sender: the user whose action triggered the notification
+        :param send_email: whether an email must be sent if the subscription by email is active
+        """
+        subscriptions = subscriptions.select_related("last_notification")
+        # Update last notification if the new content is older (marking answer as unread)
+        for subscription in subscriptions.filter(
+            last_notification__is_read=False, last_notification__pubdate__gt=content.pubdate
+        ):
+            subscription.send_notification(content=content, sender=sender, send_email=send_email)
+
+        to_notify = list(
+            subscriptions.filter(Q(last_notification__isnull=True) | Q(last_notification__is_read=True)).select_related(
+                "user"
+            )
+        )
+        if not to_notify:
+            return
+
+        # the notifications of the subscriptions to an object are all the same
+        fields = dict(
+            content_type=ContentType.objects.get_for_model(content),
+            object_id=content.pk,
+            sender=sender,
+            url=to_notify[0].get_notification_url(content),
+            title=to_notify[0].get_notification_title(content),
+            is_read=False,
+        )
+        batch_size = settings.ZDS_APP["notification"]["bulk_batch_size"]
+        with transaction.atomic():
+            for start in range(0, len(to_notify), batch_size):
+                subscription_pks = [subscription.pk for subscription in to_notify[start : start + batch_size]]
+                existing = {}
+                duplicates = []
+                for pk, subscription_pk in (
+                    Notification.objects.filter(subscription__in=subscription_pks)
+                    .order_by("pk")
+                    .values_list("pk", "subscription")
+                ):
+                    if subscription_pk in existing:
+                        duplicates.append(pk)
+                    else:
+                        existing[subscription_pk] = pk
+                if duplicates:
+                    LOG.error("Found %s duplicated notifications, deleting them", len(duplicates))
+                    Notification.objects.filter(pk__in=duplicates).delete()
+
+                # If there isn't a notification yet or the last one is read, we generate a new one.
+                Notification.objects.filter(pk__in=existing.values()).update(pubdate=content.pubdate, **fields)
+                Notification.objects.bulk_create(
+                    [Notification(subscription_id=pk, **fields) for pk in subscription_pks if pk not in existing]
+                )
+                Subscription.objects.filter(pk__in=subscription_pks).update(
+                    last_notification=Subquery(
+                        Notification.objects.filter(subscription=OuterRef("pk")).order_by("pk").values("pk")[:1]
+                    )
+                )
+            notification_signals.notifications_updated.send(
+                sender=Notification, user_pks=[subscription.user_id for subscription in to_notify]
+            )
+
+            if send_email:
+                notification = Notification(**fields)
+                send_notification_emails(
+                    [subscription.build_email(notification) for subscription in to_notify if subscription.by_email]
+                )
+
     def mark_notification_read(self):
         """
         Marks the notification of the subscription as read.
@@ -189,6 +276,7 @@ class SingleNotificationMixin:
         """
         if self.last_notification is not None:
             Notification.objects.filter(pk=self.last_notification.pk).update(is_read=True)
+            notification_signals.notifications_updated.send(sender=Notification, user_pks=[self.user_id])
 
 
 class MultipleNotificationsMixin:
@@ -454,4 +542,89 @@ class TopicFollowed(models.Model):
 
 # used to fix Django 1.9 Warning
 # https://github.com/zestedesavoir/zds-site/issues/3451
+
+
+class QueuedEmail(models.Model):
+    """
+    An email waiting to be sent by the ``send_queued_emails`` command, see ``zds.notification.emails``
+    """
+
+    class Meta:
+        verbose_name = _("E-mail en attente")
+        verbose_name_plural = _("E-mails en attente")
+
+    subject = models.TextField(_("Sujet"))
+    from_email = models.CharField(_("Expéditeur"), max_length=254)
+    recipients = models.TextField(_("Destinataires"))  # one address per line
+    body = models.TextField(_("Texte"))
+    html_body = models.TextField(_("HTML"), blank=True, default="")
+    pubdate = models.DateTimeField(_("Date de création"), auto_now_add=True)
+    attempts = models.PositiveIntegerField(_("Nombre d'essais"), default=0)
+    # ``None`` once the email was given up
+    next_attempt = models.DateTimeField(_("Prochain essai"), null=True, blank=True, default=datetime.now, db_index=True)
+    last_error = models.TextField(_("Dernière erreur"), blank=True, default="")
+
+    objects = QueuedEmailManager()
+
+    def __str__(self):
+        return _("E-mail « {} » à {}").format(self.subject, ", ".join(self.recipients.splitlines()))
+
+    @classmethod
+    def from_message(cls, message):
+        """
+        :param message: the email to send later
+        :type message: django.core.mail.EmailMultiAlternatives
+        :rtype: QueuedEmail
+        """
+        html_bodies = [content for content, mimetype in getattr(message, "alternatives", []) if mimetype == "text/html"]
+        return cls(
+            subject=message.subject,
+            from_email=message.from_email,
+            recipients="\n".join(message.recipients()),
+            body=message.body,
+            html_body=html_bodies[0] if html_bodies else "",
+        )
+
+    def to_message(self, connection=None):
+        """
+        :rtype: django.core.mail.EmailMultiAlternatives
+        """
+        message = EmailMultiAlternatives(
+            self.subject, self.body, self.from_email, self.recipients.splitlines(), connection=connection
+        )
+        if self.html_body:
+            message.attach_alternative(self.html_body, "text/html")
+        return message
+
+
+def send_notification_emails(messages):
+    """
+    Sends the emails of notifications.
+
+    If ``ZDS_APP["notification"]["deferred_emails"]`` is set, they are only queued, in the current transaction, and the
+    ``send_queued_emails`` command sends them later, so that the request which triggered them does not wait for the
+    SMTP server. Otherwise they are sent right away through a single connection.
+
+    :param messages: the emails, ``None`` items are ignored
+    :type messages: list[django.core.mail.EmailMultiAlternatives]
+    """
+    messages = [message for message in messages if message is not None]
+    if not messages:
+        return
+    if settings.ZDS_APP["notification"]["deferred_emails"]:
+        QueuedEmail.objects.enqueue(messages)
+        return
+
+    try:
+        with get_connection() as connection:
+            for message in messages:
+                message.connection = connection
+                try:
+                    message.send()
+                except SMTPException:
+                    LOG.error("Failed sending mail to %s", ", ".join(message.recipients()), exc_info=True)
+    except SMTPException:
+        LOG.error("Failed sending %s mails", len(messages), exc_info=True)
+
+
 from . import receivers  # noqa
@@ -9,7 +9,8 @@ except ImportError:
 from django.contrib.auth.models import User
 from django.contrib.contenttypes.models import ContentType
 from django.db import DatabaseError
-from django.db.models.signals import post_save, m2m_changed, pre_delete
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_save, m2m_changed, pre_delete
 from django.dispatch import receiver
 
 from zds.forum.models import Topic, Post, Forum
@@ -30,7 +31,8 @@ import zds.notification.signals as notification_signals
 from zds.tutorialv2.models.database import PublishableContent, ContentReaction
 import zds.tutorialv2.signals as tuto_signals
 import zds.utils.signals as utils_signals
-from zds.utils.models import Tag
+from zds.utils.header_notifications import invalidate_header_alerts, invalidate_header_notifications
+from zds.utils.models import Alert, Tag
 
 logger = logging.getLogger(__name__)
 
@@ -100,40 +102,29 @@ def unread_topic_event(sender, *, user, post, **__):
 
 @receiver(forum_signals.topic_read, sender=Topic)
 @receiver(notification_signals.content_read, sender=Topic)
-def mark_topic_notifications_read(sender, *, instance, user, **__):
+def mark_topic_notifications_read(sender, *, instance, user, post_pk=None, **__):
     """
-    Marks as read the notifications of the NewTopicSubscriptions and
-    AnswerSubscription of the user to the topic
+    Marks as read, with a single statement, the notifications of the user about the topic: the ones of the
+    TopicAnswerSubscription (about the posts of the topic) and the ones of the NewTopicSubscriptions to the forum or to
+    the tags (about the topic itself).
 
     :param instance: the topic marked as read
     :param user: the user reading the topic
+    :param post_pk: the last post read, the notifications about newer posts are left unread. All of them are marked as
+        read if it is not given.
     """
-    # Subscription to the topic
-    subscription = TopicAnswerSubscription.objects.get_existing(user, instance, is_active=True)
-    if subscription:
-        subscription.mark_notification_read()
-
-    # Subscription to the forum
-    subscription = NewTopicSubscription.objects.get_existing(user, instance.forum, is_active=True)
-    if subscription:
-        subscription.mark_notification_read(content=instance)
-
-    # Subscription to the tags
-    for tag in instance.tags.all():
-        subscription = NewTopicSubscription.objects.get_existing(user, tag, is_active=True)
-        if subscription:
-            subscription.mark_notification_read(content=instance)
-
     content_type = ContentType.objects.get_for_model(instance)
-    notifications = list(
-        Notification.objects.filter(
-            subscription__user=user, object_id=instance.pk, content_type__pk=content_type.pk, is_read=False
-        )
+    answers = Q(subscription__content_type=content_type, subscription__object_id=instance.pk)
+    if post_pk is not None:
+        # the post of the notification may have been posted since the topic was read
+        answers &= ~Q(content_type=ContentType.objects.get_for_model(Post), object_id__gt=post_pk)
+    marked = (
+        Notification.objects.filter(subscription__user=user, is_read=False)
+        .filter(Q(content_type=content_type, object_id=instance.pk) | answers)
+        .update(is_read=True)
     )
-
-    for notification in notifications:
-        notification.is_read = True
-        notification.save(update_fields=["is_read"])
+    if marked:
+        notification_signals.notifications_updated.send(sender=Notification, user_pks=[user.pk])
 
 
 @receiver(tuto_signals.content_read, sender=PublishableContent)
@@ -346,10 +337,8 @@ def answer_topic_event(sender, *, instance, created=True, **__):
     if created:
         post = instance
 
-        subscription_list = TopicAnswerSubscription.objects.get_subscriptions(post.topic)
-        for subscription in subscription_list:
-            if subscription.user != post.author:
-                subscription.send_notification(content=post, sender=post.author)
+        subscription_list = TopicAnswerSubscription.objects.get_subscriptions(post.topic).exclude(user=post.author)
+        TopicAnswerSubscription.send_notifications(subscription_list, content=post, sender=post.author)
 
         # Follow topic on answering
         TopicAnswerSubscription.objects.get_or_create_active(post.author, post.topic)
@@ -371,10 +360,10 @@ def answer_content_reaction_event(sender, *, instance, created=True, **__):
         publishable_content = content_reaction.related_content
         author = content_reaction.author
 
-        subscription_list = ContentReactionAnswerSubscription.objects.get_subscriptions(publishable_content)
-        for subscription in subscription_list:
-            if subscription.user != author:
-                subscription.send_notification(content=content_reaction, sender=author)
+        subscription_list = ContentReactionAnswerSubscription.objects.get_subscriptions(publishable_content).exclude(
+            user=author
+        )
+        ContentReactionAnswerSubscription.send_notifications(subscription_list, content=content_reaction, sender=author)
 
         # Follow publishable content on answering
         ContentReactionAnswerSubscription.objects.get_or_create_active(author, publishable_content)
@@ -514,3 +503,21 @@ def ping_event(sender, *, instance, user, **__):
 def unping_event(sender, instance, user, **_):
     if user:
         PingSubscription.objects.deactivate_subscriptions(user, instance)
+
+
+@receiver(post_save, sender=Notification)
+@receiver(post_delete, sender=Notification)
+def invalidate_header_notifications_of_subscriber(sender, instance, **__):
+    user_pks = Subscription.objects.filter(pk=instance.subscription_id).values_list("user", flat=True)
+    invalidate_header_notifications(user_pks)
+
+
+@receiver(notification_signals.notifications_updated, sender=Notification)
+def invalidate_header_notifications_of_users(sender, *, user_pks, **__):
+    invalidate_header_notifications(user_pks)
+
+
+@receiver(post_save, sender=Alert)
+@receiver(post_delete, sender=Alert)
+def invalidate_header_alerts_summary(sender, **__):
+    invalidate_header_alerts()
@@ -2,3 +2,6 @@ from django.dispatch import Signal
 
 # is sent when a content is read (topic, article or tutorial)
 content_read = Signal(providing_args=["instance", "user", "target"])
+
+# is sent when the notifications of some users are changed by a queryset update, which sends no `post_save`
+notifications_updated = Signal(providing_args=["user_pks"])
@@ -1,10 +1,15 @@
 import copy
+from smtplib import SMTPException
 from datetime import datetime, timedelta
 from django.contrib.auth.models import Group
 from django.contrib.contenttypes.models import ContentType
 from django.core import mail
+from django.core.mail import EmailMessage
+from django.core.management import call_command
 from django.urls import reverse
 from django.test import TestCase
+from django.test.utils import override_settings
+from unittest.mock import patch
 from django.db import IntegrityError
 
 from django.conf import settings
@@ -13,6 +18,7 @@ from zds.forum.models import Topic
 from zds.gallery.factories import UserGalleryFactory
 from zds.member.factories import ProfileFactory, StaffProfileFactory, UserFactory
 from zds.mp.models import mark_read
+from zds.notification.emails import send_queued_emails
 from zds.tutorialv2 import signals
 from zds.notification.models import (
     Notification,
@@ -21,6 +27,7 @@ from zds.notification.models import (
     PrivateTopicAnswerSubscription,
     NewTopicSubscription,
     NewPublicationSubscription,
+    QueuedEmail,
 )
 from zds.tutorialv2.factories import (
     PublishableContentFactory,
@@ -290,6 +297,76 @@ class NotificationForumTest(TestCase):
         # Check that the pubdate is well updated.
         self.assertTrue(old_notification.pubdate < new_notification.pubdate)
 
+    def test_answer_notifies_followers_in_bulk(self):
+        """
+        The number of queries needed to notify the followers of a topic does not depend on their number.
+        """
+        settings.EMAIL_BACKEND = "django.core.mail.backends.locmem.EmailBackend"
+        topic = TopicFactory(forum=self.forum11, author=self.user1)
+        PostFactory(topic=topic, author=self.user1, position=1)
+        followers = [ProfileFactory().user for _ in range(6)]
+        for follower in followers[:5]:
+            TopicAnswerSubscription.objects.toggle_follow(topic, follower, by_email=follower == followers[0])
+        post = PostFactory(topic=topic, author=self.user2, position=2)
+
+        # the notifications are read, except by the third follower, and the last follower has none yet
+        Notification.objects.exclude(subscription__user=followers[2]).update(is_read=True)
+        Notification.objects.filter(subscription__user=followers[2]).update(pubdate=post.pubdate - timedelta(days=1))
+        unread = Notification.objects.get(subscription__user=followers[2])
+        TopicAnswerSubscription.objects.toggle_follow(topic, followers[5])
+        mail.outbox = []
+
+        subscriptions = TopicAnswerSubscription.objects.get_subscriptions(topic).exclude(user=self.user2)
+        with self.assertNumQueries(9):
+            TopicAnswerSubscription.send_notifications(subscriptions, content=post, sender=self.user2)
+
+        for follower in followers:
+            subscription = TopicAnswerSubscription.objects.get_existing(follower, topic)
+            self.assertFalse(subscription.last_notification.is_read)
+            self.assertEqual(post.pk, subscription.last_notification.object_id)
+            self.assertEqual(1, Notification.objects.filter(subscription=subscription).count())
+        self.assertEqual(unread, Notification.objects.get(subscription__user=followers[2], is_read=False))
+        self.assertEqual(1, len(mail.outbox))
+        self.assertEqual([followers[0].email], mail.outbox[0].to)
+
+    def test_deferred_emails(self):
+        settings.EMAIL_BACKEND = "django.core.mail.backends.locmem.EmailBackend"
+        topic = TopicFactory(forum=self.forum11, author=self.user1)
+        PostFactory(topic=topic, author=self.user1, position=1)
+        TopicAnswerSubscription.objects.toggle_follow(topic, self.user1, by_email=True)
+        mail.outbox = []
+
+        overridden_zds_app = copy.deepcopy(settings.ZDS_APP)
+        overridden_zds_app["notification"]["deferred_emails"] = True
+        with override_settings(ZDS_APP=overridden_zds_app):
+            PostFactory(topic=topic, author=self.user2, position=2)
+        self.assertEqual(0, len(mail.outbox))
+        self.assertEqual((1, 0), QueuedEmail.objects.depth())
+
+        call_command("send_queued_emails", "--once")
+        self.assertEqual(1, len(mail.outbox))
+        self.assertEqual([self.user1.email], mail.outbox[0].to)
+        self.assertEqual("text/html", mail.outbox[0].alternatives[0][1])
+        self.assertEqual((0, 0), QueuedEmail.objects.depth())
+
+    def test_queued_emails_retry(self):
+        settings.EMAIL_BACKEND = "django.core.mail.backends.locmem.EmailBackend"
+        mail.outbox = []
+        QueuedEmail.objects.enqueue([EmailMessage("Sujet", "Texte", "zds@example.com", [self.user1.email])])
+
+        with patch("django.core.mail.backends.locmem.EmailBackend.send_messages", side_effect=SMTPException("down")):
+            self.assertEqual((0, 1), send_queued_emails())
+        queued_email = QueuedEmail.objects.get()
+        self.assertEqual(1, queued_email.attempts)
+        self.assertEqual("down", queued_email.last_error)
+        self.assertGreater(queued_email.next_attempt, datetime.now())
+        self.assertEqual((0, 0), send_queued_emails())  # not due yet
+
+        QueuedEmail.objects.update(next_attempt=datetime.now())
+        self.assertEqual((1, 0), send_queued_emails())
+        self.assertEqual(1, len(mail.outbox))
+        self.assertFalse(QueuedEmail.objects.exists())
+
     def test_notifications_on_a_forum_subscribed(self):
         """
         When a user subscribes to a forum, they receive a notification for each topic created.
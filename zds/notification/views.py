@@ -10,6 +10,7 @@ from django.urls import reverse
 from django.conf import settings
 from zds.mp.models import PrivateTopic
 from zds.notification.models import Notification
+import zds.notification.signals as notification_signals
 from zds.utils.paginator import ZdSPagingListView
 from zds.forum.models import Post
 from zds.tutorialv2.models.database import ContentReaction
@@ -61,6 +62,7 @@ def mark_notifications_as_read(request):
             mark_content_read(notification.content_object.related_content, request.user)
 
     notifications.update(is_read=True)
+    notification_signals.notifications_updated.send(sender=Notification, user_pks=[request.user.pk])
 
     messages.success(request, _("Vos notifications ont bien été marquées comme lues."))
 
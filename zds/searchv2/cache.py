@@ -0,0 +1,91 @@
+"""
+Short-lived cache of the search results.
+
+The results of a search only depend on the request sent to Elasticsearch (query, authorized forums, page...) and on
+the content of the index, so the raw answers of Elasticsearch are stored under a hash of the request, and of a
+generation number which is incremented each time the index is modified (see ``bump_search_generation()``).
+"""
+
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import caches
+from elasticsearch_dsl import Search
+
+KEY_PREFIX = "search"
+GENERATION_KEY = f"{KEY_PREFIX}:generation"
+
+
+def get_search_cache():
+    """
+    :return: the Django cache used to store the results, or ``None`` if the cache is disabled
+    """
+    cache_settings = settings.ZDS_APP["search"]["cache"]
+    if not cache_settings["enabled"]:
+        return None
+    return caches[cache_settings["cache_alias"]]
+
+
+def get_search_generation():
+    cache = get_search_cache()
+    if cache is None:
+        return 0
+    return cache.get_or_set(GENERATION_KEY, 0, None)
+
+
+def bump_search_generation():
+    """Invalidates all the cached results, must be called after each modification of the index."""
+    cache = get_search_cache()
+    if cache is None:
+        return
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:  # not set yet (or evicted)
+        cache.set(GENERATION_KEY, 1, None)
+
+
+def normalize_query(query):
+    """
+    Normalizes the whitespaces and the case of a query, which do not change the results (the fields are analyzed),
+    so that more searches share the same cached results.
+    """
+    return " ".join(query.split()).casefold()
+
+
+class CachedSearch(Search):
+    """Search whose results (and number of hits) are cached for ``ZDS_APP["search"]["cache"]["timeout"]`` seconds."""
+
+    def make_key(self, kind, body):
+        payload = json.dumps([self._index, self._doc_type, body, self._params], sort_keys=True, default=str)
+        digest = hashlib.sha256(payload.encode("utf-8")).hexdigest()
+        return f"{KEY_PREFIX}:{get_search_generation()}:{kind}:{digest}"
+
+    def execute(self, ignore_cache=False):
+        cache = get_search_cache()
+        if cache is None or ignore_cache:
+            return super().execute(ignore_cache)
+        if hasattr(self, "_response"):
+            return self._response
+
+        key = self.make_key("search", self.to_dict())
+        raw_response = cache.get(key)
+        if raw_response is None:
+            response = super().execute()
+            cache.set(key, response.to_dict(), settings.ZDS_APP["search"]["cache"]["timeout"])
+            return response
+
+        self._response = self._response_class(self, raw_response)
+        return self._response
+
+    def count(self):
+        cache = get_search_cache()
+        if cache is None or hasattr(self, "_response"):
+            return super().count()
+
+        key = self.make_key("count", self.to_dict(count=True))
+        count = cache.get(key)
+        if count is None:
+            count = super().count()
+            cache.set(key, count, settings.ZDS_APP["search"]["cache"]["timeout"])
+        return count
@@ -0,0 +1,87 @@
+import logging
+import time
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+from elasticsearch import ConnectionError
+
+from zds.searchv2.models import ESIndexChange, NeedIndex, get_search_index_manager
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Index the changes queued when ZDS_APP['search']['realtime_indexing'] is set"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=settings.ZDS_APP["search"]["indexing_batch_size"],
+            help="Number of queued changes which triggers an indexing",
+        )
+        parser.add_argument(
+            "--flush-delay",
+            type=int,
+            default=settings.ZDS_APP["search"]["indexing_flush_delay"],
+            help="Maximum number of milliseconds a change waits before being indexed",
+        )
+        parser.add_argument("--once", action="store_true", help="Index the queued changes, then exit")
+
+    def handle(self, *args, **options):
+        index_manager = get_search_index_manager()
+        batch_size = options["batch_size"]
+        flush_delay = timedelta(milliseconds=options["flush_delay"])
+
+        while True:
+            # the connection may have been closed by the server while waiting
+            close_old_connections()
+            changes = ESIndexChange.objects.pending(batch_size)
+            if not changes:
+                if options["once"]:
+                    return
+                time.sleep(flush_delay.total_seconds())
+                continue
+
+            # wait for a full batch, unless the oldest change waited long enough
+            waited = datetime.now() - changes[0].pubdate
+            if len(changes) < batch_size and waited < flush_delay and not options["once"]:
+                time.sleep((flush_delay - waited).total_seconds())
+                continue
+
+            try:
+                indexed = index_manager.index_changes(changes)
+            except (ConnectionError, NeedIndex) as error:
+                self.retry_later(index_manager, error, options["once"])
+                continue
+            except Exception:
+                logger.exception("Unable to index %s changes at once, indexing them one by one", len(changes))
+                self.index_one_by_one(index_manager, changes, options["once"])
+                continue
+
+            ESIndexChange.objects.filter(pk__in=[change.pk for change in changes]).delete()
+            logger.info("%s changes indexed (%s documents)", len(changes), indexed)
+
+    def retry_later(self, index_manager, error, once):
+        if once:
+            raise CommandError(f"Unable to index the changes: {error!r}")
+        if isinstance(error, ConnectionError):
+            index_manager.report_failure()
+        logger.warning("Unable to index the changes, retrying later: %r", error)
+        time.sleep(settings.ZDS_APP["search"]["retry_delay"])
+
+    def index_one_by_one(self, index_manager, changes, once):
+        """Index the changes of a batch which failed one by one, so that the ones which cannot be indexed are skipped
+        instead of blocking the queue."""
+        for change in changes:
+            try:
+                index_manager.index_changes([change])
+            except (ConnectionError, NeedIndex) as error:
+                # the remaining changes are indexed by the next pass
+                self.retry_later(index_manager, error, once)
+                return
+            except Exception:
+                logger.exception("Unable to index the change « %s », skipped", change)
+            change.delete()
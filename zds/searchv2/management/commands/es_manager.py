@@ -1,10 +1,35 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import django
+from django.apps import apps
 from django.core.management.base import BaseCommand, CommandError
 from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import Max, Min
 
-from zds.searchv2.models import ESIndexManager, get_django_indexable_objects
+from zds.searchv2.models import ESIndexManager, ESReindexTask, get_django_indexable_objects
 from zds.tutorialv2.models.database import FakeChapter
 
 
+def run_reindex_task(pk):
+    """Index the objects of a reindexing task, then record that it is done.
+
+    Runs in the worker processes, hence the database connections handling.
+
+    :param int pk: primary key of the task
+    :return: the number of documents indexed
+    :rtype: int
+    """
+    close_old_connections()
+    task = ESReindexTask.objects.get(pk=pk)
+    index_manager = ESIndexManager(**settings.ES_SEARCH_INDEX)
+    task.indexed = index_manager.index_pk_range(apps.get_model(task.model), task.start_pk, task.end_pk, task.index)
+    task.save(update_fields=["indexed"])
+    close_old_connections()
+    return task.indexed
+
+
 class Command(BaseCommand):
     help = "Index data in ES and manage them"
 
@@ -26,7 +51,27 @@ class Command(BaseCommand):
 
     def add_arguments(self, parser):
         parser.add_argument(
-            "action", type=str, help="action to perform", choices=["setup", "clear", "index_all", "index_flagged"]
+            "action",
+            type=str,
+            help="action to perform",
+            choices=["setup", "clear", "index_all", "index_flagged", "rollback"],
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=settings.ZDS_APP["search"]["reindex_workers"],
+            help="Number of processes indexing the data (index_all only)",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=settings.ZDS_APP["search"]["reindex_chunk_size"],
+            help="Number of primary keys in the range indexed by a task (index_all only)",
+        )
+        parser.add_argument(
+            "--restart",
+            action="store_true",
+            help="Start a new reindexing, instead of resuming an interrupted one (index_all only)",
         )
 
     def handle(self, *args, **options):
@@ -36,16 +81,21 @@ class Command(BaseCommand):
         elif options["action"] == "clear":
             self.clear_es()
         elif options["action"] == "index_all":
-            self.index_documents(force_reindexing=True)
+            if options["workers"] < 1 or options["chunk_size"] < 1:
+                raise CommandError("--workers and --chunk-size must be positive")
+            self.index_all(options["workers"], options["chunk_size"], options["restart"])
         elif options["action"] == "index_flagged":
             self.index_documents(force_reindexing=False)
+        elif options["action"] == "rollback":
+            self.rollback()
         else:
             raise CommandError("unknown action {}".format(options["action"]))
 
     def setup_es(self):
 
         self.index_manager.reset_es_index(self.models)
-        self.index_manager.setup_custom_analyzer()
+        if not settings.ZDS_APP["search"]["versioned_index"]:  # the versions are created with the analyzer
+            self.index_manager.setup_custom_analyzer()
 
         self.index_manager.refresh_index()
 
@@ -72,3 +122,70 @@ class Command(BaseCommand):
                 print(f"  {indexed_counter}\titems indexed")
 
         self.index_manager.refresh_index()
+
+    def index_all(self, workers, chunk_size, restart):
+        """Index all the data in a new index, which replaces the current one once complete.
+
+        The work is split into tasks (ranges of primary keys of a model), run by a pool of processes. The tasks are
+        stored in the database, so that an interrupted reindexing is resumed by the next call.
+        """
+
+        index = ESReindexTask.objects.values_list("index", flat=True).first()
+        if index is not None and (restart or not self.index_manager.es.indices.exists(index)):
+            if self.index_manager.es.indices.exists(index):
+                self.index_manager.es.indices.delete(index)
+            ESReindexTask.objects.all().delete()
+            index = None
+
+        if index is None:
+            # fill the version created by `setup`, if any
+            index = self.index_manager.get_pending_index() or self.index_manager.create_index_version(self.models)
+            self.create_tasks(index, chunk_size)
+        else:
+            print(f"- resuming the indexing in {index}")
+
+        tasks = list(ESReindexTask.objects.filter(indexed__isnull=True).order_by("pk"))
+        done = ESReindexTask.objects.filter(indexed__isnull=False).count()
+        total = done + len(tasks)
+        print(f"- indexing {total - done} ranges of objects with {workers} processes")
+
+        if workers == 1:
+            for task in tasks:
+                done += 1
+                self.report_progress(task, run_reindex_task(task.pk), done, total)
+        else:
+            context = multiprocessing.get_context("spawn")
+            with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=django.setup) as executor:
+                futures = {executor.submit(run_reindex_task, task.pk): task for task in tasks}
+                for future in as_completed(futures):
+                    done += 1
+                    self.report_progress(futures[future], future.result(), done, total)
+
+        self.index_manager.es.indices.refresh(index)
+        self.index_manager.switch_alias(index)
+        ESReindexTask.objects.all().delete()
+        print(f"- {self.index_manager.index} now points to {index}")
+
+    def rollback(self):
+        index = self.index_manager.rollback()
+        if index is None:
+            raise CommandError("There is no previous version of the index to go back to")
+        print(f"- {self.index_manager.index} now points to {index}")
+
+    def create_tasks(self, index, chunk_size):
+        tasks = []
+        for model in self.models:
+            if model is FakeChapter:
+                continue
+
+            bounds = model.get_es_django_indexable(force_reindexing=True).aggregate(Min("pk"), Max("pk"))
+            if bounds["pk__min"] is None:
+                continue
+
+            label = model._meta.label_lower
+            for start_pk in range(bounds["pk__min"], bounds["pk__max"] + 1, chunk_size):
+                tasks.append(ESReindexTask(index=index, model=label, start_pk=start_pk, end_pk=start_pk + chunk_size))
+        ESReindexTask.objects.bulk_create(tasks)
+
+    def report_progress(self, task, indexed, done, total):
+        print(f"  [{done}/{total}] {indexed}\t{task.model} indexed (pk in [{task.start_pk}, {task.end_pk}[)")
@@ -0,0 +1,32 @@
+from django.conf import settings
+from django.db import models
+
+
+class ESIndexChangeManager(models.Manager):
+    """
+    Custom manager of the changes waiting to be indexed.
+    """
+
+    def enqueue(self, model, pks, action="index"):
+        """
+        Queues changes, to be indexed by the ``es_indexer`` command. Does nothing unless
+        ``ZDS_APP["search"]["realtime_indexing"]`` is set.
+
+        :param model: the model of the changed objects
+        :type model: class
+        :param pks: the pk of the changed objects, only evaluated if needed
+        :type pks: collections.abc.Iterable[int]
+        :param action: either "index" or "delete"
+        :type action: str
+        """
+        if not settings.ZDS_APP["search"]["realtime_indexing"]:
+            return
+        label = model._meta.label_lower
+        self.bulk_create([self.model(model=label, object_pk=pk, action=action) for pk in pks], batch_size=500)
+
+    def pending(self, limit):
+        """
+        :return: the oldest changes
+        :rtype: list[zds.searchv2.models.ESIndexChange]
+        """
+        return list(self.order_by("pk")[:limit])
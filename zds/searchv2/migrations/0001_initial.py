@@ -0,0 +1,36 @@
+# Generated by Django 2.2.24 on 2026-10-18 07:48
+
+import datetime
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = []
+
+    operations = [
+        migrations.CreateModel(
+            name="ESIndexChange",
+            fields=[
+                ("id", models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("model", models.CharField(max_length=100, verbose_name="Modèle")),
+                ("object_pk", models.PositiveIntegerField(verbose_name="Identifiant de l'objet")),
+                (
+                    "action",
+                    models.CharField(
+                        choices=[("index", "Indexation"), ("delete", "Suppression")],
+                        default="index",
+                        max_length=10,
+                        verbose_name="Action",
+                    ),
+                ),
+                ("pubdate", models.DateTimeField(default=datetime.datetime.now, verbose_name="Date de création")),
+            ],
+            options={
+                "verbose_name": "Modification à indexer",
+                "verbose_name_plural": "Modifications à indexer",
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 2.2.24 on 2026-10-18 07:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("searchv2", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ESReindexTask",
+            fields=[
+                ("id", models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("index", models.CharField(max_length=100, verbose_name="Index")),
+                ("model", models.CharField(max_length=100, verbose_name="Modèle")),
+                ("start_pk", models.PositiveIntegerField(verbose_name="Premier identifiant")),
+                ("end_pk", models.PositiveIntegerField(verbose_name="Dernier identifiant (exclu)")),
+                ("indexed", models.PositiveIntegerField(blank=True, null=True, verbose_name="Documents indexés")),
+            ],
+            options={
+                "verbose_name": "Tâche de réindexation",
+                "verbose_name_plural": "Tâches de réindexation",
+            },
+        ),
+    ]
@@ -1,25 +1,44 @@
+from collections import defaultdict
+from datetime import datetime
 from functools import partial
 import logging
+import threading
 import time
 
 from django.apps import apps
 from django.db import models
 from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
 
-from elasticsearch.helpers import parallel_bulk
-from elasticsearch import ConnectionError
+from elasticsearch.helpers import bulk, parallel_bulk
+from elasticsearch import ConnectionError, ElasticsearchException
 from elasticsearch_dsl import Mapping
 from elasticsearch_dsl.query import MatchAll
 from elasticsearch_dsl.connections import connections
 
 from django.db import transaction
 
+from zds.searchv2.cache import bump_search_generation
+from zds.searchv2.managers import ESIndexChangeManager
+
 
 def es_document_mapper(force_reindexing, index, obj):
     action = "update" if obj.es_already_indexed and not force_reindexing else "index"
     return obj.get_es_document_as_bulk_action(index, action)
 
 
+def copy_bulk_action(action, index):
+    """Copy a bulk action for another index. An update becomes an indexing, since the document may not be in this
+    index yet.
+    """
+    action = dict(action, _index=index)
+    if action["_op_type"] == "update":
+        action["_op_type"] = "index"
+        action["_source"] = action.pop("doc")
+    return action
+
+
 class AbstractESIndexable:
     """Mixin for indexable objects.
 
@@ -217,7 +236,64 @@ class AbstractESDjangoIndexable(AbstractESIndexable, models.Model):
 
         self.es_flagged = kwargs.pop("es_flagged", True)
 
-        return super().save(*args, **kwargs)
+        result = super().save(*args, **kwargs)
+        if self.es_flagged:
+            ESIndexChange.objects.enqueue(self.__class__, [self.pk])
+        return result
+
+    @classmethod
+    def get_es_indexable_from_pks(cls, pks, index_manager=None):
+        """Return the documents to (re)index for some objects. An object which is not returned is not indexable
+        anymore, so it is removed from the index.
+
+        :param pks: the pk of the objects
+        :type pks: list[int]
+        :param index_manager: the manager of the index in which the objects were already indexed, if any
+        :type index_manager: ESIndexManager
+        :rtype: list
+        """
+
+        return list(cls.get_es_django_indexable(force_reindexing=True).filter(pk__in=pks))
+
+
+class ESIndexChange(models.Model):
+    """A change waiting to be indexed by the ``es_indexer`` command, see ``ESIndexManager.index_changes()``."""
+
+    class Meta:
+        verbose_name = "Modification à indexer"
+        verbose_name_plural = "Modifications à indexer"
+
+    ACTIONS = (("index", "Indexation"), ("delete", "Suppression"))
+
+    model = models.CharField("Modèle", max_length=100)
+    object_pk = models.PositiveIntegerField("Identifiant de l'objet")
+    action = models.CharField("Action", max_length=10, choices=ACTIONS, default="index")
+    pubdate = models.DateTimeField("Date de création", default=datetime.now)
+
+    objects = ESIndexChangeManager()
+
+    def __str__(self):
+        return f"{self.action} {self.model} {self.object_pk}"
+
+
+class ESReindexTask(models.Model):
+    """A range of objects to index in a new index, see the ``index_all`` action of the ``es_manager`` command.
+
+    The tasks of a reindexing are kept until the index is put online, so that an interrupted reindexing can be resumed.
+    """
+
+    class Meta:
+        verbose_name = "Tâche de réindexation"
+        verbose_name_plural = "Tâches de réindexation"
+
+    index = models.CharField("Index", max_length=100)
+    model = models.CharField("Modèle", max_length=100)
+    start_pk = models.PositiveIntegerField("Premier identifiant")
+    end_pk = models.PositiveIntegerField("Dernier identifiant (exclu)")
+    indexed = models.PositiveIntegerField("Documents indexés", null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.model} [{self.start_pk}, {self.end_pk}[ in {self.index}"
 
 
 def delete_document_in_elasticsearch(instance):
@@ -228,7 +304,11 @@ def delete_document_in_elasticsearch(instance):
     :type instance: AbstractESIndexable
     """
 
-    index_manager = ESIndexManager(**settings.ES_SEARCH_INDEX)
+    if settings.ZDS_APP["search"]["realtime_indexing"]:
+        ESIndexChange.objects.enqueue(instance.__class__, [instance.pk], action="delete")
+        return
+
+    index_manager = get_search_index_manager()
 
     if index_manager.index_exists:
         index_manager.delete_document(instance)
@@ -247,9 +327,15 @@ class NeedIndex(Exception):
 
 
 class ESIndexManager:
-    """Manage a given index with different taylor-made functions"""
+    """Manage a given index with different taylor-made functions
+
+    The state of the cluster (is it reachable, does the index exist?) is probed once, then cached: requests which find
+    the cached state stale trigger a new probe in the background, so they never wait for it. After
+    ``ZDS_APP["search"]["failure_threshold"]`` consecutive failed requests (see ``report_failure()``), the cluster is
+    considered down until a probe succeeds, which is retried every ``ZDS_APP["search"]["retry_delay"]`` seconds.
+    """
 
-    def __init__(self, name, shards=5, replicas=0, connection_alias="default"):
+    def __init__(self, name, shards=5, replicas=0, connection_alias="default", lazy=False):
         """Create a manager for a given index
 
         :param name: the index name
@@ -260,10 +346,11 @@ class ESIndexManager:
         :type replicas: int
         :param connection_alias: the alias for connection
         :type connection_alias: str
+        :param lazy: if ``True``, the cluster is only probed when its state is needed for the first time
+        :type lazy: bool
         """
 
         self.index = name
-        self.index_exists = False
 
         self.number_of_shards = shards
         self.number_of_replicas = replicas
@@ -271,40 +358,147 @@ class ESIndexManager:
         self.logger = logging.getLogger(f"{__name__}.{self.__class__.__name__}:{self.index}")
 
         self.es = None
-        self.connected_to_es = False
+        self._connected_to_es = False
+        self._index_exists = False
+        self._checked_at = None
+        self._failures = 0
+        self._probing = False
+        self._health_lock = threading.Lock()
 
         if settings.ES_ENABLED:
             self.es = connections.get_connection(alias=connection_alias)
-            self.connected_to_es = True
+            if not lazy:
+                self.check_health()
+
+    @property
+    def connected_to_es(self):
+        """Cached state of the connection, a stale state is refreshed in the background."""
+
+        if self.es is None:
+            return False
+        if self._checked_at is None:
+            self.check_health()
+        elif self._is_stale():
+            self._check_health_in_background()
+        return self._connected_to_es
+
+    @connected_to_es.setter
+    def connected_to_es(self, value):
+        self._connected_to_es = value
+        self._checked_at = time.monotonic()
+
+    @property
+    def index_exists(self):
+        return self.connected_to_es and self._index_exists
+
+    @index_exists.setter
+    def index_exists(self, value):
+        self._index_exists = value
+
+    def _is_stale(self):
+        search_settings = settings.ZDS_APP["search"]
+        max_age = search_settings["health_check_interval"] if self._connected_to_es else search_settings["retry_delay"]
+        return time.monotonic() - self._checked_at >= max_age
+
+    def _check_health_in_background(self):
+        with self._health_lock:
+            if self._probing:
+                return
+            self._probing = True
+        threading.Thread(target=self.check_health, name=f"es-health-{self.index}", daemon=True).start()
+
+    def check_health(self):
+        """Probe the cluster and the index, then cache the result.
+
+        :return: whether the cluster is reachable
+        :rtype: bool
+        """
 
-            # test connection:
-            try:
-                self.es.info()
-            except ConnectionError:
-                self.connected_to_es = False
-                self.logger.warn("failed to connect to ES cluster")
-            else:
-                self.logger.info("connected to ES cluster")
+        connected, index_exists = False, False
+        try:
+            self.es.info()
+            index_exists = self.es.indices.exists(self.index)
+            connected = True
+        except ElasticsearchException:
+            self.logger.warn("failed to connect to ES cluster")
+        finally:
+            # even after an unexpected error, so that the next probes are not blocked
+            with self._health_lock:
+                if connected and not self._connected_to_es:
+                    self.logger.info("connected to ES cluster")
+                self._connected_to_es = connected
+                self._index_exists = index_exists
+                self._checked_at = time.monotonic()
+                self._failures = 0
+                self._probing = False
+        return connected
+
+    def report_failure(self):
+        """Record a request which failed because of the cluster. After too many failures in a row, the cluster is
+        considered down, so that the next requests do not even try to reach it.
+        """
+
+        with self._health_lock:
+            self._failures += 1
+            if self._connected_to_es and self._failures >= settings.ZDS_APP["search"]["failure_threshold"]:
+                self.logger.warn("ES cluster considered down after %s failed requests", self._failures)
+                self._connected_to_es = False
+                self._checked_at = time.monotonic()
+
+    def report_success(self):
+        """Record a request which succeeded."""
+
+        self._failures = 0
+
+    def execute_search(self, search):
+        """Execute a search, keeping track of the failures.
+
+        :param search: the search request, as set up by ``setup_search()``
+        :type search: elasticsearch_dsl.Search
+        :rtype: elasticsearch_dsl.response.Response
+        """
+
+        try:
+            response = search.execute()
+        except ConnectionError:
+            self.report_failure()
+            raise
+        self.report_success()
+        return response
 
-            if self.connected_to_es:
-                self.index_exists = self.es.indices.exists(self.index)
+    def _share_index_state(self):
+        """Keep the shared manager in line when this one creates or deletes its index."""
+
+        if _search_index_manager is not None and _search_index_manager is not self:
+            if _search_index_manager.index == self.index:
+                _search_index_manager.index_exists = self._index_exists
 
     def clear_es_index(self):
-        """Clear index"""
+        """Clear index, with all its versions"""
 
         if not self.connected_to_es:
             return
 
-        if self.es.indices.exists(self.index):
-            self.es.indices.delete(self.index)
+        indexes = self.get_served_indexes()
+        indexes += [name for name in self.get_index_versions() if name not in indexes]
+        for name in indexes:
+            self.es.indices.delete(name)
+
+        if indexes:
+            bump_search_generation()
             self.logger.info("index cleared")
 
             self.index_exists = False
+            self._share_index_state()
 
     def reset_es_index(self, models):
         """Delete old index and create an new one (with the same name). Setup the number of shards and replicas.
         Then, set mappings for the different models.
 
+        If ``ZDS_APP["search"]["versioned_index"]`` is set, the current index is kept: a new version of the index is
+        created instead, which will be filled and served by ``es_manager index_all``. It is only served right away if
+        there is no index yet.
+
         :param models: list of models
         :type models: list
         :param number_shards: number of shards
@@ -316,6 +510,12 @@ class ESIndexManager:
         if not self.connected_to_es:
             return
 
+        if settings.ZDS_APP["search"]["versioned_index"]:
+            index = self.create_index_version(models)
+            if not self.get_served_indexes():
+                self.switch_alias(index)
+            return
+
         self.clear_es_index()
 
         mappings_def = {}
@@ -333,6 +533,7 @@ class ESIndexManager:
         )
 
         self.index_exists = True
+        self._share_index_state()
 
         self.logger.info("index created")
 
@@ -363,7 +564,20 @@ class ESIndexManager:
 
         self.es.indices.close(self.index)
 
-        document = {
+        document = self.get_analysis_settings()
+
+        self.es.indices.put_settings(index=self.index, body=document)
+        self.es.indices.open(self.index)
+
+        self.logger.info("setup analyzer")
+
+    def get_analysis_settings(self):
+        """Return the settings of our custom analyzer, see ``setup_custom_analyzer()``.
+
+        :rtype: dict
+        """
+
+        return {
             "analysis": {
                 "filter": {
                     "french_elision": {
@@ -418,11 +632,6 @@ class ESIndexManager:
             }
         }
 
-        self.es.indices.put_settings(index=self.index, body=document)
-        self.es.indices.open(self.index)
-
-        self.logger.info("setup analyzer")
-
     def clear_indexing_of_model(self, model):
         """Nullify the indexing of a given model by setting ``es_already_index=False`` to all objects.
 
@@ -473,6 +682,7 @@ class ESIndexManager:
 
         documents_formatter = partial(es_document_mapper, force_reindexing, self.index)
         objects_per_batch = getattr(model, "objects_per_batch", 100)
+        building_indexes = self.get_building_indexes()
         indexed_counter = 0
         if model.__name__ == "PublishedContent":
             generate = model.get_es_indexable(force_reindexing)
@@ -493,6 +703,11 @@ class ESIndexManager:
                         pks = [o.pk for o in objects]
 
                     formatted_documents = list(map(documents_formatter, objects))
+                    formatted_documents += [
+                        copy_bulk_action(document, index)
+                        for index in building_indexes
+                        for document in formatted_documents
+                    ]
 
                     for _, hit in parallel_bulk(
                         self.es, formatted_documents, chunk_size=objects_per_batch, request_timeout=30
@@ -503,6 +718,7 @@ class ESIndexManager:
                     # mark all these objects as indexed at once
                     model_to_update.objects.filter(pk__in=pks).update(es_already_indexed=True, es_flagged=False)
                     indexed_counter += len(objects)
+            bump_search_generation()
             return indexed_counter
         else:
             then = time.time()
@@ -518,6 +734,11 @@ class ESIndexManager:
                         break
 
                     formatted_documents = list(map(documents_formatter, objects))
+                    formatted_documents += [
+                        copy_bulk_action(document, index)
+                        for index in building_indexes
+                        for document in formatted_documents
+                    ]
 
                     for _, hit in parallel_bulk(
                         self.es, formatted_documents, chunk_size=objects_per_batch, request_timeout=30
@@ -561,8 +782,256 @@ class ESIndexManager:
                     # fetch next batch
                     last_pk = objects[-1].pk
 
+            bump_search_generation()
             return indexed_counter
 
+    def index_changes(self, changes):
+        """Apply a batch of queued changes with a single bulk request. Only the last change of a given object is taken
+        into account.
+
+        :param changes: the changes, oldest first
+        :type changes: list[ESIndexChange]
+        :return: the number of documents indexed or deleted
+        :rtype: int
+        """
+
+        if not self.connected_to_es:
+            raise ConnectionError("N/A", "ES cluster is down", None)
+
+        if not self.index_exists:
+            raise NeedIndex()
+
+        last_actions = {}
+        for change in changes:
+            last_actions[(change.model, change.object_pk)] = change.action
+
+        to_index = defaultdict(list)
+        to_delete = []
+        for (label, pk), action in last_actions.items():
+            try:
+                model = apps.get_model(label)
+            except LookupError:
+                self.logger.warn(f"cannot index {label} with id {pk}: unknown model")
+                continue
+            if action == "index":
+                to_index[model].append(pk)
+            else:
+                to_delete.append((model, pk))
+
+        actions = []
+        indexed = {}
+        for model, pks in to_index.items():
+            documents = model.get_es_indexable_from_pks(pks, self)
+            actions.extend(document.get_es_document_as_bulk_action(self.index) for document in documents)
+            indexed[model] = [document.pk for document in documents if isinstance(document, model)]
+            to_delete.extend((model, pk) for pk in set(pks) - set(indexed[model]))
+
+        for model, pk in to_delete:
+            actions.append(
+                {"_op_type": "delete", "_index": self.index, "_type": model.get_es_document_type(), "_id": str(pk)}
+            )
+
+        for index in self.get_building_indexes():
+            actions.extend([copy_bulk_action(action, index) for action in actions if action["_index"] == self.index])
+
+        if actions:
+            # the changes are made visible before the cached results are invalidated
+            _, errors = bulk(self.es, actions, raise_on_error=False, request_timeout=30, refresh="wait_for")
+            bump_search_generation()
+            for error in errors:
+                action, result = next(iter(error.items()))
+                if action == "delete" and result.get("status") == 404:  # was never indexed
+                    continue
+                self.logger.warn(f"failed to {action} {result.get('_type')} with id {result.get('_id')}: {result}")
+
+        for model, pks in indexed.items():
+            model.objects.filter(pk__in=pks).update(es_already_indexed=True, es_flagged=False)
+
+        return len(actions)
+
+    def get_building_indexes(self):
+        """Return the indexes being built by ``es_manager index_all``, which must receive the changes as well.
+
+        :rtype: list[str]
+        """
+
+        return [
+            index for index in ESReindexTask.objects.values_list("index", flat=True).distinct() if index != self.index
+        ]
+
+    def get_version(self, index):
+        """Return the version number of an index named ``<index>_v<N>``, or ``None``.
+
+        :rtype: int
+        """
+
+        suffix = index[len(self.index) + 2 :]
+        return int(suffix) if index.startswith(f"{self.index}_v") and suffix.isdigit() else None
+
+    def get_index_versions(self):
+        """Return the versions of the index (named ``<index>_v<N>``), oldest first.
+
+        :rtype: list[str]
+        """
+
+        names = [name for name in self.es.indices.get(f"{self.index}_v*") if self.get_version(name) is not None]
+        return sorted(names, key=self.get_version)
+
+    def get_served_indexes(self):
+        """Return the indexes searched through ``self.index``, which is either an alias or a real index.
+
+        :rtype: list[str]
+        """
+
+        if self.es.indices.exists_alias(name=self.index):
+            return list(self.es.indices.get_alias(name=self.index))
+        if self.es.indices.exists(self.index):
+            return [self.index]
+        return []
+
+    def get_pending_index(self):
+        """Return the version of the index created by ``reset_es_index()`` but not served yet, if any.
+
+        :rtype: str
+        """
+
+        versions = self.get_index_versions()
+        served_versions = [self.get_version(name) or 0 for name in self.get_served_indexes()]
+        if versions and self.get_version(versions[-1]) > max(served_versions, default=0):
+            return versions[-1]
+        return None
+
+    def create_index_version(self, models):
+        """Create a new version of the index, with the mappings of the given models and our custom analyzer. The index
+        is not used until ``switch_alias()`` is called.
+
+        :param models: list of models
+        :type models: list
+        :return: the name of the new index
+        :rtype: str
+        """
+
+        versions = self.get_index_versions()
+        version = self.get_version(versions[-1]) + 1 if versions else 1
+        index = f"{self.index}_v{version}"
+
+        mappings_def = {}
+        for model in models:
+            mappings_def.update(model.get_es_mapping().to_dict())
+
+        index_settings = {"number_of_shards": self.number_of_shards, "number_of_replicas": self.number_of_replicas}
+        index_settings.update(self.get_analysis_settings())
+        self.es.indices.create(index, body={"settings": index_settings, "mappings": mappings_def})
+
+        self.logger.info(f"index {index} created")
+        return index
+
+    def point_alias(self, index):
+        """Atomically make ``self.index`` an alias of the given index only.
+
+        .. note::
+
+            If ``self.index`` is a real index (created by ``reset_es_index()`` when
+            ``ZDS_APP["search"]["versioned_index"]`` is not set), it has to be deleted before its name can be used by
+            the alias.
+
+        :param index: the index
+        :type index: str
+        """
+
+        actions = []
+        if self.es.indices.exists_alias(name=self.index):
+            served = self.es.indices.get_alias(name=self.index)
+            actions = [{"remove": {"index": name, "alias": self.index}} for name in served if name != index]
+        elif self.es.indices.exists(self.index):
+            self.es.indices.delete(self.index)
+        actions.append({"add": {"index": index, "alias": self.index}})
+        self.es.indices.update_aliases(body={"actions": actions})
+        bump_search_generation()
+
+        self.index_exists = True
+        self._share_index_state()
+
+        self.logger.info(f"{self.index} now points to {index}")
+
+    def switch_alias(self, index):
+        """Atomically make ``self.index`` an alias of the given index, then delete the previous versions but the
+        last ``ZDS_APP["search"]["kept_index_versions"]`` ones, kept for ``rollback()``.
+
+        :param index: the new index
+        :type index: str
+        """
+
+        self.point_alias(index)
+
+        kept_versions = settings.ZDS_APP["search"]["kept_index_versions"]
+        previous_versions = [
+            name for name in self.get_index_versions() if self.get_version(name) < self.get_version(index)
+        ]
+        for name in previous_versions[: max(0, len(previous_versions) - kept_versions)]:
+            self.es.indices.delete(name)
+            self.logger.info(f"index {name} deleted")
+
+    def rollback(self):
+        """Serve the previous version of the index again, and delete the current one.
+
+        :return: the version now served, or ``None`` if there is no previous version
+        :rtype: str
+        """
+
+        served = self.get_served_indexes()
+        served_versions = [self.get_version(name) for name in served]
+        if not served or None in served_versions:
+            return None
+
+        previous_versions = [
+            name for name in self.get_index_versions() if self.get_version(name) < min(served_versions)
+        ]
+        if not previous_versions:
+            return None
+
+        self.point_alias(previous_versions[-1])
+        for name in served:
+            self.es.indices.delete(name)
+            self.logger.info(f"index {name} deleted")
+        return previous_versions[-1]
+
+    def index_pk_range(self, model, start_pk, end_pk, index):
+        """Index the objects of a model whose pk is in ``[start_pk, end_pk[`` in the given index, which is expected
+        to be a new one (so the previous documents are not removed).
+
+        :param model: the model
+        :type model: class
+        :param start_pk: first pk of the range
+        :type start_pk: int
+        :param end_pk: end of the range, excluded
+        :type end_pk: int
+        :param index: name of the index
+        :type index: str
+        :return: the number of documents indexed
+        :rtype: int
+        """
+
+        objects_per_batch = getattr(model, "objects_per_batch", 100)
+        pks = list(
+            model.get_es_django_indexable(force_reindexing=True)
+            .filter(pk__gte=start_pk, pk__lt=end_pk)
+            .order_by("pk")
+            .values_list("pk", flat=True)
+        )
+
+        indexed_counter = 0
+        for i in range(0, len(pks), objects_per_batch):
+            batch = pks[i : i + objects_per_batch]
+            documents = model.get_es_indexable_from_pks(batch)
+            bulk(
+                self.es, [document.get_es_document_as_bulk_action(index) for document in documents], request_timeout=30
+            )
+            model.objects.filter(pk__in=batch).update(es_already_indexed=True, es_flagged=False)
+            indexed_counter += len(documents)
+
+        return indexed_counter
+
     def refresh_index(self):
         """Force the refreshing the index. The task is normally done periodically, but may be forced with this method.
 
@@ -580,6 +1049,7 @@ class ESIndexManager:
             raise NeedIndex()
 
         self.es.indices.refresh(self.index)
+        bump_search_generation()
 
     def update_single_document(self, document, doc):
         """Update given fields of a single document.
@@ -601,6 +1071,7 @@ class ESIndexManager:
         arguments = {"index": self.index, "doc_type": document.get_es_document_type(), "id": document.es_id}
         if self.es.exists(**arguments):
             self.es.update(body={"doc": doc}, **arguments)
+            bump_search_generation()
             self.logger.info(f"partial_update {document.get_es_document_type()} with id {document.es_id}")
 
     def delete_document(self, document):
@@ -619,6 +1090,7 @@ class ESIndexManager:
         arguments = {"index": self.index, "doc_type": document.get_es_document_type(), "id": document.es_id}
         if self.es.exists(**arguments):
             self.es.delete(**arguments)
+            bump_search_generation()
             self.logger.info(f"delete {document.get_es_document_type()} with id {document.es_id}")
 
     def delete_by_query(self, doc_type="", query=MatchAll()):
@@ -641,7 +1113,9 @@ class ESIndexManager:
         if not self.index_exists:
             raise NeedIndex()
 
-        response = self.es.delete_by_query(index=self.index, doc_type=doc_type, body={"query": query})
+        indexes = [self.index] + self.get_building_indexes()
+        response = self.es.delete_by_query(index=indexes, doc_type=doc_type, body={"query": query})
+        bump_search_generation()
 
         self.logger.info("delete_by_query {}s ({})".format(doc_type, response["deleted"]))
 
@@ -687,3 +1161,29 @@ class ESIndexManager:
             raise NeedIndex()
 
         return request.index(self.index).using(self.es)
+
+
+_search_index_manager = None
+_search_index_manager_lock = threading.Lock()
+
+
+def get_search_index_manager():
+    """Return the manager of ``settings.ES_SEARCH_INDEX`` shared by the whole process, so that the state of the
+    cluster is not probed again for each request.
+
+    :rtype: ESIndexManager
+    """
+
+    global _search_index_manager
+    if _search_index_manager is None:
+        with _search_index_manager_lock:
+            if _search_index_manager is None:
+                _search_index_manager = ESIndexManager(**settings.ES_SEARCH_INDEX, lazy=True)
+    return _search_index_manager
+
+
+@receiver(setting_changed)
+def reset_search_index_manager(sender, setting, **kwargs):
+    global _search_index_manager
+    if setting in ("ES_ENABLED", "ES_CONNECTIONS", "ES_SEARCH_INDEX"):
+        _search_index_manager = None
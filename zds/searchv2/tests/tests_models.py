@@ -1,13 +1,26 @@
+import copy
+import fnmatch
+import threading
+from unittest.mock import MagicMock, patch
+
+from elasticsearch import ConnectionError, TransportError
 from elasticsearch_dsl import Search
 from elasticsearch_dsl.query import MatchAll
 
 from django.conf import settings
-from django.test import TestCase
+from django.core.management import CommandError, call_command
+from django.test import SimpleTestCase, TestCase, override_settings
 
 from zds.forum.factories import TopicFactory, PostFactory, Topic, Post
 from zds.forum.factories import create_category_and_forum
 from zds.member.factories import ProfileFactory, StaffProfileFactory
-from zds.searchv2.models import ESIndexManager
+from zds.searchv2.models import (
+    AbstractESIndexable,
+    ESIndexChange,
+    ESIndexManager,
+    ESReindexTask,
+    get_search_index_manager,
+)
 from zds.tutorialv2.factories import PublishableContentFactory, ContainerFactory, ExtractFactory, publish_content
 from zds.tutorialv2.models.database import PublishedContent, FakeChapter, PublishableContent
 from zds.tutorialv2.tests import TutorialTestMixin, override_for_contents
@@ -364,3 +377,310 @@ class ESIndexManagerTests(TutorialTestMixin, TestCase):
 
         # delete index:
         self.manager.clear_es_index()
+
+
+@override_settings(ES_ENABLED=True, ES_SEARCH_INDEX={"name": "zds_search_test", "shards": 1, "replicas": 0})
+class SharedESIndexManagerTests(SimpleTestCase):
+    def setUp(self):
+        self.es = MagicMock()
+        self.es.indices.exists.return_value = True
+        for patcher in (
+            patch("zds.searchv2.models.connections.get_connection", return_value=self.es),
+            patch("zds.searchv2.models._search_index_manager", None),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def wait_for_health_check(self):
+        for thread in threading.enumerate():
+            if thread.name == "es-health-zds_search_test":
+                thread.join()
+
+    def test_shared_manager(self):
+        manager = get_search_index_manager()
+        self.assertIs(manager, get_search_index_manager())
+        self.assertFalse(self.es.info.called)  # lazy
+
+        # the cluster is probed once, then the state is cached
+        self.assertTrue(manager.connected_to_es)
+        self.assertTrue(manager.index_exists)
+        self.assertTrue(manager.connected_to_es)
+        self.assertEqual(self.es.info.call_count, 1)
+        self.assertEqual(self.es.indices.exists.call_count, 1)
+
+        with override_settings(ES_SEARCH_INDEX={"name": "other_index", "shards": 1, "replicas": 0}):
+            self.assertEqual(get_search_index_manager().index, "other_index")
+
+    def test_circuit_breaker(self):
+        manager = get_search_index_manager()
+        self.assertTrue(manager.connected_to_es)
+        failing_search = MagicMock()
+        failing_search.execute.side_effect = ConnectionError("N/A", "cluster down", None)
+
+        # the cluster is considered down after too many failures
+        for _ in range(settings.ZDS_APP["search"]["failure_threshold"]):
+            self.assertTrue(manager.connected_to_es)
+            with self.assertRaises(ConnectionError):
+                manager.execute_search(failing_search)
+        self.assertFalse(manager.connected_to_es)
+        self.assertFalse(manager.index_exists)
+        self.assertEqual(self.es.info.call_count, 1)
+
+        # ... until a probe succeeds, done in the background once the retry delay is elapsed
+        manager._checked_at -= settings.ZDS_APP["search"]["retry_delay"]
+        manager.connected_to_es  # does not wait for the probe
+        self.wait_for_health_check()
+        self.assertEqual(self.es.info.call_count, 2)
+        self.assertTrue(manager.connected_to_es)
+
+        # a failed probe keeps the cluster down
+        self.es.info.side_effect = ConnectionError("N/A", "cluster down", None)
+        manager._checked_at -= settings.ZDS_APP["search"]["health_check_interval"]
+        manager.connected_to_es
+        self.wait_for_health_check()
+        self.assertFalse(manager.connected_to_es)
+
+        # as does any other error of the cluster, and the next probes still run
+        self.es.info.side_effect = TransportError(500, "internal error")
+        manager._checked_at -= settings.ZDS_APP["search"]["retry_delay"]
+        manager.connected_to_es
+        self.wait_for_health_check()
+        self.assertFalse(manager.connected_to_es)
+        self.assertEqual(self.es.info.call_count, 4)
+        self.assertFalse(manager._probing)
+
+
+overridden_zds_app = copy.deepcopy(settings.ZDS_APP)
+overridden_zds_app["search"]["realtime_indexing"] = True
+
+
+@override_settings(
+    ES_ENABLED=True, ES_SEARCH_INDEX={"name": "zds_search_test", "shards": 1, "replicas": 0}, ZDS_APP=overridden_zds_app
+)
+class ESIndexerTests(TestCase):
+    def setUp(self):
+        self.es = MagicMock()
+        self.es.indices.exists.return_value = True
+        for patcher in (
+            patch("zds.searchv2.models.connections.get_connection", return_value=self.es),
+            patch("zds.searchv2.models._search_index_manager", None),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        self.category, self.forum = create_category_and_forum()
+        self.user = ProfileFactory().user
+
+    def test_index_changes(self):
+        topic = TopicFactory(forum=self.forum, author=self.user)
+        post = PostFactory(topic=topic, author=self.user, position=1)
+        post.text = "Nouveau texte"
+        post.save()
+        deleted_post = PostFactory(topic=topic, author=self.user, position=2)
+        deleted_post_pk = deleted_post.pk
+        deleted_post.delete()
+
+        # each save is queued, and so is the deletion instead of being done right away
+        self.assertGreater(ESIndexChange.objects.filter(model="forum.post", object_pk=post.pk).count(), 1)
+        self.assertFalse(self.es.delete.called)
+
+        # only the queue is tested here, not the content of the documents
+        with patch("zds.searchv2.models.bulk", return_value=(3, [])) as bulk, patch.object(
+            AbstractESIndexable, "get_es_document_source", return_value={}
+        ):
+            call_command("es_indexer", "--once")
+
+        # a single bulk request, with a single action per document
+        self.assertEqual(bulk.call_count, 1)
+        actions = {(action["_op_type"], action["_type"], action["_id"]) for action in bulk.call_args[0][1]}
+        self.assertEqual(
+            actions,
+            {
+                ("index", "topic", str(topic.pk)),
+                ("index", "post", str(post.pk)),
+                ("delete", "post", str(deleted_post_pk)),
+            },
+        )
+        self.assertEqual(len(bulk.call_args[0][1]), 3)
+        self.assertFalse(ESIndexChange.objects.exists())
+
+        post = Post.objects.get(pk=post.pk)
+        self.assertFalse(post.es_flagged)
+        self.assertTrue(post.es_already_indexed)
+
+    def test_index_changes_during_reindexing(self):
+        topic = TopicFactory(forum=self.forum, author=self.user)
+        ESReindexTask.objects.create(index="zds_search_test_v2", model="forum.topic", start_pk=1, end_pk=100)
+
+        with patch("zds.searchv2.models.bulk", return_value=(2, [])) as bulk, patch.object(
+            AbstractESIndexable, "get_es_document_source", return_value={}
+        ):
+            call_command("es_indexer", "--once")
+
+        # the change is applied to the index being built as well
+        actions = {(action["_op_type"], action["_index"], action["_id"]) for action in bulk.call_args[0][1]}
+        self.assertEqual(
+            actions, {("index", "zds_search_test", str(topic.pk)), ("index", "zds_search_test_v2", str(topic.pk))}
+        )
+
+    def test_failing_change(self):
+        topic = TopicFactory(forum=self.forum, author=self.user)
+        post = PostFactory(topic=topic, author=self.user, position=1)
+
+        # the change which cannot be indexed is skipped, instead of blocking the queue
+        with patch("zds.searchv2.models.bulk", return_value=(1, [])) as bulk, patch.object(
+            AbstractESIndexable, "get_es_document_source", return_value={}
+        ), patch.object(Topic, "get_es_document_source", side_effect=ValueError):
+            with self.assertLogs("zds.searchv2.management.commands.es_indexer", "ERROR"):
+                call_command("es_indexer", "--once")
+
+        self.assertFalse(ESIndexChange.objects.exists())
+        actions = {(action["_type"], action["_id"]) for call in bulk.call_args_list for action in call[0][1]}
+        self.assertEqual(actions, {("post", str(post.pk))})
+
+    def test_cluster_down(self):
+        topic = TopicFactory(forum=self.forum, author=self.user)
+        self.es.info.side_effect = ConnectionError("N/A", "cluster down", None)
+
+        # the changes are kept for later
+        with self.assertRaises(CommandError):
+            call_command("es_indexer", "--once")
+        self.assertTrue(ESIndexChange.objects.filter(model="forum.topic", object_pk=topic.pk).exists())
+
+
+versioned_zds_app = copy.deepcopy(settings.ZDS_APP)
+versioned_zds_app["search"]["versioned_index"] = True
+
+three_versions_zds_app = copy.deepcopy(settings.ZDS_APP)
+three_versions_zds_app["search"]["kept_index_versions"] = 3
+
+
+@override_settings(ES_ENABLED=True, ES_SEARCH_INDEX={"name": "zds_search_test", "shards": 1, "replicas": 0})
+class ESReindexTests(TestCase):
+    def setUp(self):
+        # the indexes of the cluster, and the ones behind the "zds_search_test" alias
+        self.indexes = ["zds_search_test"]
+        self.alias = []
+
+        self.es = MagicMock()
+        self.es.indices.get.side_effect = lambda pattern: {
+            name: {} for name in self.indexes if fnmatch.fnmatch(name, pattern)
+        }
+        self.es.indices.exists.side_effect = lambda index: index in self.indexes or (
+            index == "zds_search_test" and bool(self.alias)
+        )
+        self.es.indices.exists_alias.side_effect = lambda name: bool(self.alias)
+        self.es.indices.get_alias.side_effect = lambda name: {index: {} for index in self.alias}
+        self.es.indices.create.side_effect = lambda index, body: self.indexes.append(index)
+        self.es.indices.delete.side_effect = self.delete_index
+        self.es.indices.update_aliases.side_effect = self.update_aliases
+        for patcher in (
+            patch("zds.searchv2.models.connections.get_connection", return_value=self.es),
+            patch("zds.searchv2.models._search_index_manager", None),
+            # only the reindexing is tested here, not the mappings and the content of the documents
+            patch.object(AbstractESIndexable, "get_es_document_source", return_value={}),
+            *(patch.object(model, "get_es_mapping") for model in [FakeChapter, PublishedContent, Topic, Post]),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        self.category, self.forum = create_category_and_forum()
+        self.user = ProfileFactory().user
+        self.topics = [TopicFactory(forum=self.forum, author=self.user) for _ in range(3)]
+        for topic in self.topics:
+            PostFactory(topic=topic, author=self.user, position=1)
+
+    def delete_index(self, index):
+        self.indexes.remove(index)
+        if index in self.alias:
+            self.alias.remove(index)
+
+    def update_aliases(self, body):
+        for action in body["actions"]:
+            if "add" in action:
+                self.assertNotIn(action["add"]["alias"], self.indexes)
+                self.alias.append(action["add"]["index"])
+            else:
+                self.alias.remove(action["remove"]["index"])
+
+    def indexed_documents(self, bulk):
+        return [(action["_type"], action["_id"]) for call in bulk.call_args_list for action in call[0][1]]
+
+    def test_index_all(self):
+        with patch("zds.searchv2.models.bulk") as bulk:
+            call_command("es_manager", "index_all", "--workers", "1", "--chunk-size", "2")
+
+        # built in a new version of the index...
+        self.assertEqual(self.es.indices.create.call_args[0][0], "zds_search_test_v1")
+        indexes = {action["_index"] for call in bulk.call_args_list for action in call[0][1]}
+        self.assertEqual(indexes, {"zds_search_test_v1"})
+        documents = self.indexed_documents(bulk)
+        self.assertEqual(len(documents), 6)
+        self.assertEqual(len(set(documents)), 6)
+        self.assertFalse(Topic.objects.filter(es_flagged=True).exists())
+
+        # ... which is then served through the alias, instead of the former index
+        self.assertEqual(self.alias, ["zds_search_test_v1"])
+        self.assertEqual(self.indexes, ["zds_search_test_v1"])
+        self.assertFalse(ESReindexTask.objects.exists())
+
+        # the next one keeps the previous version
+        with patch("zds.searchv2.models.bulk"):
+            call_command("es_manager", "index_all", "--workers", "1")
+            call_command("es_manager", "index_all", "--workers", "1")
+        self.assertEqual(self.alias, ["zds_search_test_v3"])
+        self.assertEqual(self.indexes, ["zds_search_test_v2", "zds_search_test_v3"])
+
+    @override_settings(ZDS_APP=three_versions_zds_app)
+    def test_fewer_versions_than_kept(self):
+        with patch("zds.searchv2.models.bulk"):
+            for _ in range(3):
+                call_command("es_manager", "index_all", "--workers", "1")
+
+        # only 2 previous versions, none is deleted
+        self.assertEqual(self.alias, ["zds_search_test_v3"])
+        self.assertEqual(self.indexes, ["zds_search_test_v1", "zds_search_test_v2", "zds_search_test_v3"])
+
+    @override_settings(ZDS_APP=versioned_zds_app)
+    def test_versioned_setup(self):
+        # without index, the new one is served right away
+        self.indexes = []
+        call_command("es_manager", "setup")
+        self.assertEqual(self.alias, ["zds_search_test_v1"])
+
+        # otherwise, it is only served once filled by `index_all`
+        call_command("es_manager", "setup")
+        self.assertEqual(self.alias, ["zds_search_test_v1"])
+        self.assertEqual(self.indexes, ["zds_search_test_v1", "zds_search_test_v2"])
+        with patch("zds.searchv2.models.bulk") as bulk:
+            call_command("es_manager", "index_all", "--workers", "1")
+        self.assertEqual(
+            {action["_index"] for call in bulk.call_args_list for action in call[0][1]}, {"zds_search_test_v2"}
+        )
+        self.assertEqual(self.alias, ["zds_search_test_v2"])
+        self.assertEqual(self.indexes, ["zds_search_test_v1", "zds_search_test_v2"])
+
+        # the previous version can be served again
+        call_command("es_manager", "rollback")
+        self.assertEqual(self.alias, ["zds_search_test_v1"])
+        self.assertEqual(self.indexes, ["zds_search_test_v1"])
+        with self.assertRaises(CommandError):
+            call_command("es_manager", "rollback")
+
+    def test_resume_index_all(self):
+        with patch("zds.searchv2.models.bulk", side_effect=[None, Exception("interrupted")]) as bulk:
+            with self.assertRaises(Exception):
+                call_command("es_manager", "index_all", "--workers", "1", "--chunk-size", "1")
+        first_documents = self.indexed_documents(bulk)[:1]
+        self.assertEqual(ESReindexTask.objects.filter(indexed__isnull=False).count(), 1)
+        self.assertFalse(self.es.indices.update_aliases.called)
+
+        # the tasks done are not done again
+        with patch("zds.searchv2.models.bulk") as bulk:
+            call_command("es_manager", "index_all", "--workers", "1", "--chunk-size", "1")
+        self.assertEqual(self.es.indices.create.call_count, 1)
+        documents = first_documents + self.indexed_documents(bulk)
+        self.assertEqual(len(documents), 6)
+        self.assertEqual(len(set(documents)), 6)
+        self.assertTrue(self.es.indices.update_aliases.called)
+        self.assertFalse(ESReindexTask.objects.exists())
@@ -1,11 +1,12 @@
 from zds import json_handler
 import datetime
+from unittest.mock import MagicMock, patch
 
 from elasticsearch_dsl import Search
 from elasticsearch_dsl.query import MatchAll
 
 from django.conf import settings
-from django.test import TestCase
+from django.test import SimpleTestCase, TestCase, override_settings
 from django.urls import reverse
 
 from django.contrib.auth.models import Group
@@ -13,6 +14,7 @@ from zds.forum.factories import TopicFactory, PostFactory, Topic, Post, TagFacto
 from zds.forum.factories import create_category_and_forum
 
 from zds.member.factories import ProfileFactory, StaffProfileFactory
+from zds.searchv2.cache import bump_search_generation, normalize_query
 from zds.searchv2.models import ESIndexManager
 from zds.tutorialv2.factories import (
     PublishableContentFactory,
@@ -961,3 +963,71 @@ class ViewsTests(TutorialTestMixin, TestCase):
 
         # delete index:
         self.manager.clear_es_index()
+
+
+@override_settings(
+    ES_ENABLED=True,
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "search"}},
+)
+class SearchCacheTests(TestCase):
+    def setUp(self):
+        self.es = MagicMock()
+        self.es.search.return_value = {
+            "hits": {
+                "total": 1,
+                "hits": [
+                    {
+                        "_index": "zds_search",
+                        "_type": "topic",
+                        "_id": "1",
+                        "_score": 1.0,
+                        "_source": {
+                            "pk": 1,
+                            "get_absolute_url": "/forums/sujet/1/un-sujet/",
+                            "title": "Un sujet",
+                            "subtitle": "",
+                            "forum_title": "Un forum",
+                            "forum_get_absolute_url": "/forums/categorie/un-forum/",
+                            "pubdate": "2020-01-01T00:00:00",
+                        },
+                    }
+                ],
+            }
+        }
+        for patcher in (
+            patch("zds.searchv2.models.connections.get_connection", return_value=self.es),
+            patch("zds.searchv2.models._search_index_manager", None),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_normalize_query(self):
+        self.assertEqual(normalize_query("  Écrire  un\tTUTORIEL "), "écrire un tutoriel")
+
+    def test_cached_results(self):
+        result = self.client.get(reverse("search:similar") + "?q=un sujet", follow=False)
+        self.assertEqual(result.status_code, 200)
+        self.assertEqual(json_handler.loads(result.content.decode("utf-8"))["results"][0]["title"], "Un sujet")
+        self.assertEqual(self.es.search.call_count, 1)
+
+        # same query, with other whitespaces and case: the cached results are used
+        result = self.client.get(reverse("search:similar") + "?q=Un  SUJET", follow=False)
+        self.assertEqual(json_handler.loads(result.content.decode("utf-8"))["results"][0]["title"], "Un sujet")
+        self.assertEqual(self.es.search.call_count, 1)
+
+        # another query is sent to Elasticsearch
+        self.client.get(reverse("search:similar") + "?q=un autre sujet", follow=False)
+        self.assertEqual(self.es.search.call_count, 2)
+
+        # a modification of the index invalidates the cached results
+        bump_search_generation()
+        self.client.get(reverse("search:similar") + "?q=un sujet", follow=False)
+        self.assertEqual(self.es.search.call_count, 3)
+
+    @override_settings(
+        ZDS_APP={**settings.ZDS_APP, "search": {**settings.ZDS_APP["search"], "cache": {"enabled": False}}}
+    )
+    def test_cache_disabled(self):
+        for _ in range(2):
+            self.client.get(reverse("search:similar") + "?q=un sujet", follow=False)
+        self.assertEqual(self.es.search.call_count, 2)
@@ -1,7 +1,7 @@
 from zds import json_handler
 import operator
 
-from elasticsearch_dsl import Search
+from elasticsearch import ConnectionError
 from elasticsearch_dsl.query import Match, MultiMatch, FunctionScore, Term, Terms, Range
 
 from django.conf import settings
@@ -14,8 +14,9 @@ from django.urls import reverse
 from django.views.generic import CreateView
 from django.views.generic.detail import SingleObjectMixin
 
+from zds.searchv2.cache import CachedSearch, normalize_query
 from zds.searchv2.forms import SearchForm
-from zds.searchv2.models import ESIndexManager
+from zds.searchv2.models import get_search_index_manager
 from zds.utils.paginator import ZdSPagingListView
 from zds.utils.templatetags.authorized_forums import get_authorized_forums
 from functools import reduce
@@ -30,17 +31,17 @@ class SimilarTopicsView(CreateView, SingleObjectMixin):
         """Overridden because the index manager must NOT be initialized elsewhere."""
 
         super().__init__(**kwargs)
-        self.index_manager = ESIndexManager(**settings.ES_SEARCH_INDEX)
+        self.index_manager = get_search_index_manager()
 
     def get(self, request, *args, **kwargs):
         if "q" in request.GET:
-            self.search_query = "".join(request.GET["q"])
+            self.search_query = normalize_query(request.GET["q"])
 
         results = []
         if self.index_manager.connected_to_es and self.search_query:
             self.authorized_forums = get_authorized_forums(self.request.user)
 
-            search_queryset = Search()
+            search_queryset = CachedSearch()
             query = (
                 Match(_type="topic")
                 & Terms(forum_pk=self.authorized_forums)
@@ -56,8 +57,13 @@ class SimilarTopicsView(CreateView, SingleObjectMixin):
             scored_query = FunctionScore(query=query, boost_mode="multiply", functions=functions_score)
             search_queryset = search_queryset.query(scored_query)[:10]
 
+            try:
+                hits = self.index_manager.execute_search(search_queryset)
+            except ConnectionError:
+                hits = []
+
             # Build the result
-            for hit in search_queryset.execute():
+            for hit in hits:
                 result = {
                     "id": hit.pk,
                     "url": str(hit.get_absolute_url),
@@ -82,17 +88,17 @@ class SuggestionContentView(CreateView, SingleObjectMixin):
         """Overridden because the index manager must NOT be initialized elsewhere."""
 
         super().__init__(**kwargs)
-        self.index_manager = ESIndexManager(**settings.ES_SEARCH_INDEX)
+        self.index_manager = get_search_index_manager()
 
     def get(self, request, *args, **kwargs):
         if "q" in request.GET:
-            self.search_query = "".join(request.GET["q"])
+            self.search_query = normalize_query(request.GET["q"])
         excluded_content_ids = request.GET.get("excluded", "").split(",")
         results = []
         if self.index_manager.connected_to_es and self.search_query:
             self.authorized_forums = get_authorized_forums(self.request.user)
 
-            search_queryset = Search()
+            search_queryset = CachedSearch()
             if len(excluded_content_ids) > 0 and excluded_content_ids != [""]:
                 search_queryset = search_queryset.exclude("terms", content_pk=excluded_content_ids)
             query = Match(_type="publishedcontent") & MultiMatch(
@@ -117,8 +123,13 @@ class SuggestionContentView(CreateView, SingleObjectMixin):
             scored_query = FunctionScore(query=query, boost_mode="multiply", functions=functions_score)
             search_queryset = search_queryset.query(scored_query)[:10]
 
+            try:
+                hits = self.index_manager.execute_search(search_queryset)
+            except ConnectionError:
+                hits = []
+
             # Build the result
-            for hit in search_queryset.execute():
+            for hit in hits:
                 result = {
                     "id": hit.content_pk,
                     "pubdate": hit.publication_date,
@@ -147,28 +158,38 @@ class SearchView(ZdSPagingListView):
     authorized_forums = ""
 
     index_manager = None
+    search_failed = False
 
     def __init__(self, **kwargs):
         """Overridden because the index manager must NOT be initialized elsewhere."""
 
         super().__init__(**kwargs)
-        self.index_manager = ESIndexManager(**settings.ES_SEARCH_INDEX)
+        self.index_manager = get_search_index_manager()
 
     def get(self, request, *args, **kwargs):
         """Overridden to catch the request and fill the form."""
 
         if "q" in request.GET:
-            self.search_query = "".join(request.GET["q"])
+            self.search_query = normalize_query(request.GET["q"])
 
         self.search_form = self.search_form_class(data=self.request.GET)
 
         if self.search_query and not self.search_form.is_valid():
             raise PermissionDenied("research form is invalid")
 
-        return super().get(request, *args, **kwargs)
+        try:
+            response = super().get(request, *args, **kwargs)
+        except ConnectionError:
+            # the search is executed by the paginator, display the page without results
+            self.index_manager.report_failure()
+            self.search_failed = True
+            return super().get(request, *args, **kwargs)
+        if self.search_query:
+            self.index_manager.report_success()
+        return response
 
     def get_queryset(self):
-        if not self.index_manager.connected_to_es:
+        if self.search_failed or not self.index_manager.connected_to_es:
             messages.warning(self.request, _("Impossible de se connecter à Elasticsearch"))
             return []
 
@@ -177,7 +198,7 @@ class SearchView(ZdSPagingListView):
             # Searches forums the user is allowed to visit
             self.authorized_forums = get_authorized_forums(self.request.user)
 
-            search_queryset = Search()
+            search_queryset = CachedSearch()
 
             # Restrict (sub)category if any
             if self.search_form.cleaned_data["category"]:
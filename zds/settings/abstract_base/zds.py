@@ -1,3 +1,4 @@
+import json
 from pathlib import Path
 
 from django.utils.translation import gettext_lazy as _
@@ -47,6 +48,9 @@ THUMBNAIL_ALIASES = {
     },
 }
 
+# The zmarkdown version is part of the render cache keys, so that an upgrade invalidates them
+ZMD_VERSION = json.loads((BASE_DIR / "zmd" / "package.json").read_text())["dependencies"]["zmarkdown"]
+
 DEFAULT_ASSO_LINK = "https://www.helloasso.com/associations/zeste-de-savoir/adhesions/zeste-de-savoir-cotisations-2018"
 
 ZDS_APP = {
@@ -70,6 +74,14 @@ ZDS_APP = {
         "matomo_site_id": zds_config.get("matomo_site_id", 4),
         "matomo_url": zds_config.get("matomo_url", "https://matomo.zestedesavoir.com"),
         "matomo_token_auth": zds_config.get("matomo_token_auth", ""),
+        # maximum number of page views waiting to be sent to Matomo, the oldest ones are dropped beyond
+        "matomo_queue_size": 1000,
+        # maximum number of page views sent by each request to Matomo
+        "matomo_batch_size": 50,
+        # number of threads sending the page views, in each process
+        "matomo_workers": 1,
+        # seconds before a request to Matomo is given up
+        "matomo_timeout": 5,
         "association": {
             "name": "Zeste de Savoir",
             "fee": zds_config.get("association_fee", "20 €"),
@@ -137,6 +149,14 @@ ZDS_APP = {
         "users_in_hats_list": 5,
         "requested_hats_per_page": 100,
         "update_last_visit_interval": 600,  # seconds
+        # seconds the last visits are kept in memory before being saved in batches (0 to save them right away)
+        "last_visit_flush_interval": 30,
+        # maximum number of last visits saved by each batch
+        "last_visit_flush_batch_size": 500,
+        # if set, the accounts are deleted by the `unregister_members` command rather than during the request
+        "deferred_unregistration": False,
+        # maximum number of rows changed by each transaction of an unregistration
+        "unregistration_batch_size": 1000,
         "old_smileys_allowed": False,
         "old_smileys_cookie_key": "use_old_smileys",
     },
@@ -178,6 +198,14 @@ ZDS_APP = {
         "default_image": BASE_DIR / "fixtures" / "noir_black.png",
         "import_image_prefix": "archive",
         "build_pdf_when_published": True,
+        # number of chapters rendered concurrently when a content is exported, see `render_container_texts`
+        "publication_render_workers": 4,
+        # number of parsed manifests kept in memory by each process, see `PublishableContent.load_manifest`
+        "manifest_cache_size": 256,
+        # number of processes used by the publication watchdog for each format, "default" for the others
+        "extra_content_watchdog_workers": {"default": 1, "pdf": 1},
+        # maximum number of seconds the publication watchdog waits between two polls when idle
+        "extra_content_watchdog_max_wait": 60,
         "maximum_slug_size": 150,
         "characters_per_minute": 1500,
         "editorial_line_link": "https://zestedesavoir.com/articles/222/la-ligne-editoriale-officielle-de-zeste-de-savoir/",
@@ -203,6 +231,12 @@ ZDS_APP = {
         "top_tag_exclu": ["bug", "suggestion", "tutoriel", "beta", "article"],
         "greetings": ["salut", "bonjour", "yo ", "hello", "bon matin", "tout le monde se secoue"],
         "description_size": 120,
+        # seconds the forum and publication menus of the topbar are cached, if they are not invalidated before
+        "topbar_cache_timeout": 1800,
+        # seconds the topics read are kept in memory before being saved in batches (0 to save them right away)
+        "read_flush_interval": 5,
+        # maximum number of topics read saved by each batch
+        "read_flush_batch_size": 500,
     },
     "topic": {
         "home_number": 5,
@@ -217,11 +251,42 @@ ZDS_APP = {
     },
     "notification": {
         "per_page": 50,
+        # number of subscriptions notified by each statement when an answer is posted
+        "bulk_batch_size": 500,
+        # queue the e-mails of the notifications, to be sent by the `send_queued_emails` command
+        "deferred_emails": False,
+        # number of e-mails sent through each SMTP connection by `send_queued_emails`
+        "email_batch_size": 100,
+        # a queued e-mail is given up after this number of failures
+        "email_max_attempts": 5,
+        # seconds before the first retry of a queued e-mail, doubled after each failure
+        "email_retry_delay": 60,
+        # seconds the summary of the notifications (and alerts) in the header is cached, if it is not invalidated before
+        "header_cache_timeout": 600,
     },
     "paginator": {"folding_limit": 4},
     "search": {
         "mark_keywords": ["javafx", "haskell", "groovy", "powershell", "latex", "linux", "windows"],
         "results_per_page": 20,
+        # seconds before the cached state of the cluster is checked again, when it is up or down
+        "health_check_interval": 60,
+        "retry_delay": 10,
+        # number of failed requests in a row before the cluster is considered down
+        "failure_threshold": 3,
+        # queue the changes of the indexed objects, to be indexed by the `es_indexer` command
+        "realtime_indexing": False,
+        # the queued changes are indexed by batches of this size, or after this number of milliseconds
+        "indexing_batch_size": 500,
+        "indexing_flush_delay": 1000,
+        # `es_manager index_all` indexes ranges of this number of primary keys, with this number of processes
+        "reindex_chunk_size": 10000,
+        "reindex_workers": 4,
+        # `es_manager setup` creates a new version of the index instead of replacing the current one
+        "versioned_index": False,
+        # number of previous versions of the index kept for `es_manager rollback`
+        "kept_index_versions": 1,
+        # the results of the searches are cached for `timeout` seconds, until the index is modified
+        "cache": {"enabled": True, "cache_alias": "default", "timeout": 60},
         "search_groups": {
             "content": (_("Contenus publiés"), ["publishedcontent", "chapter"]),
             "topic": (_("Sujets du forum"), ["topic"]),
@@ -256,7 +321,22 @@ ZDS_APP = {
     },
     "visual_changes": [],
     "display_search_bar": True,
-    "zmd": {"server": "http://127.0.0.1:27272", "disable_pings": False},
+    "zmd": {
+        "server": "http://127.0.0.1:27272",
+        "disable_pings": False,
+        "version": ZMD_VERSION,
+        # maximum number of strings sent in one request by `render_markdown_batch`
+        "batch_size": 50,
+        "render_cache": {
+            "enabled": True,
+            # entries kept in the memory of each process
+            "max_entries": 1024,
+            # alias of a Django cache shared between processes, `None` to only use the memory of each process
+            "cache_alias": zds_config.get("zmd_render_cache_alias", None),
+            "timeout": 60 * 60 * 24,
+            "formats": ("html",),
+        },
+    },
     "stats_ga_viewid": "ga:86962671",
     "very_top_banner": {},
 }
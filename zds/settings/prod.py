@@ -145,6 +145,11 @@ SOCIAL_AUTH_PIPELINE = (
 
 ES_SEARCH_INDEX["shards"] = config["elasticsearch"].get("shards", 3)
 
+# the changes are indexed by the `es_indexer` command instead of `es_manager index_flagged`
+ZDS_APP["search"]["realtime_indexing"] = config["elasticsearch"].get("realtime_indexing", False)
+# `es_manager setup` never deletes the index in use, see `es_manager rollback`
+ZDS_APP["search"]["versioned_index"] = True
+
 
 ZDS_APP["site"]["association"]["email"] = "communication@zestedesavoir.com"
 
@@ -155,6 +160,15 @@ ZDS_APP["content"]["repo_private_path"] = "/opt/zds/data/contents-private"
 ZDS_APP["content"]["repo_public_path"] = "/opt/zds/data/contents-public"
 ZDS_APP["content"]["extra_content_generation_policy"] = "WATCHDOG"
 
+# zmarkdown renders are shared between the workers through memcached
+ZDS_APP["zmd"]["render_cache"]["cache_alias"] = "default"
+
+# notification e-mails are queued, and sent by the `send_queued_emails` command
+ZDS_APP["notification"]["deferred_emails"] = True
+
+# the accounts are deleted step by step by the `unregister_members` command
+ZDS_APP["member"]["deferred_unregistration"] = True
+
 ZDS_APP["visual_changes"] = zds_config.get("visual_changes", [])
 
 ZDS_APP["very_top_banner"] = config.get("very_top_banner", False)
@@ -7,3 +7,10 @@ CACHES = {
         "LOCATION": "/tmp/django_cache",
     }
 }
+
+# the tests (and the test processes) reuse the same primary keys, they must not see each other's cached summaries and menus
+ZDS_APP["notification"]["header_cache_timeout"] = 0
+ZDS_APP["forum"]["topbar_cache_timeout"] = 0
+# the tests check the topics read and the last visits right after the requests
+ZDS_APP["forum"]["read_flush_interval"] = 0
+ZDS_APP["member"]["last_visit_flush_interval"] = 0
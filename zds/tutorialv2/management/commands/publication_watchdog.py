@@ -1,60 +1,237 @@
 import logging
+import multiprocessing
+import socket
 import time
-
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from datetime import timedelta
 from pathlib import Path
 
-from django.core.management import BaseCommand
+import django
+from django.conf import settings
+from django.core.management import BaseCommand, CommandError
+from django.db import close_old_connections, connection, transaction
+from django.db.models import Exists, OuterRef, Q
 
 from zds.tutorialv2.models.database import PublicationEvent
 from zds.tutorialv2.publication_utils import PublicatorRegistry, FailureDuringPublication
 
 logger = logging.getLogger(__name__)
 
+# the other formats are built from the markdown file, which must therefore be exported first
+SOURCE_FORMAT = "md"
+DEFAULT_POOL = "default"
+MIN_WAIT = 1
+
+
+def export_event(pk):
+    """
+    Builds the file requested by a claimed (``RUNNING``) publication event and records the outcome on the event.
+
+    Runs in the worker processes, hence the database connections handling.
+
+    :param int pk: primary key of the publication event
+    :return: the new state of the event
+    :rtype: str
+    """
+    close_old_connections()
+    publication_event = PublicationEvent.objects.select_related(
+        "published_object", "published_object__content", "published_object__content__image"
+    ).get(pk=pk)
+    content = publication_event.published_object
+    extra_content_dir = content.get_extra_contents_directory()
+    building_extra_content_path = Path(
+        str(Path(extra_content_dir).parent) + "__building", "extra_contents", content.content_public_slug
+    )
+    building_extra_content_path.mkdir(parents=True, exist_ok=True)
+    base_name = str(building_extra_content_path)
+    md_file_path = base_name + ".md"
+
+    logger.info("Exporting « %s » as %s", content.title(), publication_event.format_requested)
+    start = time.monotonic()
+    try:
+        PublicatorRegistry.get(publication_event.format_requested).publish(md_file_path, base_name)
+    except FailureDuringPublication:
+        logger.error("Failed to export « %s » as %s", content.title(), publication_event.format_requested)
+        publication_event.state_of_processing = "FAILURE"
+    except Exception:
+        logger.exception(
+            "Unexpected error while exporting « %s » as %s", content.title(), publication_event.format_requested
+        )
+        publication_event.state_of_processing = "FAILURE"
+    else:
+        logger.info("Succeed to export « %s » as %s", content.title(), publication_event.format_requested)
+        publication_event.state_of_processing = "SUCCESS"
+    publication_event.duration = timedelta(seconds=time.monotonic() - start)
+    publication_event.save(update_fields=["state_of_processing", "duration"])
+    close_old_connections()
+    return publication_event.state_of_processing
+
+
+def claim_event(node_name, formats_filter=None):
+    """
+    Marks the oldest claimable requested event as ``RUNNING`` on behalf of ``node_name``.
+
+    Rows locked by another watchdog are skipped when the database supports it. Whatever the database, the state is
+    changed with a conditional update, so an event cannot be claimed twice.
+    An event is not claimable while a markdown export of the same content is still requested or running.
+
+    :param str node_name: name of the claiming watchdog
+    :param Q formats_filter: restricts the formats that can be claimed
+    :return: the claimed event, or ``None``
+    :rtype: PublicationEvent
+    """
+    pending_source = PublicationEvent.objects.filter(
+        published_object=OuterRef("published_object"),
+        format_requested=SOURCE_FORMAT,
+        state_of_processing__in=["REQUESTED", "RUNNING"],
+        pk__lt=OuterRef("pk"),
+    )
+    with transaction.atomic():
+        candidates = (
+            PublicationEvent.objects.filter(state_of_processing="REQUESTED")
+            .annotate(pending_source=Exists(pending_source))
+            .filter(pending_source=False)
+            .order_by("pk")
+            .select_for_update(skip_locked=connection.features.has_select_for_update_skip_locked)
+        )
+        if formats_filter is not None:
+            candidates = candidates.filter(formats_filter)
+        for publication_event in candidates[:10]:
+            claimed = PublicationEvent.objects.filter(pk=publication_event.pk, state_of_processing="REQUESTED").update(
+                state_of_processing="RUNNING", claimed_by=node_name
+            )
+            if claimed:
+                return publication_event
+    return None
+
 
 class Command(BaseCommand):
     help = "Launch a watchdog that generate all exported formats (epub, pdf...) files without blocking request handling"
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--name",
+            default=socket.gethostname(),
+            help="Name of this watchdog, must be unique among the running watchdogs (default: host name)",
+        )
+        parser.add_argument(
+            "--workers",
+            action="append",
+            default=[],
+            metavar="FORMAT=N",
+            help="Number of processes exporting FORMAT (or 'default' for the formats without their own pool)",
+        )
+        parser.add_argument(
+            "--max-wait",
+            type=int,
+            default=settings.ZDS_APP["content"]["extra_content_watchdog_max_wait"],
+            help="Maximum number of seconds between two polls when there is nothing to do",
+        )
+        parser.add_argument(
+            "--once", action="store_true", help="Export the requested events in this process, then exit"
+        )
+
     def handle(self, *args, **options):
-        # We mark running events as failure, in case this command failed while running
-        running_events = PublicationEvent.objects.filter(state_of_processing="RUNNING")
-        for publication_event in running_events.iterator():
-            publication_event.state_of_processing = "FAILURE"
-            publication_event.save()
+        self.node_name = options["name"]
+        self.pool_sizes = self.get_pool_sizes(options["workers"])
 
-        while True:
-            requested_events = PublicationEvent.objects.filter(state_of_processing="REQUESTED")
-            while requested_events.count() == 0:
-                time.sleep(60)
+        # We mark the events this node was running as failure, in case this command failed while running
+        PublicationEvent.objects.filter(state_of_processing="RUNNING", claimed_by__in=[self.node_name, ""]).update(
+            state_of_processing="FAILURE"
+        )
 
+        if options["once"]:
             self.run()
+        else:
+            self.serve(options["max_wait"])
+
+    def get_pool_sizes(self, workers_options):
+        pool_sizes = {DEFAULT_POOL: 1}
+        pool_sizes.update(settings.ZDS_APP["content"]["extra_content_watchdog_workers"])
+        for option in workers_options:
+            format_name, _, size = option.partition("=")
+            try:
+                pool_sizes[format_name] = int(size)
+            except ValueError:
+                raise CommandError(f"Invalid --workers value: {option}")
+        for format_name, size in pool_sizes.items():
+            if size < 1:
+                raise CommandError(f"The {format_name} pool needs at least one worker")
+        return pool_sizes
+
+    def pool_of(self, format_name):
+        return format_name if format_name in self.pool_sizes else DEFAULT_POOL
+
+    def formats_filter(self, pool_names):
+        """Builds the filter matching the formats handled by the given pools."""
+        dedicated_formats = [name for name in self.pool_sizes if name != DEFAULT_POOL]
+        formats_filter = Q(format_requested__in=[name for name in pool_names if name != DEFAULT_POOL])
+        if DEFAULT_POOL in pool_names:
+            formats_filter |= ~Q(format_requested__in=dedicated_formats)
+        return formats_filter
 
     def run(self):
-        requested_events = PublicationEvent.objects.select_related(
-            "published_object", "published_object__content", "published_object__content__image"
-        ).filter(state_of_processing="REQUESTED")
-
-        for publication_event in requested_events.iterator():
-            content = publication_event.published_object
-            extra_content_dir = content.get_extra_contents_directory()
-            building_extra_content_path = Path(
-                str(Path(extra_content_dir).parent) + "__building", "extra_contents", content.content_public_slug
-            )
-            if not building_extra_content_path.exists():
-                building_extra_content_path.mkdir(parents=True)
-            base_name = str(building_extra_content_path)
-            md_file_path = base_name + ".md"
+        """Exports the requested events one at a time, until there is no more claimable event."""
+        publication_event = claim_event(self.node_name)
+        while publication_event is not None:
+            export_event(publication_event.pk)
+            publication_event = claim_event(self.node_name)
 
-            logger.info("Exporting « %s » as %s", content.title(), publication_event.format_requested)
-            publication_event.state_of_processing = "RUNNING"
-            publication_event.save()
+    def serve(self, max_wait):
+        """Dispatches the requested events to the pools of workers, forever."""
+        context = multiprocessing.get_context("spawn")
+        executors = {
+            name: ProcessPoolExecutor(max_workers=size, mp_context=context, initializer=django.setup)
+            for name, size in self.pool_sizes.items()
+        }
+        running = {}  # future -> (pool name, event pk)
+        wait_time = MIN_WAIT
 
-            publicator = PublicatorRegistry.get(publication_event.format_requested)
-            try:
-                publicator.publish(md_file_path, base_name)
-            except FailureDuringPublication:
-                logger.error("Failed to export « %s » as %s", content.title(), publication_event.format_requested)
-                publication_event.state_of_processing = "FAILURE"
+        while True:
+            # the connection may have been closed by the server while waiting
+            close_old_connections()
+            claimed = False
+            busy = {name: 0 for name in executors}
+            for pool_name, _ in running.values():
+                busy[pool_name] += 1
+            free_pools = [name for name in executors if busy[name] < self.pool_sizes[name]]
+
+            while free_pools:
+                publication_event = claim_event(self.node_name, self.formats_filter(free_pools))
+                if publication_event is None:
+                    break
+                claimed = True
+                pool_name = self.pool_of(publication_event.format_requested)
+                running[executors[pool_name].submit(export_event, publication_event.pk)] = (
+                    pool_name,
+                    publication_event.pk,
+                )
+                busy[pool_name] += 1
+                if busy[pool_name] >= self.pool_sizes[pool_name]:
+                    free_pools.remove(pool_name)
+
+            # short-poll while there is work, back off exponentially when idle
+            wait_time = MIN_WAIT if claimed else min(wait_time * 2, max_wait)
+            if running:
+                done, _ = wait(running, timeout=wait_time, return_when=FIRST_COMPLETED)
             else:
-                logger.info("Succeed to export « %s » as %s", content.title(), publication_event.format_requested)
-                publication_event.state_of_processing = "SUCCESS"
-            publication_event.save()
+                done = set()
+                time.sleep(wait_time)
+
+            broken_pools = set()
+            for future in done:
+                pool_name, pk = running.pop(future)
+                try:
+                    future.result()
+                except BrokenProcessPool:
+                    logger.error("A %s worker died while exporting the publication event %s", pool_name, pk)
+                    PublicationEvent.objects.filter(pk=pk).update(state_of_processing="FAILURE")
+                    broken_pools.add(pool_name)
+                except Exception:
+                    logger.exception("Failed to export the publication event %s", pk)
+                    PublicationEvent.objects.filter(pk=pk).update(state_of_processing="FAILURE")
+            for pool_name in broken_pools:
+                executors[pool_name] = ProcessPoolExecutor(
+                    max_workers=self.pool_sizes[pool_name], mp_context=context, initializer=django.setup
+                )
@@ -0,0 +1,96 @@
+"""
+Cache of the manifests read from the content repositories.
+
+A commit is immutable, so the manifest of a given commit of a given repository never changes: the parsed manifests are
+kept in a size-bounded in-process LRU, keyed by ``(repository path, sha)``. Each hit returns a copy, so callers are
+free to modify the manifest they get.
+"""
+
+import copy
+import re
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+# symbolic references (branches, ``HEAD``...) and abbreviated shas can point to another commit later on
+FULL_SHA = re.compile(r"[0-9a-f]{40}")
+
+
+class ManifestCache:
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def is_cacheable(sha):
+        return isinstance(sha, str) and FULL_SHA.fullmatch(sha) is not None
+
+    def get(self, repo_path, sha):
+        """
+        :return: a copy of the manifest stored for this version, or ``None``
+        :rtype: dict
+        """
+        with self._lock:
+            manifest = self._entries.get((repo_path, sha))
+            if manifest is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end((repo_path, sha))
+            self.hits += 1
+        return copy.deepcopy(manifest)
+
+    def set(self, repo_path, sha, manifest):
+        if self.max_entries <= 0 or not self.is_cacheable(sha):
+            return
+        manifest = copy.deepcopy(manifest)
+        with self._lock:
+            self._entries[(repo_path, sha)] = manifest
+            self._entries.move_to_end((repo_path, sha))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+_manifest_cache = None
+_manifest_cache_lock = threading.Lock()
+
+
+def get_manifest_cache():
+    """
+    Returns the process-wide manifest cache, sized by ``ZDS_APP["content"]["manifest_cache_size"]``.
+
+    :rtype: ManifestCache
+    """
+    global _manifest_cache
+    if _manifest_cache is None:
+        with _manifest_cache_lock:
+            if _manifest_cache is None:
+                _manifest_cache = ManifestCache(settings.ZDS_APP["content"].get("manifest_cache_size", 256))
+    return _manifest_cache
+
+
+@receiver(setting_changed)
+def reset_manifest_cache(sender, setting, **kwargs):
+    global _manifest_cache
+    if setting == "ZDS_APP":
+        _manifest_cache = None
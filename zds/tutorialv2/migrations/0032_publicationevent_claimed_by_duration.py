@@ -0,0 +1,21 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tutorialv2", "0031_source_is_url"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="publicationevent",
+            name="claimed_by",
+            field=models.CharField(blank=True, default="", max_length=100, verbose_name="traité par"),
+        ),
+        migrations.AddField(
+            model_name="publicationevent",
+            name="duration",
+            field=models.DurationField(blank=True, null=True, verbose_name="durée de l'export"),
+        ),
+    ]
@@ -29,17 +29,17 @@ from zds.searchv2.models import (
     AbstractESDjangoIndexable,
     AbstractESIndexable,
     delete_document_in_elasticsearch,
-    ESIndexManager,
+    get_search_index_manager,
 )
+from zds.tutorialv2.manifest_cache import get_manifest_cache
 from zds.tutorialv2.managers import PublishedContentManager, PublishableContentManager, ReactionManager
 from zds.tutorialv2.models import TYPE_CHOICES, STATUS_CHOICES, CONTENT_TYPES_REQUIRING_VALIDATION, PICK_OPERATIONS
 from zds.tutorialv2.models.mixins import TemplatableContentModelMixin, OnlineLinkableContentMixin
 from zds.tutorialv2.models.versioned import NotAPublicVersion
-from zds.tutorialv2.utils import get_content_from_json, BadManifestError
+from zds.tutorialv2.utils import get_content_from_json, get_blob, BadManifestError
 from zds.utils import get_current_user
 from zds.utils.models import SubCategory, Licence, HelpWriting, Comment, Tag
 from zds.utils.templatetags.emarkdown import render_markdown_stats
-from zds.utils.tutorials import get_blob
 from zds.utils.uuslug_wrapper import uuslug
 
 ALLOWED_TYPES = ["pdf", "md", "html", "epub", "zip", "tex"]
@@ -382,6 +382,13 @@ class PublishableContent(models.Model, TemplatableContentModelMixin):
             if not os.path.isdir(path):
                 raise OSError(path)
 
+            # a commit never changes, so its manifest can be kept once parsed
+            manifest_cache = get_manifest_cache()
+            if manifest_cache.is_cacheable(sha):
+                manifest = manifest_cache.get(path, sha)
+                if manifest is not None:
+                    return manifest
+
             repo = Repo(path)
             data = get_blob(repo.commit(sha).tree, "manifest.json")
             try:
@@ -391,6 +398,7 @@ class PublishableContent(models.Model, TemplatableContentModelMixin):
                 raise BadManifestError(
                     _("Une erreur est survenue lors de la lecture du manifest.json, est-ce du JSON ?")
                 )
+            manifest_cache.set(path, sha, manifest)
 
         return manifest
 
@@ -1025,7 +1033,7 @@ class PublishedContent(AbstractESDjangoIndexable, TemplatableContentModelMixin,
     def get_es_indexable(cls, force_reindexing=False):
         """Overridden to also include chapters"""
 
-        index_manager = ESIndexManager(**settings.ES_SEARCH_INDEX)
+        index_manager = get_search_index_manager()
 
         # fetch initial batch
         last_pk = 0
@@ -1036,20 +1044,7 @@ class PublishedContent(AbstractESDjangoIndexable, TemplatableContentModelMixin,
             chapters = []
 
             for content in objects:
-                versioned = content.load_public_version()
-
-                # chapters are only indexed for middle and big tuto
-                if versioned.has_sub_containers():
-
-                    # delete possible previous chapters
-                    if content.es_already_indexed:
-                        index_manager.delete_by_query(
-                            FakeChapter.get_es_document_type(), ES_Q("match", _routing=content.es_id)
-                        )
-
-                    # (re)index the new one(s)
-                    for chapter in versioned.get_list_of_chapters():
-                        chapters.append(FakeChapter(chapter, versioned, content.es_id))
+                chapters.extend(content.get_es_chapters(index_manager))
 
             if chapters:
                 # since we want to return at most PublishedContent.objects_per_batch items
@@ -1064,6 +1059,37 @@ class PublishedContent(AbstractESDjangoIndexable, TemplatableContentModelMixin,
             last_pk = objects[-1].pk
             objects = list(objects_source.filter(pk__gt=last_pk)[: PublishedContent.objects_per_batch])
 
+    @classmethod
+    def get_es_indexable_from_pks(cls, pks, index_manager=None):
+        """Overridden to also include chapters"""
+
+        contents = super().get_es_indexable_from_pks(pks, index_manager)
+        chapters = []
+        for content in contents:
+            chapters.extend(content.get_es_chapters(index_manager))
+        return chapters + contents
+
+    def get_es_chapters(self, index_manager):
+        """Remove the previously indexed chapters of this content from the index, and return the new ones.
+
+        :param index_manager: the manager of the index, ``None`` for a new index
+        :type index_manager: zds.searchv2.models.ESIndexManager
+        :rtype: list[FakeChapter]
+        """
+
+        versioned = self.load_public_version()
+
+        # chapters are only indexed for middle and big tuto
+        if not versioned.has_sub_containers():
+            return []
+
+        # delete possible previous chapters
+        if index_manager is not None and self.es_already_indexed:
+            index_manager.delete_by_query(FakeChapter.get_es_document_type(), ES_Q("match", _routing=self.es_id))
+
+        # (re)index the new one(s)
+        return [FakeChapter(chapter, versioned, self.es_id) for chapter in versioned.get_list_of_chapters()]
+
     def get_es_document_source(self, excluded_fields=None):
         """Overridden to handle the fact that most information are versioned"""
 
@@ -1114,7 +1140,7 @@ def delete_published_content_in_elasticsearch(sender, instance, **kwargs):
     chapters.
     """
 
-    index_manager = ESIndexManager(**settings.ES_SEARCH_INDEX)
+    index_manager = get_search_index_manager()
 
     if index_manager.index_exists:
         index_manager.delete_by_query(FakeChapter.get_es_document_type(), ES_Q("match", _routing=instance.es_id))
@@ -1426,6 +1452,9 @@ class PublicationEvent(models.Model):
     # 25 for formats such as "printable.pdf", if tomorrow we want other "long" formats this will be ready
     format_requested = models.CharField(blank=False, null=False, max_length=25)
     created = models.DateTimeField(verbose_name="date de création", name="date", auto_now_add=True)
+    # name of the watchdog node which processes (or processed) the event
+    claimed_by = models.CharField(verbose_name="traité par", max_length=100, blank=True, default="")
+    duration = models.DurationField(verbose_name="durée de l'export", null=True, blank=True)
 
     def __str__(self):
         return f"{self.published_object.title()}: {self.format_requested} - {self.state_of_processing}"
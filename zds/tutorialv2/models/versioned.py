@@ -427,13 +427,7 @@ class Container:
         :rtype: str
         """
         if self.introduction:
-            return (
-                get_blob(
-                    self.top_container().repository.commit(self.top_container().current_version).tree,
-                    self.introduction.replace("\\", "/"),
-                )
-                or ""
-            )
+            return get_blob(self.top_container().get_tree(), self.introduction) or ""
         return ""
 
     def get_conclusion(self):
@@ -442,13 +436,7 @@ class Container:
         :rtype: str
         """
         if self.conclusion:
-            return (
-                get_blob(
-                    self.top_container().repository.commit(self.top_container().current_version).tree,
-                    self.conclusion.replace("\\", "/"),
-                )
-                or ""
-            )
+            return get_blob(self.top_container().get_tree(), self.conclusion) or ""
         return ""
 
     def get_introduction_online(self):
@@ -1019,10 +1007,7 @@ class Extract:
         :rtype: str
         """
         if self.text:
-            return get_blob(
-                self.container.top_container().repository.commit(self.container.top_container().current_version).tree,
-                self.text.replace("\\", "/"),
-            )
+            return get_blob(self.container.top_container().get_tree(), self.text)
         return ""
 
     def compute_hash(self):
@@ -1162,6 +1147,8 @@ class VersionedContent(Container, TemplatableContentModelMixin):
     current_version = None
     slug_repository = ""
     repository = None
+    _tree = None
+    _tree_version = None
 
     PUBLIC = False  # this variable is set to true when the VersionedContent is created from the public repository
 
@@ -1235,6 +1222,16 @@ class VersionedContent(Container, TemplatableContentModelMixin):
     def __str__(self):
         return self.title
 
+    def get_tree(self):
+        """
+        :return: the root tree of the current version, kept while neither the version nor the repository change
+        :rtype: git.objects.tree.Tree
+        """
+        if self._tree is None or self._tree_version != (self.repository, self.current_version):
+            self._tree = self.repository.commit(self.current_version).tree
+            self._tree_version = (self.repository, self.current_version)
+        return self._tree
+
     def get_absolute_url(self, version=None):
         return TemplatableContentModelMixin.get_absolute_url(self, version)
 
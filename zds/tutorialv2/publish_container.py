@@ -1,27 +1,168 @@
 import collections
 import contextlib
+import hashlib
+import json
+import logging
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
 from os import path, makedirs
 from pathlib import Path
 import copy
 
 import requests
+from django.conf import settings
 from django.template.loader import render_to_string
 from django.utils.translation import gettext_lazy as _
 
 from zds.tutorialv2.models.database import PublishableContent
 from zds.tutorialv2.models.versioned import Container, VersionedContent
 from zds.tutorialv2.utils import export_content
-from zds.utils.templatetags.emarkdown import emarkdown, render_markdown
+from zds.utils.templatetags.emarkdown import epub_markdown_options, render_markdown, render_markdown_batch
+
+logger = logging.getLogger(__name__)
+
+
+# Written next to ``manifest.json`` in the public directory, see ``compute_publication_hashes``
+PUBLICATION_HASHES_FILENAME = "publication_hashes.json"
 
 
 def publish_use_manifest(db_object, base_dir, versionable_content: VersionedContent):
+    """
+    Render and write the HTML files of a content, and return its number of characters.
+
+    If the content was already published, only the containers which changed since the last publication are
+    rendered, the files of the other ones are copied from the public directory (see ``get_unchanged_units``).
+
+    :param db_object: database representation of the content
+    :type db_object: PublishableContent
+    :param base_dir: the directory into which the files are written
+    :param versionable_content: the version to publish
+    :return: number of characters of the content
+    :rtype: int
+    """
     base_content = export_content(versionable_content, with_text=True)
+    hashes = compute_publication_hashes(db_object, base_content)
+    render_options = {"disable_jsfiddle": not db_object.js_support, "full_json": True, "stats": True}
+
+    previous_dir, unchanged_units = get_unchanged_units(db_object, hashes)
+    if unchanged_units:
+        # the unchanged texts are blanked, so the character count of the new version is computed from
+        # the one of the last publication, and the count of the changed texts in both versions.
+        md, metadata, __ = render_markdown(prune_unchanged_texts(base_content, unchanged_units), **render_options)
+        previous_content = export_content(db_object.load_version(sha=db_object.public_version.sha_public), True)
+        __, previous_metadata, __ = render_markdown(
+            prune_unchanged_texts(previous_content, unchanged_units), **render_options
+        )
+        char_count = (
+            db_object.public_version.char_count
+            + metadata.get("stats", {}).get("signs", 0)
+            - previous_metadata.get("stats", {}).get("signs", 0)
+        )
+        logger.info(
+            "%s containers out of %s reused from the last publication", len(unchanged_units), len(hashes["units"])
+        )
+    else:
+        md, metadata, __ = render_markdown(base_content, **render_options)
+        char_count = metadata.get("stats", {}).get("signs", 0)
 
-    md, metadata, __ = render_markdown(
-        base_content, disable_jsfiddle=not db_object.js_support, full_json=True, stats=True
+    published_units = []
+    publish_container_new(
+        db_object,
+        base_dir,
+        versionable_content,
+        md,
+        unchanged_units=unchanged_units,
+        previous_dir=previous_dir,
+        published_units=published_units,
     )
-    publish_container_new(db_object, base_dir, versionable_content, md)
-    return metadata.get("stats", {}).get("signs", 0)
+
+    hashes["units"] = {key: hashes["units"][key] for key in published_units}
+    with Path(base_dir, PUBLICATION_HASHES_FILENAME).open("w", encoding="utf-8") as hashes_file:
+        json.dump(hashes, hashes_file)
+
+    return char_count
+
+
+def iter_exported_containers(exported, key=""):
+    """
+    Walk through the containers of a content exported with ``export_content``.
+
+    :return: generator of tuples ``(key, exported container)``, where the key is the relative path of the \
+    container (as given by ``Container.get_path(relative=True, os_sensitive=False)``)
+    """
+    yield key, exported
+    for child in exported["children"]:
+        if child["object"] == "container":
+            yield from iter_exported_containers(child, "/".join(filter(None, [key, child["slug"]])))
+
+
+def compute_publication_hashes(db_object, exported):
+    """
+    Compute a hash of everything needed to write the files of each container: its own metadata and texts,
+    and the ones of its extracts. Sub-containers have their own hashes.
+
+    :param db_object: database representation of the content
+    :type db_object: PublishableContent
+    :param exported: content exported with its texts, see ``export_content``
+    :return: a dictionary containing the rendering options and the hash of each container
+    :rtype: dict
+    """
+    units = {}
+    for key, container in iter_exported_containers(exported):
+        unit = {name: value for name, value in container.items() if name != "children"}
+        unit["extracts"] = [child for child in container["children"] if child["object"] == "extract"]
+        units[key] = hashlib.sha256(json.dumps(unit, sort_keys=True).encode("utf-8")).hexdigest()
+
+    return {
+        "options": {"js_support": db_object.js_support, "zmd_version": settings.ZDS_APP["zmd"]["version"]},
+        "units": units,
+    }
+
+
+def get_unchanged_units(db_object, hashes):
+    """
+    Compare hashes with the ones of the last publication.
+
+    :param db_object: database representation of the content
+    :type db_object: PublishableContent
+    :param hashes: hashes of the version to publish, see ``compute_publication_hashes``
+    :return: the public directory of the last publication and the keys of the containers whose files can be \
+    copied from it, or ``(None, set())`` if the content was not published with the same options.
+    :rtype: tuple
+    """
+    public_version = db_object.public_version
+    if public_version is None or public_version.char_count is None or not public_version.sha_public:
+        return None, set()
+
+    previous_dir = public_version.get_prod_path()
+    try:
+        with Path(previous_dir, PUBLICATION_HASHES_FILENAME).open(encoding="utf-8") as hashes_file:
+            previous_hashes = json.load(hashes_file)
+    except (OSError, ValueError):
+        return None, set()
+
+    if previous_hashes.get("options") != hashes["options"]:
+        return None, set()
+
+    previous_units = previous_hashes.get("units", {})
+    return previous_dir, {key for key, unit_hash in hashes["units"].items() if previous_units.get(key) == unit_hash}
+
+
+def prune_unchanged_texts(exported, unchanged_units):
+    """
+    :return: a copy of the exported content, without the texts of the given containers
+    :rtype: dict
+    """
+    pruned = copy.deepcopy(exported)
+    for key, container in iter_exported_containers(pruned):
+        if key in unchanged_units:
+            container["introduction"] = ""
+            container["conclusion"] = ""
+            for child in container["children"]:
+                if child["object"] == "extract":
+                    child["text"] = ""
+    return pruned
 
 
 def publish_container_new(
@@ -31,6 +172,9 @@ def publish_container_new(
     rendered,
     template="tutorialv2/export/chapter.html",
     file_ext="html",
+    unchanged_units=frozenset(),
+    previous_dir=None,
+    published_units=None,
     **ctx
 ):
     """
@@ -44,11 +188,20 @@ def publish_container_new(
     :type rendered: dict
     :param template: template to render a Container with extract
     :param file_ext: html (for zds) for xml, please see ``publish_content``
+    :param unchanged_units: keys of the containers whose files are copied from ``previous_dir`` instead of \
+    being rendered, see ``get_unchanged_units``
+    :param previous_dir: public directory of the last publication
+    :param published_units: if given, the keys of the published containers are appended to this list
     :param ctx: keyword args to pass to template
     """
+    key = container.get_path(relative=True, os_sensitive=False) if container.parent else ""
+    reuse_dir = previous_dir if key in unchanged_units else None
+    if published_units is not None:
+        published_units.append(key)
+
     current_dir = path.dirname(path.join(base_dir, container.get_prod_path(relative=True)))
     if container.has_extracts():  # the container can be rendered in one template
-        render_chapter_or_minituto(base_dir, container, ctx, rendered, template)
+        render_chapter_or_minituto(base_dir, container, ctx, rendered, template, reuse_dir)
     else:  # separate render of introduction and conclusion
         # create subdirectory
         if not path.isdir(current_dir):
@@ -61,7 +214,7 @@ def publish_container_new(
         # +-------------
         # | Conclusion
         if container.introduction and container.get_introduction():
-            render_introduction(base_dir, container, ctx, file_ext, relative_ccl_path, rendered)
+            render_introduction(base_dir, container, ctx, file_ext, relative_ccl_path, rendered, reuse_dir)
         children = copy.copy(container.children)
         container.children = []
         container.children_dict = {}
@@ -74,53 +227,146 @@ def publish_container_new(
             altered_version = copy.copy(child)
             container.children.append(altered_version)
             container.children_dict[altered_version.slug] = altered_version
-            publish_container_new(db_object, base_dir, altered_version, rendered["children"][i], **ctx)
+            publish_container_new(
+                db_object,
+                base_dir,
+                altered_version,
+                rendered["children"][i],
+                unchanged_units=unchanged_units,
+                previous_dir=previous_dir,
+                published_units=published_units,
+                **ctx
+            )
 
         if container.conclusion and container.get_conclusion():
-            render_conclusion(base_dir, container, ctx, file_ext, relative_ccl_path, rendered)
+            render_conclusion(base_dir, container, ctx, file_ext, relative_ccl_path, rendered, reuse_dir)
+
+
+def copy_published_file(previous_dir, base_dir, part_path):
+    """
+    Copy a file written by the last publication instead of rendering it again.
 
+    :param previous_dir: public directory of the last publication
+    :param base_dir: the directory into which the file is copied
+    :param part_path: relative path of the file
+    :type part_path: pathlib.Path
+    """
+    full_path = Path(base_dir, part_path)
+    if not full_path.parent.exists():
+        with contextlib.suppress(OSError):
+            full_path.parent.mkdir(parents=True)
+    shutil.copy2(str(Path(previous_dir, part_path)), str(full_path))
 
-def render_conclusion(base_dir, container, ctx, file_ext, relative_ccl_path, rendered):
+
+def render_conclusion(base_dir, container, ctx, file_ext, relative_ccl_path, rendered, reuse_dir=None):
     part_path = Path(container.get_prod_path(relative=True), "conclusion." + file_ext)
-    args = {"text": container.get_conclusion()}
-    args.update(ctx)
-    args["relative"] = relative_ccl_path
-    parsed = rendered["conclusion"]
     container.conclusion = str(part_path)
+    if reuse_dir:
+        copy_published_file(reuse_dir, base_dir, part_path)
+        return
+    parsed = rendered["conclusion"]
     write_chapter_file(base_dir, container, part_path, parsed, {})
 
 
-def render_introduction(base_dir, container, ctx, file_ext, relative_ccl_path, rendered):
+def render_introduction(base_dir, container, ctx, file_ext, relative_ccl_path, rendered, reuse_dir=None):
     part_path = Path(container.get_prod_path(relative=True), "introduction." + file_ext)
     args = {"text": container.get_introduction()}
     args.update(ctx)
     args["relative"] = relative_ccl_path
+    container.introduction = str(part_path)
+    if reuse_dir:
+        copy_published_file(reuse_dir, base_dir, part_path)
+        return
     if ctx.get("intro_ccl_template", None):
         parsed = render_to_string(ctx.get("intro_ccl_template"), args)
     else:
         parsed = rendered["introduction"]
-    container.introduction = str(part_path)
     write_chapter_file(base_dir, container, part_path, parsed, {})
 
 
-def render_chapter_or_minituto(base_dir, container, ctx, rendered, template):
-    rendered["children"] = zip(rendered["children"], container.children)
-    args = {"container": rendered, "versioned_object": container}
-    args.update(ctx)
-    parsed = render_to_string(template, args)
-    write_chapter_file(
-        base_dir,
-        container,
-        Path(container.get_prod_path(True)),
-        parsed,
-        {},
-    )
+def render_chapter_or_minituto(base_dir, container, ctx, rendered, template, reuse_dir=None):
+    if reuse_dir:
+        copy_published_file(reuse_dir, base_dir, Path(container.get_prod_path(True)))
+    else:
+        rendered["children"] = zip(rendered["children"], container.children)
+        args = {"container": rendered, "versioned_object": container}
+        args.update(ctx)
+        parsed = render_to_string(template, args)
+        write_chapter_file(
+            base_dir,
+            container,
+            Path(container.get_prod_path(True)),
+            parsed,
+            {},
+        )
     for extract in container.children:
         extract.text = None
     container.introduction = None
     container.conclusion = None
 
 
+def render_container_texts(db_object, container, image_directory=None):
+    """
+    Render all the texts (introductions, conclusions and extracts) of the publishable part of a container
+    tree at once, so that they are sent to the markdown server in a few batches rather than one by one.
+
+    Each chapter is rendered in its own batch; as the rendering is network-bound, up to
+    ``ZDS_APP["content"]["publication_render_workers"]`` chapters are rendered concurrently.
+    The texts are read from the repository beforehand, once each, in the calling thread.
+
+    :param db_object: database representation of the content
+    :type db_object: PublishableContent
+    :param container: the top container
+    :type container: Container
+    :param image_directory: if given, the texts are rendered for the ebook export (see ``epub_markdown``)
+    :return: a dictionary associating the path of each non-empty text in the repository (the ``introduction``,
+        ``conclusion`` or ``text`` attribute of its container or extract) to its rendered version
+    :rtype: dict
+    """
+    chapters = []
+
+    def collect_texts(current):
+        texts = []
+        if current.introduction:
+            texts.append((current.introduction, current.get_introduction()))
+        if current.has_extracts():
+            texts.extend((extract.text, extract.get_text()) for extract in current.children if extract.text)
+        else:
+            for child in current.children:
+                if child.ready_to_publish:
+                    collect_texts(child)
+        if current.conclusion:
+            texts.append((current.conclusion, current.get_conclusion()))
+        texts = [(text_path, text) for text_path, text in texts if text]
+        if texts:
+            chapters.append((current.title, texts))
+
+    collect_texts(container)
+
+    if image_directory is not None:
+        options = epub_markdown_options(image_directory)
+    else:
+        # as with the `emarkdown` filter formerly used here, which was never given "js"
+        options = {"disable_jsfiddle": True}
+
+    def render_chapter(chapter):
+        title, texts = chapter
+        start = time.time()
+        rendered = render_markdown_batch([text for _, text in texts], **options)
+        logger.info("Rendered « %s » (%s texts) in %.2f s", title, len(texts), time.time() - start)
+        return [(text_path, content) for (text_path, _), (content, *_) in zip(texts, rendered)]
+
+    workers = settings.ZDS_APP["content"]["publication_render_workers"]
+    if workers > 1 and len(chapters) > 1:
+        # the first exception raised by a worker, if any, is raised again here
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(render_chapter, chapters))
+    else:
+        results = [render_chapter(chapter) for chapter in chapters]
+
+    return {text_path: content for rendered in results for text_path, content in rendered}
+
+
 def publish_container(
     db_object,
     base_dir,
@@ -164,10 +410,21 @@ def publish_container(
     if not path.isdir(current_dir):
         makedirs(current_dir)
 
+    if "rendered_texts" not in ctx:
+        # first call of the recursion: render all the texts of the tree at once
+        ctx["rendered_texts"] = render_container_texts(db_object, container, ctx.get("image_directory"))
+    rendered_texts = ctx["rendered_texts"]
+
     img_relative_path = ".." if ctx["relative"] == "." else "../" + ctx["relative"]
     if container.has_extracts():  # the container can be rendered in one template
         wrapped_image_callback = image_callback(img_relative_path) if image_callback else image_callback
-        args = {"container": container, "is_js": is_js}
+        args = {
+            "container": container,
+            "is_js": is_js,
+            "introduction": rendered_texts.get(container.introduction, ""),
+            "extracts": [(extract, rendered_texts.get(extract.text, "")) for extract in container.children],
+            "conclusion": rendered_texts.get(container.conclusion, ""),
+        }
         args.update(ctx)
         args["relative"] = img_relative_path
         parsed = render_to_string(template, args)
@@ -191,15 +448,15 @@ def publish_container(
         if not path.isdir(current_dir):
             makedirs(current_dir)
         relative_ccl_path = "../" + ctx.get("relative", ".")
-        if container.introduction and container.get_introduction():
+        if container.introduction in rendered_texts:
             part_path = Path(container.get_prod_path(relative=True), "introduction." + file_ext)
-            args = {"text": container.get_introduction()}
+            args = {"text": rendered_texts[container.introduction]}
             args.update(ctx)
             args["relative"] = relative_ccl_path
             if ctx.get("intro_ccl_template", None):
                 parsed = render_to_string(ctx.get("intro_ccl_template"), args)
             else:
-                parsed = emarkdown(container.get_introduction(), db_object.js_support)
+                parsed = args["text"]
             container.introduction = str(part_path)
             write_chapter_file(
                 base_dir, container, part_path, parsed, path_to_title_dict, wrapped_image_callback_intro_ccl
@@ -224,15 +481,15 @@ def publish_container(
                 **ctx
             )
             path_to_title_dict.update(result)
-        if container.conclusion and container.get_conclusion():
+        if container.conclusion in rendered_texts:
             part_path = Path(container.get_prod_path(relative=True), "conclusion." + file_ext)
-            args = {"text": container.get_conclusion()}
+            args = {"text": rendered_texts[container.conclusion]}
             args.update(ctx)
             args["relative"] = relative_ccl_path
             if ctx.get("intro_ccl_template", None):
                 parsed = render_to_string(ctx.get("intro_ccl_template"), args)
             else:
-                parsed = emarkdown(container.get_conclusion(), db_object.js_support)
+                parsed = args["text"]
             container.conclusion = str(part_path)
             write_chapter_file(
                 base_dir, container, part_path, parsed, path_to_title_dict, wrapped_image_callback_intro_ccl
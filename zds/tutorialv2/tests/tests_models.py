@@ -3,6 +3,7 @@ import unittest
 from django.urls import reverse
 from datetime import datetime, timedelta
 import os
+from unittest.mock import patch
 
 from django.conf import settings
 from django.test import TestCase
@@ -17,9 +18,11 @@ from zds.tutorialv2.factories import (
     PublishedContentFactory,
 )
 from zds.gallery.factories import UserGalleryFactory
+from zds.tutorialv2.manifest_cache import get_manifest_cache
 from zds.tutorialv2.models.database import PublishableContent, PublishedContent
 from zds.tutorialv2.publication_utils import publish_content
 from zds.tutorialv2.tests import TutorialTestMixin, override_for_contents
+from zds.tutorialv2.utils import get_blob
 from zds.utils.factories import SubCategoryFactory, LicenceFactory
 from zds.utils.models import Tag
 from django.template.defaultfilters import date
@@ -63,6 +66,23 @@ class ContentTests(TutorialTestMixin, TestCase):
         self.assertTrue(self.part1.slug in list(versioned.children_dict.keys()))
         self.assertTrue(self.chapter1.slug in versioned.children_dict[self.part1.slug].children_dict)
 
+    def test_manifest_cache(self):
+        manifest_cache = get_manifest_cache()
+        manifest_cache.clear()
+        manifest = self.tuto.load_manifest()
+        manifest["title"] = "modified by the caller"
+
+        with patch("zds.tutorialv2.models.database.get_blob", wraps=get_blob) as git_read:
+            cached_manifest = self.tuto.load_manifest()
+            self.tuto.load_manifest(sha="HEAD")  # a reference may move, it cannot be cached
+        self.assertEqual(git_read.call_count, 1)
+        self.assertEqual(cached_manifest["title"], self.tuto_draft.title)
+        self.assertEqual(manifest_cache.stats()["hits"], 1)
+
+        # a new commit is a new entry
+        self.tuto_draft.repo_update(title="Nouveau titre", introduction="", conclusion="")
+        self.assertEqual(self.tuto.load_manifest(sha=self.tuto_draft.current_version)["title"], "Nouveau titre")
+
     def test_slug_pool(self):
         versioned = self.tuto.load_version()
 
@@ -1,9 +1,12 @@
+import copy
 import os
 import shutil
 from pathlib import Path
 import datetime
+from unittest.mock import patch
 
 from django.conf import settings
+from django.db.models import Q
 from django.test import TestCase
 from django.urls import reverse
 
@@ -27,11 +30,21 @@ from zds.tutorialv2.utils import (
     get_commit_author,
     slugify_raise_on_invalid,
     check_slug,
+    export_content,
+    get_blob,
 )
 from zds.tutorialv2.publication_utils import publish_content, unpublish_content
-from zds.tutorialv2.models.database import PublishableContent, PublishedContent, ContentReaction, ContentRead
+from zds.tutorialv2.publish_container import iter_exported_containers, publish_use_manifest, render_container_texts
+from zds.tutorialv2.models.database import (
+    PublishableContent,
+    PublishedContent,
+    ContentReaction,
+    ContentRead,
+    PublicationEvent,
+)
+from zds.tutorialv2.management.commands.publication_watchdog import claim_event
 from django.core.management import call_command
-from zds.tutorialv2.publication_utils import Publicator, PublicatorRegistry
+from zds.tutorialv2.publication_utils import Publicator, PublicatorRegistry, FailureDuringPublication
 from zds.tutorialv2.tests import TutorialTestMixin, override_for_contents
 from zds import json_handler
 from zds.utils.factories import LicenceFactory
@@ -259,6 +272,96 @@ class UtilsTests(TutorialTestMixin, TestCase):
                 self.assertIsNone(chapter.introduction)
                 self.assertIsNone(chapter.conclusion)
 
+    def test_render_container_texts(self):
+        chapter2 = ContainerFactory(parent=self.part1, db_object=self.tuto)
+        ExtractFactory(container=self.chapter1, db_object=self.tuto)
+        ExtractFactory(container=chapter2, db_object=self.tuto, light=False)
+        versioned = self.tuto.load_version()
+
+        with patch(
+            "zds.tutorialv2.publish_container.render_markdown_batch",
+            side_effect=lambda texts, **kwargs: [("<p>{}</p>".format(text), {}, []) for text in texts],
+        ) as render:
+            rendered_texts = render_container_texts(self.tuto, versioned)
+
+        # one batch per container: the content, the part and the two chapters
+        self.assertEqual(render.call_count, 4)
+        extract = versioned.children[0].children[1].children[0]
+        self.assertEqual(rendered_texts[extract.text], "<p>{}</p>".format(extract.get_text()))
+        self.assertEqual(rendered_texts[versioned.introduction], "<p>{}</p>".format(versioned.get_introduction()))
+        # the jsFiddle embeds are never enabled outside of the ebook export
+        self.assertEqual(render.call_args[1], {"disable_jsfiddle": True})
+
+    def test_incremental_publication(self):
+        def fake_render(exported, **kwargs):
+            rendered = copy.deepcopy(exported)
+            signs = 0
+            for _, container in iter_exported_containers(rendered):
+                for item in [container] + container["children"]:
+                    for name in ("introduction", "conclusion", "text"):
+                        if item.get(name) is not None:
+                            signs += len(item[name])
+                            item[name] = "<p>{}</p>".format(item[name])
+            return rendered, {"stats": {"signs": signs}}, []
+
+        chapter2 = ContainerFactory(parent=self.part1, db_object=self.tuto)
+        ExtractFactory(container=self.chapter1, db_object=self.tuto)
+        extract = ExtractFactory(container=chapter2, db_object=self.tuto)
+        versioned = self.tuto.load_version()
+
+        public_version = PublishedContent.objects.create(
+            content=self.tuto, content_pk=self.tuto.pk, content_public_slug=versioned.slug, content_type="TUTORIAL"
+        )
+        with patch("zds.tutorialv2.publish_container.render_markdown", side_effect=fake_render) as render:
+            public_version.char_count = publish_use_manifest(self.tuto, public_version.get_prod_path(), versioned)
+        self.assertEqual(render.call_count, 1)
+        public_version.sha_public = versioned.current_version
+        public_version.save()
+        self.tuto.public_version = public_version
+        self.tuto.sha_public = versioned.current_version
+        self.tuto.save()
+
+        # only the second chapter changes
+        versioned = self.tuto.load_version()
+        versioned.children[0].children[1].children[0].repo_update(extract.title, "Un nouveau texte")
+        self.tuto.sha_draft = versioned.current_version
+        self.tuto.save()
+        versioned = self.tuto.load_version()
+
+        building_dir = public_version.get_prod_path() + "__building"
+        with patch("zds.tutorialv2.publish_container.render_markdown", side_effect=fake_render) as render:
+            char_count = publish_use_manifest(self.tuto, building_dir, copy.deepcopy(versioned))
+        full_char_count = fake_render(export_content(versioned, with_text=True))[1]["stats"]["signs"]
+
+        self.assertEqual(render.call_count, 2)
+        self.assertEqual(char_count, full_char_count)
+        # the new and the previous version are rendered without the unchanged texts
+        rendered_chapter1 = render.call_args_list[0][0][0]["children"][0]["children"][0]
+        rendered_chapter2 = render.call_args_list[0][0][0]["children"][0]["children"][1]
+        self.assertEqual(rendered_chapter1["children"][0]["text"], "")
+        self.assertEqual(rendered_chapter2["children"][0]["text"], "Un nouveau texte")
+
+        chapter1_path = Path(versioned.children[0].children[0].get_prod_path(relative=True))
+        chapter2_path = Path(versioned.children[0].children[1].get_prod_path(relative=True))
+        previous_dir = Path(public_version.get_prod_path())
+        self.assertEqual(
+            Path(building_dir, chapter1_path).read_text(encoding="utf-8"),
+            Path(previous_dir, chapter1_path).read_text(encoding="utf-8"),
+        )
+        self.assertIn("Un nouveau texte", Path(building_dir, chapter2_path).read_text(encoding="utf-8"))
+
+    def test_get_blob(self):
+        extract = ExtractFactory(container=self.chapter1, db_object=self.tuto)
+        versioned = self.tuto.load_version()
+        tree = versioned.get_tree()
+        text = versioned.children[0].children[0].children[0].get_text()
+
+        self.assertEqual(get_blob(tree, extract.text), text)
+        self.assertEqual(get_blob(tree, "./" + extract.text.replace("/", "\\")), text)
+        self.assertIsNone(get_blob(tree, extract.text + ".old"))
+        self.assertIsNone(get_blob(tree, self.part1.get_path(relative=True)))  # a directory is not a file
+        self.assertIs(versioned.get_tree(), tree)
+
     def test_tagged_tree_extract(self):
         midsize = PublishableContentFactory(author_list=[self.user_author])
         midsize_draft = midsize.load_version()
@@ -341,6 +444,71 @@ class UtilsTests(TutorialTestMixin, TestCase):
         self.assertTrue(published.has_md())
         self.assertTrue(published2.has_md())
 
+    def test_publication_watchdog(self):
+        published, other_published = (
+            PublishedContent.objects.create(
+                content=tuto,
+                content_type=tuto.type,
+                content_public_slug=tuto.slug,
+                content_pk=tuto.pk,
+                sha_public=tuto.sha_draft,
+            )
+            for tuto in (self.tuto, PublishableContentFactory(type="TUTORIAL"))
+        )
+        exported = []
+
+        class RecordingPublicator(Publicator):
+            def __init__(self, format_name):
+                self.format_name = format_name
+
+            def publish(self, md_file_path, base_name, **kwargs):
+                exported.append(self.format_name)
+                if self.format_name == "epub":
+                    raise FailureDuringPublication("epub failure")
+
+        publicators = {format_name: RecordingPublicator(format_name) for format_name in ("md", "epub", "pdf")}
+        registry_patcher = patch.dict(PublicatorRegistry.registry, publicators)
+        registry_patcher.start()
+        self.addCleanup(registry_patcher.stop)
+
+        running_elsewhere = PublicationEvent.objects.create(
+            published_object=other_published, format_requested="md", state_of_processing="RUNNING", claimed_by="b"
+        )
+        blocked = PublicationEvent.objects.create(
+            published_object=other_published, format_requested="pdf", state_of_processing="REQUESTED"
+        )
+        md_event = PublicationEvent.objects.create(
+            published_object=published, format_requested="md", state_of_processing="REQUESTED"
+        )
+        epub_event = PublicationEvent.objects.create(
+            published_object=published, format_requested="epub", state_of_processing="REQUESTED"
+        )
+
+        self.assertEqual(claim_event("a", Q(format_requested="epub")), None)  # the markdown is not exported yet
+        with patch.object(PublishedContent, "title", return_value="title"):  # the contents are not really published
+            call_command("publication_watchdog", "--once", "--name", "a")
+
+        self.assertEqual(exported, ["md", "epub"])
+        md_event.refresh_from_db()
+        self.assertEqual(md_event.state_of_processing, "SUCCESS")
+        self.assertEqual(md_event.claimed_by, "a")
+        self.assertIsNotNone(md_event.duration)
+        epub_event.refresh_from_db()
+        self.assertEqual(epub_event.state_of_processing, "FAILURE")
+        # events of the other node are left untouched
+        running_elsewhere.refresh_from_db()
+        self.assertEqual(running_elsewhere.state_of_processing, "RUNNING")
+        blocked.refresh_from_db()
+        self.assertEqual(blocked.state_of_processing, "REQUESTED")
+
+        # once the other node is done, the PDF can be built
+        PublicationEvent.objects.filter(pk=running_elsewhere.pk).update(state_of_processing="SUCCESS")
+        with patch.object(PublishedContent, "title", return_value="title"):
+            call_command("publication_watchdog", "--once", "--name", "a")
+        blocked.refresh_from_db()
+        self.assertEqual(blocked.state_of_processing, "SUCCESS")
+        self.assertEqual(exported, ["md", "epub", "pdf"])
+
     def test_generate_pdf(self):
         """ensure the behavior of the `python manage.py generate_pdf` commmand"""
 
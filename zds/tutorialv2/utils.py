@@ -1,6 +1,7 @@
 from collections import OrderedDict, namedtuple
 import os
 import logging
+import posixpath
 from urllib.parse import urlsplit, urlunsplit, quote
 from django.contrib.auth.models import User
 from django.http import Http404
@@ -770,30 +771,26 @@ class InvalidOperationError(RuntimeError):
 def get_blob(tree, path):
     """Return the data contained into a given file
 
-    :param tree: Git Tree object
+    The file is looked up directly from its path, so only the trees along this path are read.
+
+    :param tree: Git Tree object, the root tree of a commit
     :type tree: git.objects.tree.Tree
-    :param path: Path to file
+    :param path: Path to file, relative to the root of the repository
     :type path: str
-    :return: contains
-    :rtype: bytearray
+    :return: contains, or ``None`` if there is no such file
+    :rtype: str
     """
-    # get all extracts
-    for blob in tree.blobs:
-        try:
-            if os.path.abspath(blob.path) == os.path.abspath(path):
-                data = blob.data_stream.read().decode()
-                return data
-        except OSError:  # in case of deleted files, or the system cannot get the lock, juste return ""
-            return ""
-    # traverse directories when we are at root or in a part or chapter
-    if len(tree.trees) > 0:
-        for subtree in tree.trees:
-            result = get_blob(subtree, path)
-            if result is not None:
-                return result
+    path = posixpath.normpath(path.replace("\\", "/")).lstrip("/")
+    try:
+        blob = tree / path
+    except KeyError:
         return None
-    else:
+    if blob.type != "blob":
         return None
+    try:
+        return blob.data_stream.read().decode()
+    except OSError:  # in case of deleted files, or the system cannot get the lock, juste return ""
+        return ""
 
 
 class BadArchiveError(Exception):
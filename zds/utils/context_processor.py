@@ -1,6 +1,9 @@
-from copy import deepcopy
+import threading
+from types import MappingProxyType
 
 from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
 
 from zds import __version__, git_version
 
@@ -43,12 +46,54 @@ def header_notifications(request):
     return {"header_" + k: v for k, v in results.items()}
 
 
-def app_settings(request):
+# sections of ZDS_APP used by the templates, through the `app` variable
+TEMPLATE_SETTINGS = ("site", "content", "member", "forum", "visual_changes", "display_search_bar", "very_top_banner")
+
+_template_settings = None
+_template_settings_lock = threading.Lock()
+
+
+def freeze(value):
     """
-    A context processor with all APP settings.
+    :return: a read-only copy of ``value``, where the dictionaries are replaced by mapping proxies and the lists by tuples
     """
-    app = deepcopy(settings.ZDS_APP)
+    if isinstance(value, dict):
+        return MappingProxyType({key: freeze(item) for key, item in value.items()})
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(item) for item in value)
+    if isinstance(value, set):
+        return frozenset(value)
+    return value
 
+
+def get_template_settings():
+    """
+    Returns the sections of ZDS_APP listed in ``TEMPLATE_SETTINGS``, frozen once for the whole process so that the
+    templates cannot modify the settings.
+
+    :rtype: MappingProxyType
+    """
+    global _template_settings
+    if _template_settings is None:
+        with _template_settings_lock:
+            if _template_settings is None:
+                _template_settings = freeze(
+                    {key: settings.ZDS_APP[key] for key in TEMPLATE_SETTINGS if key in settings.ZDS_APP}
+                )
+    return _template_settings
+
+
+@receiver(setting_changed)
+def reset_template_settings(sender, setting, **kwargs):
+    global _template_settings
+    if setting == "ZDS_APP":
+        _template_settings = None
+
+
+def app_settings(request):
+    """
+    A context processor with the APP settings used by the templates.
+    """
     return {
-        "app": app,
+        "app": get_template_settings(),
     }
@@ -1,4 +1,13 @@
+"""
+Summary of the unread notifications and of the moderation alerts displayed in the header of every page.
+
+The summary of a user is cached until one of its notifications changes, and the summary of the alerts (the same for the
+whole staff) until an alert changes, see the receivers in ``zds.notification.receivers``.
+"""
+
+from django.conf import settings
 from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
 from django.utils.translation import gettext_lazy as _
 
 from zds.forum.models import Post
@@ -44,10 +53,14 @@ def _alerts_to_list(alerts_query):
     return [_alert_to_dict(a) for a in query]
 
 
-def get_header_notifications(user):
-    if not user.is_authenticated:
-        return None
+ALERTS_KEY = "header_notifications:alerts"
+
+
+def get_user_key(user_pk):
+    return f"header_notifications:user:{user_pk}"
+
 
+def _get_notifications_summary(user):
     private_topic = ContentType.objects.get_for_model(PrivateTopic)
 
     notifications = Notification.objects.filter(subscription__user=user, is_read=False)
@@ -56,8 +69,6 @@ def get_header_notifications(user):
 
     private_notifications = notifications.filter(subscription__content_type=private_topic)
 
-    alerts = Alert.objects.filter(solved=False)
-
     return {
         "general_notifications": {
             "total": general_notifications.count(),
@@ -67,9 +78,43 @@ def get_header_notifications(user):
             "total": private_notifications.count(),
             "list": _notifications_to_list(private_notifications),
         },
-        "alerts": user.has_perm("forum.change_post")
-        and {
-            "total": alerts.count(),
-            "list": _alerts_to_list(alerts),
-        },
     }
+
+
+def _get_alerts_summary():
+    alerts = Alert.objects.filter(solved=False)
+
+    return {
+        "total": alerts.count(),
+        "list": _alerts_to_list(alerts),
+    }
+
+
+def get_header_notifications(user):
+    if not user.is_authenticated:
+        return None
+
+    timeout = settings.ZDS_APP["notification"]["header_cache_timeout"]
+    summary = cache.get(get_user_key(user.pk))
+    if summary is None:
+        summary = _get_notifications_summary(user)
+        cache.set(get_user_key(user.pk), summary, timeout)
+
+    alerts = False
+    if user.has_perm("forum.change_post"):
+        alerts = cache.get(ALERTS_KEY)
+        if alerts is None:
+            alerts = _get_alerts_summary()
+            cache.set(ALERTS_KEY, alerts, timeout)
+
+    return {**summary, "alerts": alerts}
+
+
+def invalidate_header_notifications(user_pks):
+    """Drops the cached summaries of these users, whose notifications changed."""
+    cache.delete_many([get_user_key(pk) for pk in set(user_pks)])
+
+
+def invalidate_header_alerts():
+    """Drops the cached summary of the alerts, after an alert was created, solved or deleted."""
+    cache.delete(ALERTS_KEY)
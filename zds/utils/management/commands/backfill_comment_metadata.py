@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+
+from zds.utils.models import Comment
+from zds.utils.templatetags.emarkdown import render_markdown_batch
+
+
+class Command(BaseCommand):
+    help = "Render the comments saved without their text metadata to store it"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=200, help="Number of comments rendered at once")
+
+    def handle(self, *args, **options):
+        chunk_size = options["chunk_size"]
+        count = 0
+        failures = 0
+        last_pk = 0
+        while True:
+            comments = list(
+                Comment.objects.filter(text_metadata__isnull=True, pk__gt=last_pk)
+                .order_by("pk")
+                .values_list("pk", "text")[:chunk_size]
+            )
+            if not comments:
+                break
+            rendered = render_markdown_batch([text for _, text in comments])
+            for (pk, _), (content, metadata, messages) in zip(comments, rendered):
+                if messages or (not content and not metadata):
+                    # left without metadata, so that it is rendered again by the next run
+                    failures += 1
+                    continue
+                # `update()` rather than `save()`: nothing changed but the stored metadata, no ping must be sent
+                Comment.objects.filter(pk=pk).update(text_metadata=Comment.compact_metadata(metadata))
+                count += 1
+            last_pk = comments[-1][0]
+            self.stdout.write(f"{count} comments updated, {failures} failures")
+        self.stdout.write(f"Done, {count} comments updated, {failures} failures.")
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from zds.utils.models import Comment
+from zds.utils.render_cache import get_render_cache
+from zds.utils.templatetags.emarkdown import render_markdown
+
+
+class Command(BaseCommand):
+    help = (
+        "Manage the zmarkdown render cache. "
+        "Warming is only useful when a shared Django cache is configured (`cache_alias`)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("action", choices=["stats", "warm", "purge"])
+        parser.add_argument(
+            "--limit", type=int, default=1000, help="Number of the most recent comments rendered by `warm`"
+        )
+
+    def handle(self, *args, **options):
+        render_cache = get_render_cache()
+
+        if options["action"] == "warm":
+            comments = Comment.objects.order_by("-pk").values_list("text", flat=True)[: options["limit"]]
+            for count, text in enumerate(comments.iterator(), start=1):
+                render_markdown(text)
+                if count % 100 == 0:
+                    self.stdout.write(f"{count} comments rendered")
+        elif options["action"] == "purge":
+            render_cache.clear(shared=True)
+            self.stdout.write("Cleared render cache.")
+
+        stats = render_cache.stats()
+        self.stdout.write("{entries}/{max_entries} entries in memory, {hits} hits, {misses} misses".format(**stats))
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.24 on 2026-10-18 06:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("utils", "0023_move_potential_spam_to_comment_model"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="comment",
+            name="text_metadata",
+            field=models.TextField(blank=True, null=True, verbose_name="Métadonnées du texte"),
+        ),
+    ]
@@ -1,4 +1,5 @@
 from datetime import datetime
+import json
 import os
 import string
 import uuid
@@ -24,6 +25,7 @@ from zds.tutorialv2.models import TYPE_CHOICES, TYPE_CHOICES_DICT
 from zds.utils.mps import send_mp
 from zds.utils import old_slugify
 from zds.utils.misc import contains_utf8mb4
+from zds.utils.topbar_menus import invalidate_topbar_menus
 from zds.utils.templatetags.emarkdown import render_markdown
 from zds.utils.uuslug_wrapper import uuslug
 
@@ -417,6 +419,30 @@ class Comment(models.Model):
 
     is_potential_spam = models.BooleanField("Est potentiellement du spam", default=False)
 
+    # Metadata of the rendering of `text` still needed after the rendering (the pings), as JSON. Kept to avoid
+    # rendering the text again when it is edited. `None` for comments saved before this field was added, see the
+    # `backfill_comment_metadata` command.
+    text_metadata = models.TextField("Métadonnées du texte", blank=True, null=True)
+
+    @staticmethod
+    def compact_metadata(metadata):
+        """
+        :param dict metadata: metadata returned by ``render_markdown``
+        :return: the part of the metadata stored in ``text_metadata``, as JSON
+        :rtype: str
+        """
+        return json.dumps({"ping": metadata.get("ping", [])})
+
+    def get_text_metadata(self):
+        """
+        :return: the metadata of the rendering of the current text, rendering it only if it is not stored.
+        :rtype: dict
+        """
+        if self.text_metadata is not None:
+            return json.loads(self.text_metadata)
+        _, metadata, _ = render_markdown(self.text)
+        return metadata
+
     def update_content(self, text, on_error=None):
         """
         Updates the content of this comment.
@@ -438,7 +464,7 @@ class Comment(models.Model):
         if not hasattr(self, "old_text"):
             self.old_text = self.text
 
-        _, old_metadata, _ = render_markdown(self.text)
+        old_metadata = self.get_text_metadata()
         html, new_metadata, _ = render_markdown(text, on_error=on_error)
 
         # These attributes will be used by `_save_compute_pings` to create notifications if needed.
@@ -449,6 +475,7 @@ class Comment(models.Model):
 
         self.text = text
         self.text_html = html
+        self.text_metadata = self.compact_metadata(new_metadata)
 
     def save(self, *args, **kwargs):
         """
@@ -793,6 +820,19 @@ class Tag(models.Model):
         return True
 
 
+@receiver(models.signals.post_save, sender=Category)
+@receiver(models.signals.post_delete, sender=Category)
+@receiver(models.signals.post_save, sender=SubCategory)
+@receiver(models.signals.post_delete, sender=SubCategory)
+@receiver(models.signals.post_save, sender=CategorySubCategory)
+@receiver(models.signals.post_delete, sender=CategorySubCategory)
+@receiver(models.signals.post_save, sender=Tag)
+@receiver(models.signals.post_delete, sender=Tag)
+def categories_or_tags_changed(sender, **kwargs):
+    """The categories or the tags listed in the topbar changed."""
+    invalidate_topbar_menus()
+
+
 class HelpWriting(models.Model):
 
     """Tutorial Help"""
@@ -0,0 +1,186 @@
+"""
+Content-addressed cache for the zmarkdown rendering.
+
+Rendering a given markdown text with given options always gives the same
+result for a given version of zmarkdown, so the raw answers of the server
+are stored under a hash of ``(markdown, output format, options, zmd version)``.
+
+Two tiers are used: a size-bounded in-process LRU and, if configured, a
+Django cache backend shared between the processes. The entries of the shared
+tier are stored under a generation number, incremented to purge them without
+clearing the rest of the backend.
+"""
+
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+KEY_PREFIX = "zmd-render"
+GENERATION_KEY = f"{KEY_PREFIX}:generation"
+
+# Retries do not change the result, so the attempt counter must not be part of the key
+IGNORED_OPTIONS = ("attempts",)
+# Renderings with side effects (images download) or used for statistics are never cached
+UNCACHEABLE_OPTIONS = ("images_download_dir", "stats")
+
+
+class RenderCache:
+    """
+    Stores the raw (JSON) answers of the zmarkdown server.
+
+    Raw strings are stored rather than the decoded values so that each hit
+    gets its own copy of the metadata and messages, which callers are free
+    to modify.
+    """
+
+    def __init__(self, max_entries=1024, cache_alias=None, timeout=None, version="", formats=("html",)):
+        self.max_entries = max_entries
+        self.cache_alias = cache_alias
+        self.timeout = timeout
+        self.version = version
+        self.formats = tuple(formats)
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def shared_cache(self):
+        if not self.cache_alias:
+            return None
+        return caches[self.cache_alias]
+
+    def get_generation(self):
+        return self.shared_cache.get_or_set(GENERATION_KEY, 0, None)
+
+    def bump_generation(self):
+        try:
+            self.shared_cache.incr(GENERATION_KEY)
+        except ValueError:  # not set yet (or evicted)
+            self.shared_cache.set(GENERATION_KEY, 1, None)
+
+    def is_cacheable(self, output_format, opts):
+        return output_format in self.formats and not any(opts.get(option) for option in UNCACHEABLE_OPTIONS)
+
+    def make_key(self, md_input, output_format, opts):
+        """
+        Computes the key associated to a rendering request.
+
+        :param md_input: markdown text (or manifest, for the full JSON rendering)
+        :param str output_format: one of the ``FORMAT_ENDPOINTS`` keys
+        :param dict opts: options sent to zmarkdown
+        :rtype: str
+        """
+        opts = {key: value for key, value in opts.items() if key not in IGNORED_OPTIONS}
+        payload = json.dumps(
+            [self.version, output_format, opts, md_input], sort_keys=True, default=str, ensure_ascii=False
+        )
+        return "{}:{}".format(KEY_PREFIX, hashlib.sha256(payload.encode("utf-8")).hexdigest())
+
+    def get(self, key):
+        """
+        :return: the raw answer stored for this key, or ``None``
+        """
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+
+        shared_cache = self.shared_cache
+        if shared_cache is not None:
+            value = shared_cache.get(key, version=self.get_generation())
+            if value is not None:
+                self._store_locally(key, value)
+                with self._lock:
+                    self.hits += 1
+                return value
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, key, value):
+        self._store_locally(key, value)
+        shared_cache = self.shared_cache
+        if shared_cache is not None:
+            shared_cache.set(key, value, self.timeout, version=self.get_generation())
+
+    def _store_locally(self, key, value):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self, shared=False):
+        """
+        Empties the in-process tier and resets the counters.
+
+        :param bool shared: also invalidate the entries of the Django cache backend, for all the processes
+        """
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+        if shared and self.shared_cache is not None:
+            self.bump_generation()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+class DummyRenderCache(RenderCache):
+    """Used when the cache is disabled, never stores anything."""
+
+    def is_cacheable(self, output_format, opts):
+        return False
+
+
+_render_cache = None
+_render_cache_lock = threading.Lock()
+
+
+def get_render_cache():
+    """
+    Returns the process-wide render cache, built from ``ZDS_APP["zmd"]["render_cache"]``.
+
+    :rtype: RenderCache
+    """
+    global _render_cache
+    if _render_cache is None:
+        with _render_cache_lock:
+            if _render_cache is None:
+                zmd_settings = settings.ZDS_APP["zmd"]
+                cache_settings = zmd_settings.get("render_cache", {})
+                cache_class = RenderCache if cache_settings.get("enabled", False) else DummyRenderCache
+                _render_cache = cache_class(
+                    max_entries=cache_settings.get("max_entries", 1024),
+                    cache_alias=cache_settings.get("cache_alias"),
+                    timeout=cache_settings.get("timeout"),
+                    version=zmd_settings.get("version", ""),
+                    formats=cache_settings.get("formats", ("html",)),
+                )
+    return _render_cache
+
+
+@receiver(setting_changed)
+def reset_render_cache(sender, setting, **kwargs):
+    global _render_cache
+    if setting == "ZDS_APP":
+        _render_cache = None
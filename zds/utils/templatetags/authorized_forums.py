@@ -6,7 +6,7 @@ def get_authorized_forums(user):
     Find forums the user is allowed to visit.
 
     :param user: concerned user.
-    :return: authorized_forums
+    :return: authorized_forums, sorted (so that the searches restricted to them can be cached)
     """
     forums_pub = Forum.objects.filter(groups__isnull=True).all()
     if user and user.is_authenticated:
@@ -15,4 +15,4 @@ def get_authorized_forums(user):
     else:
         list_forums = list(forums_pub)
 
-    return [f.pk for f in list_forums]
+    return sorted(f.pk for f in list_forums)
@@ -9,6 +9,8 @@ from django.template.defaultfilters import stringfilter
 from django.utils.safestring import mark_safe
 from django.utils.translation import gettext_lazy as _
 
+from zds.utils.render_cache import get_render_cache
+
 logger = logging.getLogger(__name__)
 register = template.Library()
 """
@@ -26,6 +28,15 @@ FORMAT_ENDPOINTS = {
     "tex": "/latex",
 }
 
+# The strings of a batch are rendered as a single document, where they are separated by this paragraph
+BATCH_SEPARATOR = "zdsbatchseparator4f1c9b"
+BATCH_FORMATS = ("html", "epub")
+BATCH_TIMEOUT = 120
+_batch_separator_html = re.compile(r"\s*<p>{}</p>\s*".format(BATCH_SEPARATOR))
+# Strings whose rendering depends on the rest of the document are rendered alone: the footnotes and the definitions
+# (of references and abbreviations) apply to the whole document, and its pings are only reported in its metadata
+_unbatchable = re.compile(r"\[\^|\]:|@|{}".format(BATCH_SEPARATOR))
+
 
 def _render_markdown_once(md_input, *, output_format="html", **kwargs):
     """
@@ -44,51 +55,176 @@ def _render_markdown_once(md_input, *, output_format="html", **kwargs):
 
     endpoint = FORMAT_ENDPOINTS[output_format]
 
+    timeout = 10
+    real_input = str(md_input)
+    if output_format.startswith("tex") or full_json:
+        # latex may be really long to generate but it is also restrained by server configuration
+        timeout = 120
+        # use manifest renderer
+        real_input = md_input
+
+    render_cache = get_render_cache()
+    cache_key = None
+    raw_result = None
+    if render_cache.is_cacheable(output_format, kwargs):
+        cache_key = render_cache.make_key(real_input, output_format, kwargs)
+        raw_result = render_cache.get(cache_key)
+    from_cache = raw_result is not None
+
+    if not from_cache:
+        try:
+            response = post(
+                "{}{}".format(settings.ZDS_APP["zmd"]["server"], endpoint),
+                json={
+                    "opts": kwargs,
+                    "md": real_input,
+                },
+                timeout=timeout,
+            )
+        except HTTPError:
+            logger.exception("An HTTP error happened, markdown rendering failed")
+            log_args()
+            return "", {}, []
+
+        if response.status_code == 413:
+            return "", {}, [{"message": str(_("Texte trop volumineux."))}]
+
+        if response.status_code != 200:
+            logger.error(f"The markdown server replied with status {response.status_code} (expected 200)")
+            log_args()
+            return "", {}, []
+
+        raw_result = response.text
+
+    try:
+        content, metadata, messages = json.loads(raw_result)
+        if cache_key is not None and not from_cache:
+            render_cache.set(cache_key, raw_result)
+        return _finalize_result(content, metadata, messages, inline=inline, full_json=full_json)
+    except:  # noqa
+        logger.exception("Unexpected exception raised")
+        log_args()
+        return "", {}, []
+
+
+def _finalize_result(content, metadata, messages, *, inline=False, full_json=False):
+    logger.debug("Result %s, %s, %s", content, metadata, messages)
+    if messages:
+        logger.error("Markdown errors %s", json.dumps(messages))
+    if isinstance(content, str):
+        content = content.strip()
+    if inline:
+        content = content.replace("</p>\n", "\n\n").replace("\n<p>", "\n")
+    if full_json:
+        return content, metadata, messages
+    return mark_safe(content), metadata, messages
+
+
+def _render_batch_once(md_inputs, output_format, opts):
+    """
+    Renders several markdown strings with a single request to the markdown server, as one document where they are
+    separated by ``BATCH_SEPARATOR`` paragraphs.
+
+    Returns a list containing the raw (JSON) result of each string, with the metadata of the whole document. Returns
+    ``None`` if the request failed, raised errors (which cannot be attributed to a string) or if the result cannot be
+    split back (a string left a code block open, for instance).
+    """
     try:
-        timeout = 10
-        real_input = str(md_input)
-        if output_format.startswith("tex") or full_json:
-            # latex may be really long to generate but it is also restrained by server configuration
-            timeout = 120
-            # use manifest renderer
-            real_input = md_input
         response = post(
-            "{}{}".format(settings.ZDS_APP["zmd"]["server"], endpoint),
+            "{}{}".format(settings.ZDS_APP["zmd"]["server"], FORMAT_ENDPOINTS[output_format]),
             json={
-                "opts": kwargs,
-                "md": real_input,
+                "opts": opts,
+                "md": "\n\n{}\n\n".format(BATCH_SEPARATOR).join(md_inputs),
             },
-            timeout=timeout,
+            timeout=BATCH_TIMEOUT,
         )
     except HTTPError:
-        logger.exception("An HTTP error happened, markdown rendering failed")
-        log_args()
-        return "", {}, []
-
-    if response.status_code == 413:
-        return "", {}, [{"message": str(_("Texte trop volumineux."))}]
+        logger.exception("An HTTP error happened, batch markdown rendering failed")
+        return None
 
     if response.status_code != 200:
         logger.error(f"The markdown server replied with status {response.status_code} (expected 200)")
-        log_args()
-        return "", {}, []
+        return None
 
     try:
         content, metadata, messages = response.json()
-        logger.debug("Result %s, %s, %s", content, metadata, messages)
-        if messages:
-            logger.error("Markdown errors %s", json.dumps(messages))
-        if isinstance(content, str):
-            content = content.strip()
-        if inline:
-            content = content.replace("</p>\n", "\n\n").replace("\n<p>", "\n")
-        if full_json:
-            return content, metadata, messages
-        return mark_safe(content), metadata, messages
-    except:  # noqa
-        logger.exception("Unexpected exception raised")
-        log_args()
-        return "", {}, []
+    except (TypeError, ValueError):
+        logger.exception("The markdown server replied with an unexpected result")
+        return None
+
+    if messages:
+        return None
+
+    parts = _batch_separator_html.split(content.strip())
+    if len(parts) != len(md_inputs):
+        logger.warning("The rendering of %s strings could not be split, rendering them one by one", len(md_inputs))
+        return None
+
+    return [json.dumps([part, metadata, []]) for part in parts]
+
+
+def render_markdown_batch(md_inputs, **kwargs):
+    """Render several markdown strings sharing the same options.
+
+    Strings are sent to the markdown server in batches of
+    ``ZDS_APP["zmd"]["batch_size"]``, joined in a single document (see
+    ``_render_batch_once()``); cached and duplicated strings are only
+    rendered once. The strings of a batch which could not be rendered this
+    way, the strings which depend on the rest of the document (footnotes,
+    references, pings) and the inline or LaTeX renderings are rendered one
+    by one with ``render_markdown``.
+
+    Returns a list of ``(rendered_content, metadata, messages)``, in the
+    order of ``md_inputs``. The metadata of the strings rendered in a batch
+    are the ones of the whole batch, without any ping.
+
+    """
+    output_format = kwargs.pop("output_format", "html")
+    inline = kwargs.get("inline", False) is True
+
+    if settings.ZDS_APP["zmd"]["disable_pings"] is True:
+        kwargs["disable_ping"] = True
+
+    md_inputs = [str(md_input) for md_input in md_inputs]
+    render_cache = get_render_cache()
+    cacheable = render_cache.is_cacheable(output_format, kwargs)
+
+    raw_results = {}
+    to_render = []
+    for md_input in dict.fromkeys(md_inputs):  # keep the order but remove the duplicates
+        if cacheable:
+            raw_result = render_cache.get(render_cache.make_key(md_input, output_format, kwargs))
+            if raw_result is not None:
+                raw_results[md_input] = raw_result
+                continue
+        to_render.append(md_input)
+
+    if output_format in BATCH_FORMATS and not inline:
+        to_render = [md_input for md_input in to_render if not _unbatchable.search(md_input)]
+    else:
+        to_render = []
+    batch_size = settings.ZDS_APP["zmd"]["batch_size"]
+    for start in range(0, len(to_render), batch_size):
+        batch = to_render[start : start + batch_size]
+        if len(batch) < 2:
+            continue
+        for md_input, raw_result in zip(batch, _render_batch_once(batch, output_format, kwargs) or []):
+            raw_results[md_input] = raw_result
+            if cacheable:
+                render_cache.set(render_cache.make_key(md_input, output_format, kwargs), raw_result)
+
+    results = []
+    for md_input in md_inputs:
+        if md_input not in raw_results:
+            results.append(render_markdown(md_input, output_format=output_format, **kwargs))
+            continue
+        try:
+            content, metadata, messages = json.loads(raw_results[md_input])
+            results.append(_finalize_result(content, metadata, messages, inline=inline))
+        except:  # noqa
+            logger.exception("Unexpected exception raised")
+            results.append(render_markdown(md_input, output_format=output_format, **kwargs))
+    return results
 
 
 def render_markdown(md_input, *, on_error=None, **kwargs):
@@ -143,14 +279,21 @@ def render_markdown_stats(md_input, **kwargs):
     return None
 
 
+def epub_markdown_options(image_directory):
+    """
+    :return: the rendering options used for the ebook export, see ``epub_markdown``.
+    """
+    return {
+        "output_format": "epub",
+        "disable_jsfiddle": True,
+        "images_download_dir": image_directory.absolute,
+        "local_url_to_local_path": [settings.MEDIA_URL + "galleries/[0-9]+", image_directory.relative],
+    }
+
+
 @register.filter(name="epub_markdown", needs_autoescape=False)
 def epub_markdown(md_input, image_directory):
-    return emarkdown(
-        md_input,
-        output_format="epub",
-        images_download_dir=image_directory.absolute,
-        local_url_to_local_path=[settings.MEDIA_URL + "galleries/[0-9]+", image_directory.relative],
-    )
+    return emarkdown(md_input, **epub_markdown_options(image_directory))
 
 
 @register.filter(needs_autoescape=False)
@@ -5,23 +5,45 @@ from django.conf import settings
 from zds.forum.models import Forum
 from zds.tutorialv2.models.database import PublishedContent
 from zds.utils.models import CategorySubCategory, Tag
+from zds.utils.topbar_menus import get_cached_menu, get_topbar_generation
 from django.db.models import Count, Q
 
 register = template.Library()
 
 
+@register.simple_tag
+def topbar_generation():
+    """Used in the keys of the cached fragments of the topbar, so that they are invalidated with the menus."""
+    return get_topbar_generation()
+
+
 @register.filter("topbar_forum_categories")
 def topbar_forum_categories(user):
+    """Get the forums the user can read, by category, and the most used tags of these forums.
+    The result is cached for each set of groups.
+
+    :param user: the user
+    :return: a dictionary, with the tags and the categories, stored in tuples of the form ``title, slug, forums``.
+    :rtype: dict
+    """
+
+    groups = sorted(user.groups.values_list("pk", flat=True))
+    return get_cached_menu("forums", groups, lambda: _get_forum_categories(groups))
+
+
+def _get_forum_categories(groups):
     max_tags = settings.ZDS_APP["forum"]["top_tag_max"]
     forums = (
-        Forum.objects.filter(Q(groups__isnull=True) | Q(groups__isnull=False, groups__in=user.groups.all()))
+        Forum.objects.filter(Q(groups__isnull=True) | Q(groups__isnull=False, groups__in=groups))
         .select_related("category")
+        .prefetch_related("groups")
         .distinct()
         .all()
     )
 
     cats = defaultdict(list)
     for forum in forums:
+        forum.has_group  # computed with the prefetched groups, before the forum is cached
         cats[forum.category.position].append(forum)
 
     sorted_cats = sorted(cats)
@@ -35,13 +57,13 @@ def topbar_forum_categories(user):
         .order_by("-count_topic")
         .all()[:max_tags]
     )
-    return {"tags": tags_by_popularity, "categories": topbar_cats}
+    return {"tags": list(tags_by_popularity), "categories": topbar_cats}
 
 
 @register.filter("topbar_publication_categories")
 def topbar_publication_categories(_type):
     """Get all the categories and their related subcategories associated with existing publications.
-    The result is sorted by alphabetic order.
+    The result is sorted by alphabetic order, and cached for each list of types.
 
     :param _type: type of the publication
     :type _type: str
@@ -51,7 +73,11 @@ def topbar_publication_categories(_type):
     """
 
     _type = _type if isinstance(_type, list) else [_type]
-    tags = PublishedContent.objects.get_top_tags(_type, limit=settings.ZDS_APP["forum"]["top_tag_max"])
+    return get_cached_menu("publications", _type, lambda: _get_publication_categories(_type))
+
+
+def _get_publication_categories(_type):
+    tags = list(PublishedContent.objects.get_top_tags(_type, limit=settings.ZDS_APP["forum"]["top_tag_max"]))
 
     subcategories_contents = (
         PublishedContent.objects.filter(must_redirect=False)
@@ -1,11 +1,17 @@
+from copy import deepcopy
 from datetime import datetime, timedelta
+from types import MappingProxyType
+from unittest.mock import patch
 
+from django.conf import settings
 from django.contrib.auth.models import AnonymousUser
 from django.test import TestCase
+from django.test.utils import override_settings
+from django.urls import reverse
 
 from zds.forum.factories import ForumCategoryFactory, ForumFactory, PostFactory, TopicFactory
 from zds.member.factories import ProfileFactory, StaffProfileFactory
-from zds.utils.context_processor import header_notifications as notifications_processor
+from zds.utils.context_processor import app_settings, header_notifications as notifications_processor
 from zds.utils.models import Alert
 
 
@@ -60,3 +66,34 @@ class AlertsTest(TestCase):
         r = Request()
         r.user = user
         return notifications_processor(r)
+
+
+class AppSettingsTest(TestCase):
+    def test_app_settings(self):
+        app = app_settings(None)["app"]
+        self.assertEqual(app["site"]["literal_name"], settings.ZDS_APP["site"]["literal_name"])
+        self.assertNotIn("search", app)  # not used by the templates
+        self.assertIs(app_settings(None)["app"], app)
+
+        # the settings cannot be modified through the templates
+        with self.assertRaises(TypeError):
+            app["site"]["literal_name"] = "Zeste de Poulpe"
+
+        response = self.client.get(reverse("homepage"))
+        self.assertContains(response, settings.ZDS_APP["site"]["literal_name"])
+
+    def test_overridden_settings(self):
+        zds_app = deepcopy(settings.ZDS_APP)
+        zds_app["site"]["literal_name"] = "Zeste de Poulpe"
+        with override_settings(ZDS_APP=zds_app):
+            self.assertEqual(app_settings(None)["app"]["site"]["literal_name"], "Zeste de Poulpe")
+        self.assertEqual(app_settings(None)["app"]["site"]["literal_name"], settings.ZDS_APP["site"]["literal_name"])
+
+    def test_overhead(self):
+        """The settings are frozen once for the process, instead of being deep copied for each request."""
+        with patch("copy.deepcopy", wraps=deepcopy) as copy:
+            app = app_settings(None)["app"]
+            self.assertIs(app_settings(None)["app"], app)
+        self.assertFalse(copy.called)
+        self.assertIsInstance(app, MappingProxyType)
+        self.assertIsInstance(app["site"], MappingProxyType)
@@ -1,9 +1,16 @@
+import json
+import threading
+from copy import deepcopy
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from textwrap import dedent
 
+from django.conf import settings
 from django.test import TestCase
+from django.test.utils import override_settings
 from django.template import Context, Template
 
-from zds.utils.templatetags.emarkdown import shift_heading
+from zds.utils.render_cache import get_render_cache
+from zds.utils.templatetags.emarkdown import shift_heading, render_markdown_batch
 
 
 class EMarkdownTest(TestCase):
@@ -97,3 +104,81 @@ class EMarkdownTest(TestCase):
         """
         )
         self.assertEqual(shift_heading(sharp_in_code_with_antiquotes, 1), result_sharp_in_code_with_antiquotes)
+
+
+class ZmdStubHandler(BaseHTTPRequestHandler):
+    """Renders each paragraph ``text`` as ``<p>text</p>`` on ``/html``, and ``error`` as an error."""
+
+    def do_POST(self):
+        self.server.requests.append(self.path)
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        if self.path != "/html":
+            self.send_response(404)
+            self.end_headers()
+            return
+        paragraphs = [paragraph for paragraph in body["md"].split("\n\n") if paragraph]
+        messages = [{"message": "error"} for paragraph in paragraphs if paragraph == "error"]
+        content = "\n".join("<p>{}</p>".format(paragraph) for paragraph in paragraphs if paragraph != "error")
+        response = json.dumps([content, {"ping": []}, messages]).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(response)))
+        self.end_headers()
+        self.wfile.write(response)
+
+    def log_message(self, *args):
+        pass
+
+
+class RenderMarkdownBatchTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), ZmdStubHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        zds_app = deepcopy(settings.ZDS_APP)
+        zds_app["zmd"]["server"] = "http://127.0.0.1:{}".format(cls.server.server_port)
+        zds_app["zmd"]["batch_size"] = 2
+        cls.settings_override = override_settings(ZDS_APP=zds_app)
+        cls.settings_override.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.settings_override.disable()
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.server.requests = []
+        get_render_cache().clear()
+
+    def test_batch(self):
+        results = render_markdown_batch(["a", "b", "a", "c", "d"])
+
+        self.assertEqual(
+            [content for content, _, _ in results], ["<p>a</p>", "<p>b</p>", "<p>a</p>", "<p>c</p>", "<p>d</p>"]
+        )
+        self.assertEqual(results[0][1], {"ping": []})
+        # duplicates are rendered once, in batches of two
+        self.assertEqual(self.server.requests, ["/html", "/html"])
+
+        # everything is now in the render cache
+        render_markdown_batch(["d", "b"])
+        self.assertEqual(len(self.server.requests), 2)
+
+    def test_error(self):
+        results = render_markdown_batch(["a", "error"])
+
+        self.assertEqual(results[0][0], "<p>a</p>")
+        self.assertEqual(results[1][2], [{"message": "error"}])
+        # the errors cannot be attributed, so the strings are rendered again on their own
+        self.assertEqual(self.server.requests, ["/html", "/html", "/html"])
+
+    def test_unbatchable(self):
+        # the pings and the footnotes are rendered alone
+        results = render_markdown_batch(["a", "@b", "c[^1]", "d\n\ne"])
+        self.assertEqual(
+            [content for content, _, _ in results], ["<p>a</p>", "<p>@b</p>", "<p>c[^1]</p>", "<p>d</p>\n<p>e</p>"]
+        )
+        self.assertEqual(len(self.server.requests), 3)
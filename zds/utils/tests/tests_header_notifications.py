@@ -0,0 +1,69 @@
+from copy import deepcopy
+from datetime import datetime
+
+from django.conf import settings
+from django.test import TestCase
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from zds.forum.factories import PostFactory, create_category_and_forum, create_topic_in_forum
+from zds.member.factories import ProfileFactory, StaffProfileFactory
+from zds.notification.models import TopicAnswerSubscription
+from zds.utils.header_notifications import get_header_notifications
+from zds.utils.models import Alert
+
+overridden_zds_app = deepcopy(settings.ZDS_APP)
+overridden_zds_app["notification"]["header_cache_timeout"] = 600
+
+
+@override_settings(
+    ZDS_APP=overridden_zds_app,
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "header"}},
+)
+class HeaderNotificationsCacheTest(TestCase):
+    def setUp(self):
+        self.author = ProfileFactory().user
+        self.user = ProfileFactory().user
+        self.staff = StaffProfileFactory().user
+        _, forum = create_category_and_forum()
+        self.topic = create_topic_in_forum(forum, self.author.profile)
+        TopicAnswerSubscription.objects.get_or_create_active(self.user, self.topic)
+
+    def test_notifications_summary(self):
+        self.assertEqual(get_header_notifications(self.user)["general_notifications"]["total"], 0)
+
+        # a new notification invalidates the summary
+        PostFactory(topic=self.topic, author=self.author, position=2)
+        summary = get_header_notifications(self.user)
+        self.assertEqual(summary["general_notifications"]["total"], 1)
+        self.assertEqual(summary["general_notifications"]["list"][0]["title"], self.topic.title)
+        self.assertFalse(summary["alerts"])
+
+        # which is then read from the cache
+        with self.assertNumQueries(0):
+            self.assertEqual(get_header_notifications(self.user), summary)
+
+        # as well as notifications marked as read by a queryset update
+        self.client.force_login(self.user)
+        self.client.post(reverse("mark-notifications-as-read"))
+        self.assertEqual(get_header_notifications(self.user)["general_notifications"]["total"], 0)
+
+    def test_alerts_summary(self):
+        self.assertEqual(get_header_notifications(self.staff)["alerts"]["total"], 0)
+
+        alert = Alert.objects.create(
+            author=self.user, comment=self.topic.last_message, scope="FORUM", text="Spam", pubdate=datetime.now()
+        )
+        summary = get_header_notifications(self.staff)
+        self.assertEqual(summary["alerts"]["total"], 1)
+        self.assertEqual(summary["alerts"]["list"][0]["title"], self.topic.title)
+
+        # the summary of the alerts is shared by the whole staff
+        other_staff = StaffProfileFactory().user
+        get_header_notifications(other_staff)  # cache the summary of the notifications of this user
+        self.assertTrue(other_staff.has_perm("forum.change_post"))
+        with self.assertNumQueries(0):
+            self.assertEqual(get_header_notifications(other_staff)["alerts"], summary["alerts"])
+
+        alert.solve(self.staff, "Résolue")
+        self.assertEqual(get_header_notifications(self.staff)["alerts"]["total"], 0)
@@ -1,11 +1,16 @@
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.management import call_command
 from django.test import TestCase
 from django.db import IntegrityError, transaction
 from django.contrib.auth.models import Group
 
+from zds.forum.factories import create_category_and_forum, create_topic_in_forum
 from zds.member.models import Profile
 from zds.member.factories import ProfileFactory
 from zds.utils.forms import TagValidator
-from zds.utils.models import Tag, Hat
+from zds.utils.models import Comment, Tag, Hat
 
 
 class TagsTests(TestCase):
@@ -100,3 +105,40 @@ class TagsTests(TestCase):
         # The user shoudn't have the hat through their profile anymore
         profile = Profile.objects.get(pk=profile.pk)  # reload
         self.assertNotIn(hat, profile.hats.all())
+
+
+class CommentTextMetadataTests(TestCase):
+    def setUp(self):
+        _, forum = create_category_and_forum()
+        self.post = create_topic_in_forum(forum, ProfileFactory()).last_message
+
+    def test_old_text_rendered_only_if_needed(self):
+        with patch("zds.utils.models.render_markdown", return_value=("<p>a</p>", {"ping": ["a"]}, [])) as render:
+            # created without metadata, the old text must be rendered
+            self.post.update_content("a")
+            self.assertEqual(render.call_count, 2)
+            self.post.save()
+
+            self.post.update_content("b")
+            self.assertEqual(render.call_count, 3)
+            self.assertEqual(self.post.old_metadata, {"ping": ["a"]})
+
+    def test_backfill(self):
+        with patch(
+            "zds.utils.management.commands.backfill_comment_metadata.render_markdown_batch",
+            side_effect=lambda texts: [("", {"ping": ["a"], "stats": {}}, []) for _ in texts],
+        ):
+            call_command("backfill_comment_metadata", "--chunk-size", 1, stdout=StringIO())
+
+        self.assertFalse(Comment.objects.filter(text_metadata__isnull=True).exists())
+        self.assertEqual(Comment.objects.get(pk=self.post.pk).get_text_metadata(), {"ping": ["a"]})
+
+    def test_backfill_failure(self):
+        with patch(
+            "zds.utils.management.commands.backfill_comment_metadata.render_markdown_batch",
+            side_effect=lambda texts: [("", {}, []) for _ in texts],
+        ):
+            call_command("backfill_comment_metadata", stdout=StringIO())
+
+        # rendered again by the next run
+        self.assertIsNone(Comment.objects.get(pk=self.post.pk).text_metadata)
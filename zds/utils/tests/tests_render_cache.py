@@ -0,0 +1,100 @@
+import json
+from copy import deepcopy
+from unittest.mock import patch, Mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.test import TestCase
+from django.test.utils import override_settings
+
+from zds.utils.render_cache import RenderCache, get_render_cache
+from zds.utils.templatetags.emarkdown import render_markdown
+
+overridden_zds_app = deepcopy(settings.ZDS_APP)
+overridden_zds_app["zmd"]["render_cache"]["enabled"] = True
+overridden_zds_app["zmd"]["render_cache"]["max_entries"] = 2
+overridden_zds_app["zmd"]["render_cache"]["cache_alias"] = None
+
+
+def zmd_response(content, metadata=None):
+    response = Mock()
+    response.status_code = 200
+    response.text = json.dumps([content, metadata or {}, []])
+    return response
+
+
+class RenderCacheTest(TestCase):
+    def test_lru_eviction(self):
+        render_cache = RenderCache(max_entries=2)
+        render_cache.set("a", "1")
+        render_cache.set("b", "2")
+        self.assertEqual(render_cache.get("a"), "1")  # "a" is now the most recently used
+        render_cache.set("c", "3")
+
+        self.assertIsNone(render_cache.get("b"))
+        self.assertEqual(render_cache.get("a"), "1")
+        self.assertEqual(render_cache.get("c"), "3")
+        self.assertEqual(render_cache.stats(), {"entries": 2, "max_entries": 2, "hits": 3, "misses": 1})
+
+    def test_key(self):
+        render_cache = RenderCache(version="1.0")
+        key = render_cache.make_key("**a**", "html", {"inline": True})
+
+        self.assertEqual(key, render_cache.make_key("**a**", "html", {"inline": True, "attempts": 2}))
+        self.assertNotEqual(key, render_cache.make_key("**a**", "html", {"inline": False}))
+        self.assertNotEqual(key, render_cache.make_key("**a**", "epub", {"inline": True}))
+        self.assertNotEqual(key, render_cache.make_key("**b**", "html", {"inline": True}))
+        self.assertNotEqual(key, RenderCache(version="2.0").make_key("**a**", "html", {"inline": True}))
+
+    def test_shared_tier(self):
+        shared_cache = RenderCache(max_entries=1, cache_alias="default")
+        shared_cache.clear(shared=True)
+        shared_cache.set("a", "1")
+        shared_cache.set("b", "2")  # evicts "a" from memory, but it is still in the Django cache
+
+        self.assertEqual(shared_cache.get("a"), "1")
+        self.assertEqual(RenderCache(cache_alias="default").get("b"), "2")
+        shared_cache.clear(shared=True)
+
+    def test_purge_keeps_the_other_entries(self):
+        cache.set("other", "value")
+        RenderCache(cache_alias="default").set("a", "1")
+        RenderCache(cache_alias="default").clear(shared=True)
+
+        self.assertIsNone(RenderCache(cache_alias="default").get("a"))
+        self.assertEqual(cache.get("other"), "value")
+
+
+@override_settings(ZDS_APP=overridden_zds_app)
+class RenderMarkdownCacheTest(TestCase):
+    def setUp(self):
+        get_render_cache().clear()
+
+    def test_identical_renders_hit_the_cache(self):
+        with patch(
+            "zds.utils.templatetags.emarkdown.post", return_value=zmd_response("<p>a</p>", {"ping": ["b"]})
+        ) as post:
+            content, metadata, _ = render_markdown("a")
+            metadata["ping"].append("c")  # callers may modify what they get
+            content_again, metadata_again, _ = render_markdown("a")
+            render_markdown("a", inline=True)
+
+        self.assertEqual(post.call_count, 2)
+        self.assertEqual(content, content_again)
+        self.assertEqual(metadata_again, {"ping": ["b"]})
+        self.assertEqual(get_render_cache().stats()["hits"], 1)
+
+    def test_errors_are_not_cached(self):
+        error_response = Mock(status_code=500)
+        with patch("zds.utils.templatetags.emarkdown.post", side_effect=[error_response, zmd_response("<p>a</p>")]):
+            self.assertEqual(render_markdown("a")[0], "")
+            self.assertEqual(render_markdown("a")[0], "<p>a</p>")
+
+        self.assertEqual(get_render_cache().stats()["entries"], 1)
+
+    def test_side_effects_are_not_cached(self):
+        with patch("zds.utils.templatetags.emarkdown.post", return_value=zmd_response("<p>a</p>")) as post:
+            render_markdown("a", output_format="epub", images_download_dir="/tmp")
+            render_markdown("a", output_format="epub", images_download_dir="/tmp")
+
+        self.assertEqual(post.call_count, 2)
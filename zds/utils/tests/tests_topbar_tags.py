@@ -1,10 +1,15 @@
+from copy import deepcopy
+
+from django.conf import settings
 from django.contrib.auth.models import Group
 
 from django.test import TestCase
+from django.test.utils import override_settings
 
 from zds.forum.factories import ForumCategoryFactory, ForumFactory, TopicFactory
 from zds.member.factories import ProfileFactory, StaffProfileFactory
 from zds.tutorialv2.factories import PublishedContentFactory, PublishableContentFactory, SubCategoryFactory
+from zds.tutorialv2.models.database import PublishedContent
 from zds.tutorialv2.publication_utils import publish_content
 from zds.tutorialv2.tests import TutorialTestMixin, override_for_contents
 from zds.utils.factories import CategoryFactory as ContentCategoryFactory
@@ -153,3 +158,57 @@ class TopBarTests(TutorialTestMixin, TestCase):
         expected_2 = [(subcategory_3.title, subcategory_3.slug, category_2.slug)]
         self.assertEqual(top_categories_contents[category_1.title], expected)
         self.assertEqual(top_categories_contents[category_2.title], expected_2)
+
+
+overridden_zds_app = deepcopy(settings.ZDS_APP)
+overridden_zds_app["forum"]["topbar_cache_timeout"] = 1800
+
+
+@override_settings(
+    ZDS_APP=overridden_zds_app,
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "topbar"}},
+)
+class TopBarCacheTests(TestCase):
+    def setUp(self):
+        self.category = ForumCategoryFactory(position=1)
+        self.forum = ForumFactory(category=self.category, position_in_category=1)
+        self.staff = StaffProfileFactory().user
+        self.staff_forum = ForumFactory(category=self.category, position_in_category=2)
+        self.staff_forum.groups.add(Group.objects.filter(name="staff").first())
+
+    def get_forums(self, user):
+        return [forum for _, _, forums in topbar_forum_categories(user)["categories"] for forum in forums]
+
+    def test_forum_menu(self):
+        user = ProfileFactory().user
+        self.assertEqual(self.get_forums(user), [self.forum])
+        self.assertEqual(self.get_forums(self.staff), [self.forum, self.staff_forum])
+
+        # the menu is shared by the users with the same groups, only their groups are queried
+        other_user = ProfileFactory().user
+        with self.assertNumQueries(1):
+            self.assertEqual(self.get_forums(other_user), [self.forum])
+        with self.assertNumQueries(1):
+            self.assertTrue(self.get_forums(self.staff)[1].has_group)
+
+        # and it is invalidated when the forums change
+        other_forum = ForumFactory(category=self.category, position_in_category=3)
+        self.assertEqual(self.get_forums(user), [self.forum, other_forum])
+        other_forum.groups.add(Group.objects.filter(name="staff").first())
+        self.assertEqual(self.get_forums(user), [self.forum])
+
+    def test_publication_menu(self):
+        category = ContentCategoryFactory()
+        subcategory = SubCategoryFactory(category=category)
+        content = PublishableContentFactory(type="TUTORIAL")
+        content.subcategory.add(subcategory)
+        self.assertFalse(topbar_publication_categories("TUTORIAL")["categories"])
+        with self.assertNumQueries(0):
+            self.assertFalse(topbar_publication_categories("TUTORIAL")["categories"])
+
+        # the menu is invalidated by a publication
+        PublishedContent.objects.create(
+            content=content, content_type="TUTORIAL", content_public_slug=content.slug, content_pk=content.pk
+        )
+        expected = [(subcategory.title, subcategory.slug, category.slug)]
+        self.assertEqual(topbar_publication_categories("TUTORIAL")["categories"][category.title], expected)
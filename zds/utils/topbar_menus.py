@@ -0,0 +1,40 @@
+"""
+Cache of the forum and publication menus of the topbar.
+
+The menus only depend on the groups of the user (for the forums) and on the forums, tags and publications, so they are
+computed once and cached, under a generation number which is incremented each time one of them changes (see
+``invalidate_topbar_menus()`` and the receivers of the forum, utils and tutorialv2 models). The counts of the most used
+tags are not followed, so they can be late for ``ZDS_APP["forum"]["topbar_cache_timeout"]`` seconds at most.
+"""
+
+from django.conf import settings
+from django.core.cache import cache
+
+GENERATION_KEY = "topbar_menus:generation"
+
+
+def get_topbar_generation():
+    return cache.get_or_set(GENERATION_KEY, 0, None)
+
+
+def invalidate_topbar_menus():
+    """Drops all the cached menus, after a forum, a tag or a publication changed."""
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:  # not set yet (or evicted)
+        cache.set(GENERATION_KEY, 1, None)
+
+
+def get_cached_menu(name, key_parts, compute):
+    """
+    :param str name: name of the menu
+    :param key_parts: what the menu depends on, in addition to the generation
+    :param compute: function called to compute the menu when it is not cached
+    :return: the cached menu, or the one returned by ``compute()``
+    """
+    key = "topbar_menus:{}:{}:{}".format(get_topbar_generation(), name, "-".join(str(part) for part in key_parts))
+    menu = cache.get(key)
+    if menu is None:
+        menu = compute()
+        cache.set(key, menu, settings.ZDS_APP["forum"]["topbar_cache_timeout"])
+    return menu
@@ -0,0 +1,83 @@
+"""
+Buffers of the writes which are not needed to answer the request (topics read, last visits...), saved in batches by a
+background thread of the process.
+
+The pending writes are lost if the process is killed, so they must only be used for data which can be late or missing.
+"""
+
+import atexit
+import logging
+import threading
+
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBehindBuffer:
+    """
+    Pending writes, by key: a new value replaces the pending one of the same key, so that the writes are coalesced.
+
+    :param name: name of the thread of the flusher
+    :param save: function saving a batch of writes, given as a dictionary, and returning the number of writes done
+    :param get_interval: function returning the number of seconds between two flushes
+    :param get_batch_size: function returning the maximum number of writes saved by one call to ``save``, the buffer is
+        flushed as soon as it holds that many writes
+    """
+
+    def __init__(self, name, save, get_interval, get_batch_size):
+        self.name = name
+        self.save = save
+        self.get_interval = get_interval
+        self.get_batch_size = get_batch_size
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._wake_up = threading.Event()
+        self._flusher = None
+
+    def add(self, key, value):
+        with self._lock:
+            self._pending[key] = value
+            pending = len(self._pending)
+        self.start_flusher()
+        if pending >= self.get_batch_size():
+            self._wake_up.set()
+
+    def discard(self, key):
+        """Drops the pending write of the key, if any."""
+        with self._lock:
+            self._pending.pop(key, None)
+
+    def start_flusher(self):
+        """Starts the flusher of this process, if it is not running yet."""
+        with self._lock:
+            if self._flusher is None or not self._flusher.is_alive():
+                if self._flusher is None:
+                    atexit.register(self.flush)
+                self._flusher = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._flusher.start()
+
+    def _run(self):
+        while True:
+            self._wake_up.wait(self.get_interval() or 1)
+            self._wake_up.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Could not save the pending writes of %s", self.name)
+            finally:
+                connection.close()  # the connection of this thread, which would stay open between two flushes
+
+    def flush(self):
+        """
+        Saves the pending writes.
+
+        :return: the number of writes done
+        :rtype: int
+        """
+        with self._lock:
+            pending, self._pending = self._pending, {}
+
+        writes = list(pending.items())
+        batch_size = self.get_batch_size()
+        return sum(self.save(dict(writes[start : start + batch_size])) for start in range(0, len(writes), batch_size))